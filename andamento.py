@@ -0,0 +1,253 @@
+import threading
+import time
+import weakref
+from collections import Counter, deque, namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+
+import contadores
+from models import db, Pedido, PedidoStatusEvento
+
+# Andamento dos pedidos: cada criação e cada troca de status grava uma linha
+# em pedido_status_evento (na mesma conexão e transação do flush, como os
+# contadores), e as trocas só são aceitas se seguirem TRANSICOES. Sobre esse
+# histórico, um estimador em memória guarda as durações recentes de cada
+# etapa e quantos pedidos entraram em cada status por hora. Ele lê apenas os
+# eventos novos (id maior que o último visto), no máximo a cada poucos
+# segundos, então também enxerga o que os outros workers gravaram sem
+# nunca varrer o histórico inteiro. Daí saem a previsão de entrega do perfil
+# e a tela da cozinha.
+
+STATUS = ('pendente', 'preparando', 'pronto', 'entregue', 'cancelado')
+ETAPAS = ('pendente', 'preparando', 'pronto')  # status com duração até a entrega
+FINAIS = ('entregue', 'cancelado')
+
+# Para onde cada status pode ir; voltar uma etapa existe para corrigir engano
+TRANSICOES = {
+    'pendente': ('preparando', 'cancelado'),
+    'preparando': ('pronto', 'pendente', 'cancelado'),
+    'pronto': ('entregue', 'preparando', 'cancelado'),
+    'entregue': (),
+    'cancelado': (),
+}
+
+# Durações usadas enquanto uma etapa não tem amostras suficientes
+PADRAO_SEGUNDOS = {'pendente': 5 * 60, 'preparando': 20 * 60, 'pronto': 15 * 60}
+MINIMO_AMOSTRAS = 5
+
+Etapa = namedtuple('Etapa', 'status amostras mediana p90')  # durações em segundos
+
+_tabela = PedidoStatusEvento.__table__
+
+
+class TransicaoInvalida(ValueError):
+    pass
+
+
+def validar_transicao(atual, novo):
+    if novo not in TRANSICOES:
+        raise TransicaoInvalida('Status inválido')
+    atual = atual or 'pendente'
+    if novo != atual and novo not in TRANSICOES[atual]:
+        raise TransicaoInvalida(f'Não é possível passar o pedido de {atual} para {novo}')
+
+
+def mudar_status(pedido, novo):
+    """Valida e aplica a troca de status; o evento é gravado no flush."""
+    validar_transicao(pedido.status, novo)
+    pedido.status = novo
+
+
+def _registrar(conexao, pedido_id, de, para, quando):
+    conexao.execute(_tabela.insert().values(pedido_id=pedido_id, de=de, para=para, criado_em=quando))
+
+
+@event.listens_for(Pedido, 'after_insert')
+def _pedido_inserido(mapper, conexao, pedido):
+    _registrar(conexao, pedido.id, None, pedido.status or 'pendente', pedido.created_at or datetime.utcnow())
+
+
+@event.listens_for(Pedido, 'after_delete')
+def _pedido_excluido(mapper, conexao, pedido):
+    conexao.execute(_tabela.delete().where(_tabela.c.pedido_id == pedido.id))
+
+
+@event.listens_for(Pedido, 'after_update')
+def _pedido_atualizado(mapper, conexao, pedido):
+    historico = inspect(pedido).attrs.status.history
+    if not historico.has_changes() or not historico.deleted:
+        return
+    anterior, novo = historico.deleted[0], pedido.status
+    if anterior != novo:
+        _registrar(conexao, pedido.id, anterior, novo, datetime.utcnow())
+
+
+def _hora(quando):
+    return quando.replace(minute=0, second=0, microsecond=0)
+
+
+def _percentil(ordenados, fracao):
+    return ordenados[min(int(len(ordenados) * fracao), len(ordenados) - 1)]
+
+
+class Estimador:
+    def __init__(self, amostras=200, janela=timedelta(hours=24), intervalo=5):
+        self.janela = janela
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._atualizando = threading.Lock()
+        self._duracoes = {etapa: deque(maxlen=amostras) for etapa in ETAPAS}
+        self._abertos = {}  # pedido_id -> (status, desde) dos pedidos em andamento
+        self._por_hora = {}  # hora -> Counter(status de destino)
+        self._ultimo_id = None
+        self._lido_em = None  # time.monotonic() da última leitura
+
+    def _aplicar(self, pedido_id, para, quando):
+        anterior = self._abertos.pop(pedido_id, None)
+        if anterior is not None and anterior[0] in self._duracoes and quando >= anterior[1]:
+            self._duracoes[anterior[0]].append((quando - anterior[1]).total_seconds())
+        if para not in FINAIS:
+            self._abertos[pedido_id] = (para, quando)
+        self._por_hora.setdefault(_hora(quando), Counter())[para] += 1
+
+    def _descartar_antigos(self, agora):
+        limite = agora - self.janela
+        for hora in [hora for hora in self._por_hora if hora < _hora(limite)]:
+            del self._por_hora[hora]
+        for pedido_id in [pedido_id for pedido_id, (_, desde) in self._abertos.items() if desde < limite]:
+            del self._abertos[pedido_id]
+
+    def atualizar(self, conexao, forcar=False):
+        """Lê os eventos gravados desde a última leitura (no máximo a cada `intervalo` segundos)."""
+        if not forcar and self._lido_em is not None and time.monotonic() - self._lido_em < self.intervalo:
+            return
+        # Uma thread lê o banco; as outras seguem com os números atuais
+        if not self._atualizando.acquire(blocking=False):
+            return
+        try:
+            agora = datetime.utcnow()
+            stmt = select(_tabela.c.id, _tabela.c.pedido_id, _tabela.c.para, _tabela.c.criado_em)
+            if self._ultimo_id is None:
+                # Primeira leitura: só a janela, pelo índice de criado_em
+                stmt = (stmt.where(_tabela.c.criado_em >= agora - self.janela)
+                        .order_by(_tabela.c.criado_em, _tabela.c.id))
+            else:
+                stmt = stmt.where(_tabela.c.id > self._ultimo_id).order_by(_tabela.c.id)
+            linhas = conexao.execute(stmt).all()
+            with self._lock:
+                for linha in linhas:
+                    self._aplicar(linha.pedido_id, linha.para, linha.criado_em)
+                if linhas:
+                    self._ultimo_id = max(self._ultimo_id or 0, max(linha.id for linha in linhas))
+                elif self._ultimo_id is None:
+                    self._ultimo_id = conexao.execute(select(func.max(_tabela.c.id))).scalar() or 0
+                self._descartar_antigos(agora)
+                self._lido_em = time.monotonic()
+        finally:
+            self._atualizando.release()
+
+    def etapas(self):
+        with self._lock:
+            duracoes = {etapa: sorted(valores) for etapa, valores in self._duracoes.items()}
+        return {
+            etapa: Etapa(etapa, len(valores),
+                         _percentil(valores, 0.5) if valores else None,
+                         _percentil(valores, 0.9) if valores else None)
+            for etapa, valores in duracoes.items()
+        }
+
+    def medianas(self):
+        """Duração típica de cada etapa, com o padrão enquanto faltam amostras."""
+        return {
+            etapa: dados.mediana if dados.amostras >= MINIMO_AMOSTRAS else PADRAO_SEGUNDOS[etapa]
+            for etapa, dados in self.etapas().items()
+        }
+
+    def previsoes(self, pedidos, agora=None):
+        """Minutos estimados até a entrega de cada pedido em andamento: {pedido_id: minutos}."""
+        agora = agora or datetime.utcnow()
+        medianas = self.medianas()
+        with self._lock:
+            abertos = {pedido.id: self._abertos.get(pedido.id) for pedido in pedidos}
+        previsoes = {}
+        for pedido in pedidos:
+            if pedido.status not in ETAPAS:
+                continue
+            aberto = abertos[pedido.id]
+            if aberto is not None and aberto[0] == pedido.status:
+                desde = aberto[1]
+            else:
+                desde = pedido.updated_at or pedido.created_at or agora
+            # Etapa atual: o que falta da duração típica (pelo menos um minuto)
+            restante = max(medianas[pedido.status] - (agora - desde).total_seconds(), 60)
+            restante += sum(medianas[etapa] for etapa in ETAPAS[ETAPAS.index(pedido.status) + 1:])
+            previsoes[pedido.id] = max(1, round(restante / 60))
+        return previsoes
+
+    def vazao(self, horas=12, agora=None):
+        """Pedidos que entraram em cada status, por hora, da hora atual para trás."""
+        atual = _hora(agora or datetime.utcnow())
+        with self._lock:
+            return [
+                (hora, {status: self._por_hora.get(hora, {}).get(status, 0) for status in STATUS})
+                for hora in (atual - timedelta(hours=i) for i in range(horas))
+            ]
+
+
+# Um estimador por engine (o benchmark e os testes trocam de banco no mesmo processo)
+_estimadores = weakref.WeakKeyDictionary()
+_estimadores_lock = threading.Lock()
+
+
+def estimador():
+    engine = db.engine
+    atual = _estimadores.get(engine)
+    if atual is None:
+        with _estimadores_lock:
+            atual = _estimadores.get(engine)
+            if atual is None:
+                config = current_app.config
+                atual = _estimadores[engine] = Estimador(
+                    amostras=config.get('ANDAMENTO_AMOSTRAS', 200),
+                    janela=timedelta(hours=config.get('ANDAMENTO_JANELA_HORAS', 24)),
+                    intervalo=config.get('ANDAMENTO_INTERVALO', 5),
+                )
+    atual.atualizar(db.session.connection())
+    return atual
+
+
+def _minutos(segundos):
+    return None if segundos is None else round(segundos / 60, 1)
+
+
+def painel(horas=12):
+    """Dados da tela da cozinha: pedidos em cada etapa, durações e vazão por hora."""
+    atual = estimador()
+    valores = contadores.ler()
+    etapas = [
+        {
+            'status': etapa.status,
+            'em_andamento': valores[contadores.chave_status(etapa.status)],
+            'amostras': etapa.amostras,
+            'mediana_minutos': _minutos(etapa.mediana),
+            'p90_minutos': _minutos(etapa.p90),
+        }
+        for etapa in atual.etapas().values()
+    ]
+    vazao = [{'hora': hora.isoformat(), **contagens} for hora, contagens in atual.vazao(horas)]
+    return {'etapas': etapas, 'vazao': vazao, 'horas': horas}
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _antes_de_apagar_tabelas(metadata, conexao, **kw):
+    _estimadores.pop(conexao.engine, None)
+
+
+def _transicoes():
+    return {'transicoes_status': TRANSICOES}
+
+
+def init_app(app):
+    app.context_processor(_transicoes)
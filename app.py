@@ -1,42 +1,56 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+import click
+from flask import Blueprint, Flask, current_app, render_template, request, jsonify, redirect, url_for, flash, stream_with_context
+from flask.cli import with_appcontext
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from models import db, User, Categoria, Produto, Pedido, PedidoItem, Endereco
+from config import Config, opcoes_engine
 from datetime import datetime
+import importlib
 import re
 import os
-from werkzeug.utils import secure_filename
+import andamento
+import banco
+import busca
+import carrinhos
+import catalogo
+import compressao
+import consultas
+import contadores
+import estaticos
+import exportacao
+import eventos
+import identidade
+import imagens
+import metricas
+import orcamento_sql
+import pedidos
+import relatorios
+import senhas
+from orcamento_sql import limite_sql
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'sua-chave-secreta-aqui-mude-em-producao'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///junior_food.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Todas as rotas ficam no blueprint `loja`; create_app() (no fim do arquivo)
+# monta a aplicação com ele, então importar este módulo não cria app, pasta
+# nem banco
+loja = Blueprint('loja', __name__)
 
-# Configurações para upload de imagens
-app.config['UPLOAD_FOLDER'] = 'static/uploads/produtos'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
-app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-
-# Criar pasta de uploads se não existir
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'loja.login'
 login_manager.login_message = 'Por favor, faça login para acessar esta página.'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identidade.carregar(int(user_id))
 
-@app.before_request
+@loja.before_app_request
 def check_admin_access():
     if request.endpoint and 'admin_' in request.endpoint:
+        if request.endpoint == 'loja.admin_metrics' and metricas.token_valido():
+            return
         if not current_user.is_authenticated:
-            return redirect(url_for('login'))
+            return redirect(url_for('loja.login'))
         if not current_user.is_admin:
             flash('Acesso negado. Apenas administradores podem acessar esta área.', 'error')
-            return redirect(url_for('cardapio'))
+            return redirect(url_for('loja.cardapio'))
 
 # Funções de validação
 def validar_email(email):
@@ -55,32 +69,27 @@ def validar_preco(preco):
     
 def allowed_file(filename):
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 def save_image(file):
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Adicionar timestamp para evitar conflitos de nome
-        name, ext = os.path.splitext(filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{name}_{timestamp}{ext}"
-        
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        return filename
-    return None
+    # Nome pelo hash do conteúdo; as variantes redimensionadas saem em segundo plano
+    return imagens.salvar_upload(file)
+
+def remover_imagem_sem_uso(filename):
+    em_uso = Produto.query.filter_by(imagem=filename).first() is not None
+    imagens.remover(filename, em_uso=em_uso)
 
 # Rotas principais
-@app.route('/')
+@loja.route('/')
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('cardapio'))
-    return redirect(url_for('login'))
+        return redirect(url_for('loja.cardapio'))
+    return redirect(url_for('loja.login'))
 
-@app.route('/cadastro', methods=['GET', 'POST'])
+@loja.route('/cadastro', methods=['GET', 'POST'])
 def cadastro():
     if current_user.is_authenticated:
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
@@ -120,23 +129,27 @@ def cadastro():
         
         # Criar novo usuário
         novo_user = User(username=username, email=email, is_admin=False)
-        novo_user.set_password(password)
+        try:
+            novo_user.set_password(password)
+        except senhas.SenhasOcupadas:
+            flash('Muitos acessos neste momento. Tente novamente em alguns segundos.', 'error')
+            return render_template('cadastro.html'), 503
         
         try:
             db.session.add(novo_user)
             db.session.commit()
             flash('Cadastro realizado com sucesso! Faça login para continuar.', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('loja.login'))
         except Exception as e:
             db.session.rollback()
             flash('Erro ao criar conta. Tente novamente.', 'error')
     
     return render_template('cadastro.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@loja.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
     if request.method == 'POST':
         email = request.form.get('email', '').strip().lower()  # Mudei para email
@@ -144,225 +157,221 @@ def login():
         
         user = User.query.filter_by(email=email).first()  
         
-        if user and user.check_password(password):
+        try:
+            senha_correta = user is not None and user.check_password(password)
+        except senhas.SenhasOcupadas:
+            flash('Muitos acessos neste momento. Tente novamente em alguns segundos.', 'error')
+            return render_template('login.html'), 503
+        
+        if senha_correta:
+            # Hash com parâmetros antigos é refeito com a senha que acabou de ser conferida
+            if senhas.precisa_rehash(user.password_hash):
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except senhas.SenhasOcupadas:
+                    pass
             login_user(user)
             next_page = request.args.get('next')
             if next_page:
                 return redirect(next_page)
-            return redirect(url_for('cardapio'))
+            return redirect(url_for('loja.cardapio'))
         else:
             flash('Email ou senha incorretos', 'error')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@loja.route('/logout')
 @login_required
 def logout():
+    carrinhos.store().limpar(current_user.id)
     logout_user()
-    session.pop('carrinho', None)
     flash('Você saiu da sua conta.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('loja.login'))
 
-@app.route('/cardapio')
+@loja.route('/cardapio')
+@limite_sql(3)
 @login_required
 def cardapio():
-    categorias = Categoria.query.filter_by(ativo=True).all()
-    carrinho_count = len(session.get('carrinho', []))
-    return render_template('cardapio.html', categorias=categorias, carrinho_count=carrinho_count)
+    categorias = catalogo.atual().categorias
+    return render_template('cardapio.html', categorias=categorias)
 
-@app.route('/api/produtos/<int:categoria_id>')
+@loja.route('/api/produtos/busca')
+@limite_sql(4)
+@login_required
+def api_busca_produtos():
+    termo = request.args.get('q', '').strip()[:100]
+    pagina = max(1, request.args.get('pagina', 1, type=int))
+    por_pagina = min(max(1, request.args.get('por_pagina', busca.POR_PAGINA, type=int)), busca.POR_PAGINA_MAXIMO)
+    
+    resultado = busca.buscar(termo, pagina, por_pagina)
+    # Os dados vêm do snapshot do catálogo; a busca só decide quais e em que ordem
+    produtos = catalogo.atual().produtos
+    return jsonify({
+        'q': termo,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'tem_mais': resultado.tem_mais,
+        'produtos': [catalogo.produto_json(produtos[produto_id])
+                     for produto_id in resultado.produto_ids if produto_id in produtos]
+    })
+
+@loja.route('/api/produtos/<int:categoria_id>')
+@limite_sql(2)
 @login_required
 def api_produtos(categoria_id):
     try:
-        produtos = Produto.query.filter_by(categoria_id=categoria_id, ativo=True).all()
-        produtos_data = []
-        for produto in produtos:
-            produtos_data.append({
-                'id': produto.id,
-                'nome': produto.nome,
-                'descricao': produto.descricao,
-                'preco': produto.preco,
-                'imagem': produto.imagem
-            })
-        return jsonify(produtos_data)
+        produtos = catalogo.atual().por_categoria.get(categoria_id, ())
+        return jsonify([catalogo.produto_json(produto) for produto in produtos])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/adicionar_carrinho', methods=['POST'])
+@loja.route('/api/cardapio')
+@limite_sql(2)
+@login_required
+def api_cardapio():
+    corpo, versao, modificado_em = catalogo.cardapio()
+    resposta = current_app.response_class(corpo, mimetype='application/json')
+    resposta.set_etag(versao)
+    resposta.last_modified = modificado_em
+    # O navegador guarda a cópia, mas revalida sempre (responde 304 se nada mudou)
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
+@loja.route('/adicionar_carrinho', methods=['POST'])
 @login_required
 def adicionar_carrinho():
     try:
         produto_id = request.form.get('produto_id')
         observacao = request.form.get('observacao', '').strip()
+        try:
+            quantidade = max(1, int(request.form.get('quantidade', 1)))
+        except ValueError:
+            quantidade = 1
         
         if not produto_id:
             return jsonify({'success': False, 'message': 'Produto não especificado'})
         
-        produto = Produto.query.filter_by(id=produto_id, ativo=True).first()
+        try:
+            produto = catalogo.atual().produto_disponivel(int(produto_id))
+        except ValueError:
+            produto = None
         if not produto:
             return jsonify({'success': False, 'message': 'Produto não encontrado'})
         
-        carrinho = session.get('carrinho', [])
-        
-        #ele Verifica se o produto já está no carrinho
-        item_existente = next((item for item in carrinho if item['produto_id'] == produto.id), None)
-        
-        if item_existente:
-            item_existente['observacao'] = observacao
-        else:
-            carrinho.append({
-                'produto_id': produto.id,
-                'nome': produto.nome,
-                'preco': float(produto.preco),
-                'observacao': observacao
-            })
-        
-        session['carrinho'] = carrinho
+        # Mesmo produto com a mesma observação soma na quantidade da linha
+        carrinho_count = carrinhos.store().adicionar(current_user.id, produto.id, quantidade, observacao)
         
         return jsonify({
             'success': True, 
             'message': 'Produto adicionado ao carrinho', 
-            'carrinho_count': len(carrinho)
+            'carrinho_count': carrinho_count
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/carrinho')
+@loja.route('/carrinho')
 @login_required
 def carrinho():
-    carrinho_itens = session.get('carrinho', [])
-    total = sum(item['preco'] for item in carrinho_itens)
+    carrinho_itens = carrinhos.itens(current_user.id)
+    total = carrinhos.total(carrinho_itens)
     return render_template('carrinho.html', carrinho_itens=carrinho_itens, total=total)
 
-@app.route('/remover_carrinho/<int:index>')
+@loja.route('/remover_carrinho/<int:index>')
 @login_required
 def remover_carrinho(index):
-    carrinho = session.get('carrinho', [])
-    if 0 <= index < len(carrinho):
-        item_removido = carrinho.pop(index)
-        session['carrinho'] = carrinho
-        flash(f'{item_removido["nome"]} removido do carrinho', 'success')
+    item_removido = carrinhos.store().remover(current_user.id, index)
+    if item_removido:
+        produto = catalogo.atual().produtos.get(item_removido['produto_id'])
+        flash(f'{produto.nome if produto else "Item"} removido do carrinho', 'success')
     else:
         flash('Item não encontrado no carrinho', 'error')
-    return redirect(url_for('carrinho'))
+    return redirect(url_for('loja.carrinho'))
 
-@app.route('/limpar_carrinho')
+@loja.route('/limpar_carrinho')
 @login_required
 def limpar_carrinho():
-    if session.get('carrinho'):
-        session.pop('carrinho')
+    if carrinhos.store().limpar(current_user.id):
         flash('Carrinho limpo com sucesso', 'success')
     else:
         flash('Carrinho já está vazio', 'info')
-    return redirect(url_for('carrinho'))
+    return redirect(url_for('loja.carrinho'))
 
-@app.route('/atualizar_carrinho', methods=['POST'])
+@loja.route('/atualizar_carrinho', methods=['POST'])
 @login_required
 def atualizar_carrinho():
     try:
         index = int(request.form.get('index'))
-        nova_observacao = request.form.get('observacao', '').strip()
+        nova_observacao = request.form.get('observacao')
+        quantidade = request.form.get('quantidade')
+        if nova_observacao is not None:
+            nova_observacao = nova_observacao.strip()
+        if quantidade is not None:
+            quantidade = int(quantidade)
+            if quantidade < 1:
+                return jsonify({'success': False, 'message': 'Quantidade inválida'})
         
-        carrinho = session.get('carrinho', [])
-        if 0 <= index < len(carrinho):
-            carrinho[index]['observacao'] = nova_observacao
-            session['carrinho'] = carrinho
-            return jsonify({'success': True, 'message': 'Observação atualizada'})
+        if carrinhos.store().atualizar(current_user.id, index, quantidade, nova_observacao):
+            return jsonify({
+                'success': True,
+                'message': 'Carrinho atualizado',
+                'carrinho_count': carrinhos.store().contar(current_user.id)
+            })
         else:
             return jsonify({'success': False, 'message': 'Item não encontrado'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/finalizar_pedido', methods=['POST'])
+@loja.route('/finalizar_pedido', methods=['POST'])
+@limite_sql(13)
 @login_required
 def finalizar_pedido():
     try:
-        carrinho_itens = session.get('carrinho', [])
-        if not carrinho_itens:
-            flash('Carrinho vazio', 'error')
-            return redirect(url_for('carrinho'))
-        
-        forma_pagamento = request.form.get('forma_pagamento')
-        observacao_geral = request.form.get('observacao_geral', '').strip()
-        troco_para = request.form.get('troco_para', 0)
-        endereco_entrega_id = request.form.get('endereco_entrega_id')
-        
-        if not forma_pagamento:
-            flash('Selecione uma forma de pagamento', 'error')
-            return redirect(url_for('carrinho'))
-        
-        if not endereco_entrega_id:
-            flash('Selecione um endereço para entrega', 'error')
-            return redirect(url_for('carrinho'))
-        
-        endereco = Endereco.query.filter_by(id=endereco_entrega_id, user_id=current_user.id).first()
-        if not endereco:
-            flash('Endereço inválido', 'error')
-            return redirect(url_for('carrinho'))
-        
-        if forma_pagamento == 'dinheiro' and troco_para:
-            try:
-                troco_para = float(troco_para)
-                total = sum(item['preco'] for item in carrinho_itens)
-                if troco_para < total:
-                    flash('Valor para troco deve ser maior ou igual ao total', 'error')
-                    return redirect(url_for('carrinho'))
-            except ValueError:
-                flash('Valor para troco inválido', 'error')
-                return redirect(url_for('carrinho'))
-        
-        total = sum(item['preco'] for item in carrinho_itens)
-        
-        pedido = Pedido(
-            user_id=current_user.id,
-            forma_pagamento=forma_pagamento,
-            troco_para=float(troco_para) if troco_para else 0,
-            observacao=observacao_geral,
-            total=total,
-            endereco_entrega_id=int(endereco_entrega_id)
+        pedidos.criar_pedido(
+            current_user.id,
+            carrinhos.store().linhas(current_user.id),
+            forma_pagamento=request.form.get('forma_pagamento'),
+            endereco_entrega_id=request.form.get('endereco_entrega_id'),
+            troco_para=request.form.get('troco_para', 0),
+            observacao=request.form.get('observacao_geral', '').strip()
         )
-        
-        db.session.add(pedido)
-        db.session.flush()
-        
-        for item in carrinho_itens:
-            produto = Produto.query.get(item['produto_id'])
-            if produto:
-                pedido_item = PedidoItem(
-                    pedido_id=pedido.id,
-                    produto_id=item['produto_id'],
-                    quantidade=1,
-                    observacao=item.get('observacao', ''),
-                    preco_unitario=item['preco']
-                )
-                db.session.add(pedido_item)
-        
-        db.session.commit()
-        session.pop('carrinho', None)
-        
-        flash('Pedido realizado com sucesso! Aguarde a preparação.', 'success')
-        return redirect(url_for('perfil'))
-        
+    except pedidos.PedidoInvalido as e:
+        flash(str(e), 'error')
+        return redirect(url_for('loja.carrinho'))
+    except pedidos.FilaCheia:
+        flash('Muitos pedidos neste momento. Seu carrinho foi mantido; tente novamente em alguns segundos.', 'error')
+        return redirect(url_for('loja.carrinho'))
+    except pedidos.GravacaoPendente:
+        # Não dá para saber se o pedido entrou: tentar de novo poderia duplicá-lo
+        flash('Seu pedido está demorando para ser confirmado. Confira em Meu Perfil antes de tentar novamente.', 'error')
+        return redirect(url_for('loja.perfil'))
     except Exception as e:
-        db.session.rollback()
         flash(f'Erro ao finalizar pedido: {str(e)}', 'error')
-        return redirect(url_for('carrinho'))
+        return redirect(url_for('loja.carrinho'))
+    
+    carrinhos.store().limpar(current_user.id)
+    flash('Pedido realizado com sucesso! Aguarde a preparação.', 'success')
+    return redirect(url_for('loja.perfil'))
 
-@app.route('/perfil')
+@loja.route('/perfil')
+@limite_sql(4)
 @login_required
 def perfil():
     if current_user.is_admin:
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('loja.admin_dashboard'))
     
-    pedidos = Pedido.query.filter_by(user_id=current_user.id).order_by(Pedido.created_at.desc()).limit(10).all()
-    return render_template('perfil.html', pedidos=pedidos)
+    pedidos = consultas.pedidos_do_usuario(current_user.id, 10)
+    # Minutos até a entrega dos pedidos em andamento, pelo ritmo recente da cozinha
+    previsoes = andamento.estimador().previsoes(pedidos)
+    return render_template('perfil.html', pedidos=pedidos, previsoes=previsoes)
 
-@app.route('/alterar_senha', methods=['POST'])
+@loja.route('/alterar_senha', methods=['POST'])
 @login_required
 def alterar_senha():
     if current_user.is_admin:
         flash('Administradores não podem alterar senha pelo perfil', 'error')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('loja.admin_dashboard'))
     
     senha_atual = request.form.get('senha_atual', '')
     nova_senha = request.form.get('nova_senha', '')
@@ -370,36 +379,45 @@ def alterar_senha():
     
     if not senha_atual or not nova_senha or not confirmar_senha:
         flash('Todos os campos são obrigatórios', 'error')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('loja.perfil'))
     
-    if not current_user.check_password(senha_atual):
+    try:
+        senha_correta = current_user.check_password(senha_atual)
+    except senhas.SenhasOcupadas:
+        flash('Muitos acessos neste momento. Tente novamente em alguns segundos.', 'error')
+        return redirect(url_for('loja.perfil'))
+    if not senha_correta:
         flash('Senha atual incorreta', 'error')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('loja.perfil'))
     
     if not validar_senha(nova_senha):
         flash('A nova senha deve ter pelo menos 6 caracteres', 'error')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('loja.perfil'))
     
     if nova_senha != confirmar_senha:
         flash('As novas senhas não coincidem', 'error')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('loja.perfil'))
     
-    current_user.set_password(nova_senha)
+    try:
+        current_user.set_password(nova_senha)
+    except senhas.SenhasOcupadas:
+        flash('Muitos acessos neste momento. Tente novamente em alguns segundos.', 'error')
+        return redirect(url_for('loja.perfil'))
     db.session.commit()
     
     flash('Senha alterada com sucesso!', 'success')
-    return redirect(url_for('perfil'))
+    return redirect(url_for('loja.perfil'))
 
-@app.route('/meus-enderecos')
+@loja.route('/meus-enderecos')
 @login_required
 def meus_enderecos():
     if current_user.is_admin:
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('loja.admin_dashboard'))
     
     enderecos = Endereco.query.filter_by(user_id=current_user.id).order_by(Endereco.principal.desc()).all()
     return render_template('meus_enderecos.html', enderecos=enderecos)
 
-@app.route('/adicionar-endereco', methods=['POST'])
+@loja.route('/adicionar-endereco', methods=['POST'])
 @login_required
 def adicionar_endereco():
     if current_user.is_admin:
@@ -437,7 +455,7 @@ def adicionar_endereco():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao adicionar endereço: {str(e)}'})
 
-@app.route('/definir-endereco-principal/<int:endereco_id>', methods=['POST'])
+@loja.route('/definir-endereco-principal/<int:endereco_id>', methods=['POST'])
 @login_required
 def definir_endereco_principal(endereco_id):
     if current_user.is_admin:
@@ -457,7 +475,7 @@ def definir_endereco_principal(endereco_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao definir endereço principal: {str(e)}'})
 
-@app.route('/excluir-endereco/<int:endereco_id>', methods=['POST'])
+@loja.route('/excluir-endereco/<int:endereco_id>', methods=['POST'])
 @login_required
 def excluir_endereco(endereco_id):
     if current_user.is_admin:
@@ -476,34 +494,85 @@ def excluir_endereco(endereco_id):
         return jsonify({'success': False, 'message': f'Erro ao excluir endereço: {str(e)}'})
 
 # Rotas administrativas
-@app.route('/admin/dashboard')
+@loja.route('/admin/dashboard')
+@limite_sql(5)
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
-    total_pedidos = Pedido.query.count()
-    pedidos_pendentes = Pedido.query.filter_by(status='pendente').count()
-    pedidos_preparando = Pedido.query.filter_by(status='preparando').count()
-    total_usuarios = User.query.count()
-    pedidos_recentes = Pedido.query.order_by(Pedido.created_at.desc()).limit(5).all()
+    contagens = contadores.ler()
+    pedidos_recentes = consultas.pedidos_recentes(5)
     
     return render_template('admin_dashboard.html',
-                         total_pedidos=total_pedidos,
-                         pedidos_pendentes=pedidos_pendentes,
-                         pedidos_preparando=pedidos_preparando,
-                         total_usuarios=total_usuarios,
+                         total_pedidos=contagens['pedidos'],
+                         pedidos_pendentes=contagens['pedidos:pendente'],
+                         pedidos_preparando=contagens['pedidos:preparando'],
+                         pedidos_prontos=contagens['pedidos:pronto'],
+                         pedidos_entregues=contagens['pedidos:entregue'],
+                         pedidos_cancelados=contagens['pedidos:cancelado'],
+                         total_usuarios=contagens['usuarios'],
                          pedidos_recentes=pedidos_recentes)  # Esssa variiavel tava faltando
 
-@app.route('/admin/criar-pedidos-teste', methods=['GET', 'POST'])
+@loja.route('/admin/relatorios')
+@limite_sql(4)
+@login_required
+def admin_relatorios():
+    if not current_user.is_admin:
+        flash('Acesso negado', 'error')
+        return redirect(url_for('loja.cardapio'))
+    
+    try:
+        desde, ate = relatorios.periodo(request.args)
+    except relatorios.PeriodoInvalido as e:
+        flash(str(e), 'error')
+        desde, ate = relatorios.periodo({})
+    
+    return render_template('admin_relatorios.html', relatorio=relatorios.resumo(desde, ate))
+
+@loja.route('/admin/api/relatorios')
+@limite_sql(3)
+@login_required
+def admin_api_relatorios():
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    
+    try:
+        desde, ate = relatorios.periodo(request.args)
+    except relatorios.PeriodoInvalido as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify(relatorios.resumo(desde, ate))
+
+@loja.route('/admin/cozinha')
+@limite_sql(4)
+@login_required
+def admin_cozinha():
+    if not current_user.is_admin:
+        flash('Acesso negado', 'error')
+        return redirect(url_for('loja.cardapio'))
+    
+    return render_template('admin_cozinha.html', painel=andamento.painel())
+
+@loja.route('/admin/api/cozinha')
+@limite_sql(4)
+@login_required
+def admin_api_cozinha():
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    
+    horas = min(max(1, request.args.get('horas', 12, type=int)), 24)
+    return jsonify(andamento.painel(horas))
+
+@loja.route('/admin/criar-pedidos-teste', methods=['GET', 'POST'])
 @login_required
 def admin_criar_pedidos_teste():
     if not current_user.is_admin:
         if request.method == 'POST':
             return jsonify({'success': False, 'message': 'Acesso negado'})
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
     if request.method == 'GET':
         return render_template('admin_criar_pedidos_teste.html')
@@ -518,89 +587,23 @@ def admin_criar_pedidos_teste():
         if not produtos:
             return jsonify({'success': False, 'message': 'É necessário ter produtos ativos no sistema'})
         
-        # Status possíveis para os pedidos
-        status_list = ['pendente', 'preparando', 'pronto', 'entregue', 'cancelado']
-        formas_pagamento = ['dinheiro', 'cartao', 'pix']
-        
-        from datetime import datetime, timedelta
         import random
+        import dados_teste
         
+        # Mesmas distribuições do `flask seed` (dados_teste.py)
+        agora = datetime.now()
         pedidos_criados = 0
         
         for i in range(30):
             usuario = random.choice(usuarios)
+            data_pedido = dados_teste.data_aleatoria(random, agora, 30)
+            endereco = random.choice(usuario.enderecos) if usuario.enderecos else None
+            dados_pedido, itens = dados_teste.pedido_aleatorio(random, usuario.id, produtos, data_pedido,
+                                                               endereco.id if endereco else None)
             
-            dias_atras = random.randint(0, 30)
-            horas_atras = random.randint(0, 23)
-            minutos_atras = random.randint(0, 59)
-            data_pedido = datetime.now() - timedelta(days=dias_atras, hours=horas_atras, minutes=minutos_atras)
-            
-            pesos_status = [0.3, 0.3, 0.2, 0.15, 0.05]
-            status = random.choices(status_list, weights=pesos_status)[0]
-            
-            forma_pagamento = random.choice(formas_pagamento)
-            
-
-            troco_para = 0.0
-            if forma_pagamento == 'dinheiro' and random.random() > 0.5:  
-                troco_para = float(random.randint(50, 100))
-            
-            observacao = ""
-            if random.random() < 0.3:
-                observacoes = [
-                    "Sem cebola por favor",
-                    "Entregar na portaria",
-                    "Embalar para viagem",
-                    "Adicionar ketchup e mostarda",
-                    "Quero o lanche bem passado",
-                    "Entregar o mais rápido possível",
-                    "Favor não incluir maionese",
-                    "Trocar batata por onion rings"
-                ]
-                observacao = random.choice(observacoes)
-            
-            # PRIMEIRO calcular o total antes de criar o pedido
-            total_pedido = 0.0
-            
-            num_itens = random.randint(1, 4)
-            itens_simulados = []
-            
-            for j in range(num_itens):
-                produto = random.choice(produtos)
-                quantidade = random.randint(1, 3)
-                subtotal = produto.preco * quantidade
-                total_pedido += subtotal
-                
-                itens_simulados.append({
-                    'produto': produto,
-                    'quantidade': quantidade,
-                    'subtotal': subtotal
-                })
-            
-            # AGORA criar o pedido com o total calculado
-            pedido = Pedido(
-                user_id=usuario.id,
-                forma_pagamento=forma_pagamento,
-                troco_para=troco_para,
-                observacao=observacao,
-                status=status,
-                total=total_pedido,  
-                created_at=data_pedido
-            )
-            
+            pedido = Pedido(**dados_pedido)
+            pedido.itens = [PedidoItem(**item) for item in itens]
             db.session.add(pedido)
-            db.session.flush()  
-            
-            # Agora criar os itens reais do pedido
-            for item_simulado in itens_simulados:
-                pedido_item = PedidoItem(
-                    pedido_id=pedido.id,
-                    produto_id=item_simulado['produto'].id,
-                    quantidade=item_simulado['quantidade'],
-                    observacao=f"Observação do item" if random.random() < 0.2 else "",
-                    preco_unitario=item_simulado['produto'].preco
-                )
-                db.session.add(pedido_item)
             
             pedidos_criados += 1
         
@@ -615,41 +618,89 @@ def admin_criar_pedidos_teste():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao criar pedidos de teste: {str(e)}'}), 500
 
-@app.route('/admin/pedidos')
+@loja.route('/admin/pedidos')
+@limite_sql(5)
 @login_required
 def admin_pedidos():
     if not current_user.is_admin:
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
-    page = request.args.get('page', 1, type=int)
     ordenacao = request.args.get('ordenacao', 'mais_novos')
+    page = request.args.get('page', type=int)
+    try:
+        filtros = consultas.filtros_pedidos(request.args)
+    except consultas.FiltroInvalido as e:
+        flash(str(e), 'error')
+        filtros = consultas.SEM_FILTROS
     
-    if ordenacao == 'mais_antigos':
-        order_by = Pedido.created_at.asc()
-    else:  
-        order_by = Pedido.created_at.desc()
+    # Contagens por status e forma de pagamento em uma consulta agrupada
+    facetas = consultas.facetas_pedidos(filtros)
+    contexto = dict(ordenacao=ordenacao,
+                    filtros=filtros,
+                    filtros_url=consultas.parametros_url(filtros),
+                    facetas=facetas)
+    pedidos_query = consultas.filtrar_pedidos(consultas.pedidos_com_detalhes(), filtros)
     
-    pedidos_query = Pedido.query.order_by(order_by)
-    pagination = pedidos_query.paginate(page=page, per_page=10, error_out=False)
-    pedidos = pagination.items
+    # Links antigos com ?page=N continuam funcionando (OFFSET + COUNT)
+    if page is not None:
+        order_by = Pedido.created_at.asc() if ordenacao == 'mais_antigos' else Pedido.created_at.desc()
+        pagination = pedidos_query.order_by(order_by).paginate(page=page, per_page=10, error_out=False)
+        return render_template('admin_pedidos.html',
+                             pedidos=pagination.items,
+                             pagination=pagination,
+                             pagina=None,
+                             **contexto)
+    
+    pagina = consultas.paginar_pedidos(
+        pedidos_query,
+        ordenacao=ordenacao,
+        cursor=request.args.get('cursor'),
+        por_pagina=10,
+        contar=request.args.get('total') == '1' and filtros == consultas.SEM_FILTROS
+    )
     
     return render_template('admin_pedidos.html', 
-                         pedidos=pedidos, 
-                         pagination=pagination,
-                         ordenacao=ordenacao)
+                         pedidos=pagina.itens, 
+                         pagination=None,
+                         pagina=pagina,
+                         **contexto)
 
-@app.route('/admin/pedido/<int:pedido_id>')
+@loja.route('/admin/pedidos/exportar')
+@login_required
+def admin_exportar_pedidos():
+    if not current_user.is_admin:
+        flash('Acesso negado', 'error')
+        return redirect(url_for('loja.cardapio'))
+    
+    formato = request.args.get('formato', 'csv')
+    if formato not in exportacao.FORMATOS:
+        return jsonify({'success': False, 'message': 'Formato inválido (use csv ou ndjson)'}), 400
+    try:
+        filtros = consultas.filtros_pedidos(request.args)
+    except consultas.FiltroInvalido as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    # Gerado enquanto é enviado, lote a lote; a sessão fica aberta até o fim do stream
+    corpo = stream_with_context(exportacao.GERADORES[formato](filtros))
+    resposta = current_app.response_class(corpo, content_type=exportacao.FORMATOS[formato])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{exportacao.nome_arquivo(formato, filtros)}"'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    resposta.cache_control.no_store = True
+    return resposta
+
+@loja.route('/admin/pedido/<int:pedido_id>')
+@limite_sql(4)
 @login_required
 def admin_detalhes_pedido(pedido_id):
     if not current_user.is_admin:
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
-    pedido = Pedido.query.get_or_404(pedido_id)
+    pedido = consultas.pedido_detalhado_or_404(pedido_id)
     return render_template('admin_detalhes_pedido.html', pedido=pedido)
 
-@app.route('/admin/pedido/<int:pedido_id>/status', methods=['POST'])
+@loja.route('/admin/pedido/<int:pedido_id>/status', methods=['POST'])
 @login_required
 def admin_atualizar_status(pedido_id):
     if not current_user.is_admin:
@@ -658,14 +709,14 @@ def admin_atualizar_status(pedido_id):
     pedido = Pedido.query.get_or_404(pedido_id)
     novo_status = request.json.get('status')
     
-    if novo_status in ['pendente', 'preparando', 'pronto', 'entregue', 'cancelado']:
-        pedido.status = novo_status
-        db.session.commit()
-        return jsonify({'success': True, 'message': 'Status atualizado'})
-    
-    return jsonify({'success': False, 'message': 'Status inválido'})
+    try:
+        andamento.mudar_status(pedido, novo_status)
+    except andamento.TransicaoInvalida as e:
+        return jsonify({'success': False, 'message': str(e)})
+    db.session.commit()
+    return jsonify({'success': True, 'message': 'Status atualizado'})
 
-@app.route('/admin/pedido/<int:pedido_id>/excluir', methods=['POST'])
+@loja.route('/admin/pedido/<int:pedido_id>/excluir', methods=['POST'])
 @login_required
 def admin_excluir_pedido(pedido_id):
     if not current_user.is_admin:
@@ -686,28 +737,28 @@ def admin_excluir_pedido(pedido_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao excluir pedido: {str(e)}'}), 500
 
-@app.route('/admin/usuarios')
+@loja.route('/admin/usuarios')
 @login_required
 def admin_usuarios():
     if not current_user.is_admin:
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
     usuarios = User.query.all()
     return render_template('admin_usuarios.html', usuarios=usuarios)
 
-@app.route('/admin/produtos')
+@loja.route('/admin/produtos')
 @login_required
 def admin_produtos():
     if not current_user.is_admin:
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
     categorias = Categoria.query.all()
     produtos = Produto.query.all()
     return render_template('admin_produtos.html', categorias=categorias, produtos=produtos)
 
-@app.route('/admin/produto/adicionar', methods=['POST'])
+@loja.route('/admin/produto/adicionar', methods=['POST'])
 @login_required
 def admin_adicionar_produto():
     if not current_user.is_admin:
@@ -744,7 +795,7 @@ def admin_adicionar_produto():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao adicionar produto: {str(e)}'})
 
-@app.route('/admin/produto/<int:produto_id>/editar', methods=['POST'])
+@loja.route('/admin/produto/<int:produto_id>/editar', methods=['POST'])
 @login_required
 def admin_editar_produto(produto_id):
     if not current_user.is_admin:
@@ -771,27 +822,23 @@ def admin_editar_produto(produto_id):
         produto.preco = float(preco)
         produto.categoria_id = int(categoria_id)
         
+        imagem_antiga = produto.imagem
         if remover_imagem and produto.imagem:
-            old_image_path = os.path.join(app.config['UPLOAD_FOLDER'], produto.imagem)
-            if os.path.exists(old_image_path):
-                os.remove(old_image_path)
             produto.imagem = None
         elif imagem and imagem.filename:
-            if produto.imagem:
-                old_image_path = os.path.join(app.config['UPLOAD_FOLDER'], produto.imagem)
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-            
-            imagem_filename = save_image(imagem)
-            produto.imagem = imagem_filename
+            produto.imagem = save_image(imagem)
         
         db.session.commit()
+        
+        # Arquivos antigos só saem depois do commit (e se nenhum outro produto usa)
+        if imagem_antiga and imagem_antiga != produto.imagem:
+            remover_imagem_sem_uso(imagem_antiga)
         return jsonify({'success': True, 'message': 'Produto atualizado com sucesso'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao atualizar produto: {str(e)}'})
 
-@app.route('/admin/produto/<int:produto_id>/toggle', methods=['POST'])
+@loja.route('/admin/produto/<int:produto_id>/toggle', methods=['POST'])
 @login_required
 def admin_toggle_produto(produto_id):
     if not current_user.is_admin:
@@ -804,17 +851,17 @@ def admin_toggle_produto(produto_id):
     status = 'ativado' if produto.ativo else 'desativado'
     return jsonify({'success': True, 'message': f'Produto {status} com sucesso'})
 
-@app.route('/admin/categorias')
+@loja.route('/admin/categorias')
 @login_required
 def admin_categorias():
     if not current_user.is_admin:
         flash('Acesso negado', 'error')
-        return redirect(url_for('cardapio'))
+        return redirect(url_for('loja.cardapio'))
     
     categorias = Categoria.query.all()
     return render_template('admin_categorias.html', categorias=categorias)
 
-@app.route('/admin/categoria/adicionar', methods=['POST'])
+@loja.route('/admin/categoria/adicionar', methods=['POST'])
 @login_required
 def admin_adicionar_categoria():
     if not current_user.is_admin:
@@ -838,7 +885,7 @@ def admin_adicionar_categoria():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao adicionar categoria: {str(e)}'})
 
-@app.route('/admin/categoria/<int:categoria_id>/editar', methods=['POST'])
+@loja.route('/admin/categoria/<int:categoria_id>/editar', methods=['POST'])
 @login_required
 def admin_editar_categoria(categoria_id):
     if not current_user.is_admin:
@@ -865,7 +912,7 @@ def admin_editar_categoria(categoria_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro ao atualizar categoria: {str(e)}'})
 
-@app.route('/admin/categoria/<int:categoria_id>/toggle', methods=['POST'])
+@loja.route('/admin/categoria/<int:categoria_id>/toggle', methods=['POST'])
 @login_required
 def admin_toggle_categoria(categoria_id):
     if not current_user.is_admin:
@@ -888,69 +935,188 @@ def admin_toggle_categoria(categoria_id):
     return jsonify({'success': True, 'message': f'Categoria {status} com sucesso'})
 
 # API endpoints
-@app.route('/api/carrinho_count')
+@loja.route('/api/carrinho_count')
 @login_required
 def api_carrinho_count():
-    carrinho_itens = session.get('carrinho', [])
-    return jsonify({'count': len(carrinho_itens)})
+    return jsonify({'count': carrinhos.store().contar(current_user.id)})
+
+@loja.route('/admin/metrics')
+def admin_metrics():
+    # Formato de texto do Prometheus; acesso de admin logado ou METRICAS_TOKEN
+    return metricas.resposta()
+
+# Acompanhamento em tempo real (Server-Sent Events)
+def resposta_sse(user_id):
+    try:
+        ultimo_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        ultimo_id = None
+    
+    broker = eventos.broker()
+    try:
+        assinatura = broker.assinar(user_id=user_id, ultimo_id=ultimo_id)
+    except eventos.LimiteAssinantes:
+        return current_app.response_class('Muitas conexões abertas, tente novamente em instantes.',
+                                  status=503, headers={'Retry-After': '10'})
+    
+    config = current_app.config
+    resposta = current_app.response_class(broker.stream(assinatura, config['SSE_HEARTBEAT_SEGUNDOS'],
+                                                        config['SSE_DURACAO_MAXIMA']),
+                                  mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    resposta.call_on_close(lambda: broker.cancelar(assinatura))
+    return resposta
+
+@loja.route('/admin/stream')
+@login_required
+def admin_stream():
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    return resposta_sse(user_id=None)
+
+@loja.route('/pedidos/stream')
+@login_required
+def stream_pedidos():
+    return resposta_sse(user_id=current_user.id)
 
 # Error handlers
-@app.errorhandler(404)
+@loja.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@loja.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
-# Inicialização do banco de dados
-def init_db():
-    with app.app_context():
-        db.drop_all()  
-        db.create_all()  
-        
-        # Criar usuário admin padrão se não existir
-        if not User.query.filter_by(username='admin').first():
-            admin = User(
-                username='admin',
-                email='admin@juniorfood.com',
-                is_admin=True
-            )
-            admin.set_password('admin123')
-            db.session.add(admin)
-            
-            categorias = [
-                Categoria(nome='Lanches', descricao='Deliciosos lanches artesanais'),
-                Categoria(nome='Pizzas', descricao='Pizzas saborosas de diversos sabores'),
-                Categoria(nome='Bebidas', descricao='Bebidas geladas e refrescantes'),
-                Categoria(nome='Sobremesas', descricao='Doces e sobremesas irresistíveis'),
-                Categoria(nome='Porções', descricao='Porções para compartilhar')
-            ]
-            
-            for categoria in categorias:
-                db.session.add(categoria)
-            
-            produtos = [
-                Produto(nome='X-Burger', descricao='Pão, hambúrguer, queijo, alface, tomate', preco=15.90, categoria_id=1),
-                Produto(nome='X-Bacon', descricao='Pão, hambúrguer, queijo, bacon, alface, tomate', preco=18.90, categoria_id=1),
-                Produto(nome='X-Tudo', descricao='Pão, 2 hambúrgueres, queijo, presunto, bacon, ovo, alface, tomate', preco=22.90, categoria_id=1),
-                Produto(nome='Pizza Calabresa', descricao='Molho, queijo, calabresa, cebola, azeitonas', preco=35.90, categoria_id=2),
-                Produto(nome='Pizza Frango Catupiry', descricao='Molho, queijo, frango desfiado, catupiry', preco=38.90, categoria_id=2),
-                Produto(nome='Coca-Cola', descricao='Lata 350ml', preco=5.90, categoria_id=3),
-                Produto(nome='Suco Natural', descricao='Laranja, limão ou abacaxi 500ml', preco=8.90, categoria_id=3),
-                Produto(nome='Sorvete', descricao='Casquinha com 2 bolas', preco=8.90, categoria_id=4),
-                Produto(nome='Brownie', descricao='Brownie com sorvete e calda de chocolate', preco=12.90, categoria_id=4),
-                Produto(nome='Batata Frita', descricao='Porção de batata frita crocante', preco=15.90, categoria_id=5),
-                Produto(nome='Onion Rings', descricao='Anéis de cebola empanados', preco=14.90, categoria_id=5),
-            ]
-            
-            for produto in produtos:
-                db.session.add(produto)
-            
-            db.session.commit()
-            print("Banco de dados JUNIOR'S FOOD inicializado com dados de exemplo!")
+# Inicialização do banco de dados. Nunca apaga nada (a não ser com
+# apagar=True): cria as tabelas e índices que faltam e os dados de exemplo só
+# se ainda não existirem, então pode rodar a cada deploy
+def criar_dados_exemplo():
+    """Admin padrão e cardápio de exemplo; retorna o que foi criado."""
+    criados = []
+    if not User.query.filter_by(username='admin').first():
+        admin = User(
+            username='admin',
+            email='admin@juniorfood.com',
+            is_admin=True
+        )
+        admin.set_password('admin123')
+        db.session.add(admin)
+        criados.append('usuário admin')
+    
+    if Categoria.query.first() is None:
+        categorias = {
+            'Lanches': Categoria(nome='Lanches', descricao='Deliciosos lanches artesanais'),
+            'Pizzas': Categoria(nome='Pizzas', descricao='Pizzas saborosas de diversos sabores'),
+            'Bebidas': Categoria(nome='Bebidas', descricao='Bebidas geladas e refrescantes'),
+            'Sobremesas': Categoria(nome='Sobremesas', descricao='Doces e sobremesas irresistíveis'),
+            'Porções': Categoria(nome='Porções', descricao='Porções para compartilhar'),
+        }
+        
+        produtos = [
+            Produto(nome='X-Burger', descricao='Pão, hambúrguer, queijo, alface, tomate', preco=15.90, categoria=categorias['Lanches']),
+            Produto(nome='X-Bacon', descricao='Pão, hambúrguer, queijo, bacon, alface, tomate', preco=18.90, categoria=categorias['Lanches']),
+            Produto(nome='X-Tudo', descricao='Pão, 2 hambúrgueres, queijo, presunto, bacon, ovo, alface, tomate', preco=22.90, categoria=categorias['Lanches']),
+            Produto(nome='Pizza Calabresa', descricao='Molho, queijo, calabresa, cebola, azeitonas', preco=35.90, categoria=categorias['Pizzas']),
+            Produto(nome='Pizza Frango Catupiry', descricao='Molho, queijo, frango desfiado, catupiry', preco=38.90, categoria=categorias['Pizzas']),
+            Produto(nome='Coca-Cola', descricao='Lata 350ml', preco=5.90, categoria=categorias['Bebidas']),
+            Produto(nome='Suco Natural', descricao='Laranja, limão ou abacaxi 500ml', preco=8.90, categoria=categorias['Bebidas']),
+            Produto(nome='Sorvete', descricao='Casquinha com 2 bolas', preco=8.90, categoria=categorias['Sobremesas']),
+            Produto(nome='Brownie', descricao='Brownie com sorvete e calda de chocolate', preco=12.90, categoria=categorias['Sobremesas']),
+            Produto(nome='Batata Frita', descricao='Porção de batata frita crocante', preco=15.90, categoria=categorias['Porções']),
+            Produto(nome='Onion Rings', descricao='Anéis de cebola empanados', preco=14.90, categoria=categorias['Porções']),
+        ]
+        
+        db.session.add_all(list(categorias.values()) + produtos)
+        criados.append('cardápio de exemplo')
+    
+    db.session.commit()
+    return criados
+
+def init_db(apagar=False):
+    """Prepara o banco da app atual (requer app context); retorna o que foi criado."""
+    import migracoes
+    if apagar:
+        db.drop_all()
+    return migracoes.migrar() + criar_dados_exemplo()
+
+@click.command('init-db')
+@click.option('--apagar', is_flag=True, help='Apaga todas as tabelas e dados antes de criar (pede confirmação).')
+@with_appcontext
+def init_db_command(apagar):
+    """Cria tabelas, índices e dados de exemplo que faltarem, sem apagar nada."""
+    if apagar:
+        click.confirm('Isto apaga TODOS os dados do banco. Continuar?', abort=True)
+    criados = init_db(apagar=apagar)
+    for criado in criados:
+        click.echo(f'- {criado}')
+    if not criados:
+        click.echo('Banco já estava pronto; nada foi alterado.')
+
+class ComandoAdiado(click.Command):
+    """Comando de CLI cujo módulo só é importado quando o comando roda."""
+
+    def __init__(self, nome, caminho, ajuda):
+        super().__init__(nome, help=ajuda)
+        self.caminho = caminho
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        modulo, atributo = self.caminho.split(':')
+        comando = getattr(importlib.import_module(modulo), atributo)
+        return comando.make_context(info_name, args, parent=parent, **extra)
+
+# Ferramentas que só rodam pela linha de comando (benchmark, seed, migração,
+# planos): nem os workers nem os outros comandos pagam pelo import delas
+COMANDOS_ADIADOS = [
+    ('benchmark', 'benchmark:benchmark_command',
+     'Mede latência, SQL, linhas lidas e memória dos endpoints principais.'),
+    ('seed', 'dados_teste:seed_command',
+     'Gera clientes, endereços e pedidos sintéticos em massa para testes de carga.'),
+    ('migrar', 'migracoes:migrar_command',
+     'Atualiza o schema do banco existente sem apagar dados.'),
+    ('verificar-planos', 'planos_consulta:verificar_planos_command',
+     'Falha se alguma consulta crítica não usar índice (SQLite).'),
+]
+
+def create_app(config=None):
+    """Monta a aplicação.
+
+    `config` pode ser uma classe/objeto de configuração (padrão: config.Config)
+    ou um dict com valores que sobrescrevem os de Config (útil em testes).
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    # As opções do pool dependem do banco: recalcula para a URI final, a
+    # menos que quem chamou tenha passado as próprias
+    if app.config['SQLALCHEMY_ENGINE_OPTIONS'] is Config.SQLALCHEMY_ENGINE_OPTIONS:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    
+    db.init_app(app)
+    metricas.init_app(app)
+    imagens.init_app(app)
+    estaticos.init_app(app)
+    compressao.init_app(app)
+    andamento.init_app(app)
+    banco.init_app(app)
+    carrinhos.init_app(app)
+    contadores.init_app(app)
+    orcamento_sql.init_app(app)
+    relatorios.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(loja)
+    app.cli.add_command(init_db_command)
+    for nome, caminho, ajuda in COMANDOS_ADIADOS:
+        app.cli.add_command(ComandoAdiado(nome, caminho, ajuda))
+    return app
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
\ No newline at end of file
+    # Servidor de desenvolvimento. Em produção use wsgi.py em um processo com
+    # threads (gunicorn -k gthread, veja wsgi.py) e prepare o banco antes com
+    # `flask --app app init-db`
+    create_app().run(debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
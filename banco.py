@@ -0,0 +1,57 @@
+import importlib
+
+from sqlalchemy import event
+
+from models import db
+
+# Perfil de conexão do banco. Para SQLite, cada conexão nova do pool recebe
+# os PRAGMAs de config.SQLITE_PRAGMAS (WAL, busy_timeout, cache...), que
+# evitam o "database is locked" com vários pedidos e atualizações ao mesmo
+# tempo. Em PostgreSQL nada disso se aplica e as conexões seguem o padrão.
+# Aqui também fica somar(), o upsert que os contadores e os rollups de
+# relatórios usam para somar valores sem corrida entre workers.
+
+
+def _aplicar_pragmas(pragmas):
+    def aplicar(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        try:
+            for nome, valor in pragmas.items():
+                cursor.execute(f'PRAGMA {nome}={valor}')
+        finally:
+            cursor.close()
+    return aplicar
+
+
+# Só o dialeto em uso é importado (o do PostgreSQL custa dezenas de ms na inicialização)
+_DIALETOS_UPSERT = ('sqlite', 'postgresql')
+
+
+def somar(conexao, tabela, linhas, chaves, campos):
+    """Soma `campos` nas linhas de `tabela` (identificadas por `chaves`), criando as que não existem."""
+    if not linhas:
+        return
+    if conexao.dialect.name in _DIALETOS_UPSERT:
+        # Um único INSERT ... ON CONFLICT DO UPDATE em lote, qualquer que seja o número de linhas
+        dialeto = importlib.import_module(f'sqlalchemy.dialects.{conexao.dialect.name}')
+        stmt = dialeto.insert(tabela)
+        stmt = stmt.on_conflict_do_update(index_elements=[tabela.c[chave] for chave in chaves],
+                                          set_={campo: tabela.c[campo] + stmt.excluded[campo] for campo in campos})
+        conexao.execute(stmt, linhas)
+        return
+    for linha in linhas:
+        resultado = conexao.execute(
+            tabela.update()
+            .where(*[tabela.c[chave] == linha[chave] for chave in chaves])
+            .values({campo: tabela.c[campo] + linha[campo] for campo in campos})
+        )
+        if resultado.rowcount == 0:
+            conexao.execute(tabela.insert().values(linha))
+
+
+def init_app(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and pragmas:
+                event.listen(engine, 'connect', _aplicar_pragmas(pragmas))
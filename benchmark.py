@@ -0,0 +1,279 @@
+import contextvars
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, select
+
+import dados_teste
+from models import db, Categoria, Endereco, Produto, User
+from orcamento_sql import cliente_com_mais_pedidos, contar_sql
+
+try:
+    import resource
+except ImportError:  # só existe em Unix; no Windows o pico de RSS fica de fora
+    resource = None
+
+# Benchmark dos endpoints principais contra bancos semeados de tamanhos
+# crescentes. Cada tamanho roda em um subprocesso próprio (`flask benchmark
+# --interno`) com DATABASE_URL apontando para o banco daquele tamanho, que é
+# gerado uma vez com `flask seed` e reaproveitado. Por requisição mede
+# latência (p50/p95/p99), instruções SQL e linhas lidas do SQLite; o pico de
+# memória vem de uma segunda passada com tracemalloc, que não entra nas
+# latências. O resultado vai para JSON e pode ser comparado com um baseline.
+
+METRICAS = ('p50_ms', 'p95_ms', 'p99_ms', 'sql', 'linhas', 'memoria_pico_kib')
+
+_local = threading.local()
+
+
+# Linhas lidas: o row_factory do sqlite3 é chamado para cada linha entregue
+def _contar_linha(cursor, linha):
+    if getattr(_local, 'linhas', None) is not None:
+        _local.linhas += 1
+    return linha
+
+
+def _instalar_contador_linhas(engine):
+    def conectar(conexao_dbapi, registro):
+        if isinstance(conexao_dbapi, sqlite3.Connection):
+            conexao_dbapi.row_factory = _contar_linha
+    event.listen(engine, 'connect', conectar)
+    engine.dispose()  # conexões já abertas não têm o row_factory
+
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicao = max(0, min(len(ordenados) - 1, -(-len(ordenados) * p // 100) - 1))
+    return ordenados[int(posicao)]
+
+
+def _preparar_banco(pedidos, semente):
+    """Cria o catálogo e semeia o banco do subprocesso se ele ainda estiver vazio."""
+    db.create_all()
+    if db.session.execute(select(User.id).limit(1)).first() is None:
+        from app import init_db
+        init_db()
+    if db.session.execute(select(Endereco.id).limit(1)).first() is None:
+        db.session.remove()
+        click.echo(f'Semeando {pedidos} pedidos...', err=True)
+        vazao = dados_teste.semear(max(50, pedidos // 20), pedidos, semente=semente,
+                                   data_final=datetime(2025, 12, 31, 23, 59, 59))
+        click.echo(vazao.relatorio(), err=True)
+    db.session.remove()
+
+
+def _cenarios(ids):
+    # (nome, usuário, método, url, dados, preparo não medido)
+    carrinho = {'produto_id': ids['produto_id'], 'quantidade': 2}
+    pedido = {'forma_pagamento': 'pix', 'endereco_entrega_id': ids['endereco_id']}
+    return [
+        ('cardapio', 'cliente', 'GET', '/cardapio', None, None),
+        ('api_produtos', 'cliente', 'GET', f'/api/produtos/{ids["categoria_id"]}', None, None),
+        ('perfil', 'cliente', 'GET', '/perfil', None, None),
+        ('admin_dashboard', 'admin', 'GET', '/admin/dashboard', None, None),
+        ('admin_pedidos', 'admin', 'GET', '/admin/pedidos', None, None),
+        ('finalizar_pedido', 'cliente', 'POST', '/finalizar_pedido', pedido,
+         ('POST', '/adicionar_carrinho', carrinho)),
+    ]
+
+
+def _cliente_logado(app, user_id):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['_user_id'] = str(user_id)
+        sessao['_fresh'] = True
+    return cliente
+
+
+def _requisitar(cliente, metodo, url, dados):
+    resposta = cliente.open(url, method=metodo, data=dados)
+    resposta.close()
+    return resposta.status_code
+
+
+def _medir(app, ids, repeticoes, aquecimento, passadas_memoria):
+    clientes = {'cliente': _cliente_logado(app, ids['cliente_id']),
+                'admin': _cliente_logado(app, ids['admin_id'])}
+    resultados = {}
+    for nome, usuario, metodo, url, dados, preparo in _cenarios(ids):
+        cliente = clientes[usuario]
+        latencias, instrucoes, linhas, status = [], [], [], set()
+        for rodada in range(aquecimento + repeticoes):
+            if preparo:
+                _requisitar(cliente, *preparo)
+            _local.linhas = 0
+            with contar_sql() as contador:
+                inicio = time.perf_counter()
+                status.add(_requisitar(cliente, metodo, url, dados))
+                decorrido = time.perf_counter() - inicio
+            if rodada >= aquecimento:
+                latencias.append(decorrido * 1000)
+                instrucoes.append(contador.total)
+                linhas.append(_local.linhas)
+            _local.linhas = None
+
+        # Segunda passada só para memória: tracemalloc deixa tudo mais lento
+        tracemalloc.start()
+        pico = 0
+        for _ in range(passadas_memoria):
+            if preparo:
+                _requisitar(cliente, *preparo)
+            tracemalloc.reset_peak()
+            _requisitar(cliente, metodo, url, dados)
+            pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        resultados[nome] = {
+            'p50_ms': round(percentil(latencias, 50), 3),
+            'p95_ms': round(percentil(latencias, 95), 3),
+            'p99_ms': round(percentil(latencias, 99), 3),
+            'media_ms': round(sum(latencias) / len(latencias), 3),
+            'sql': max(instrucoes),
+            'linhas': max(linhas),
+            'memoria_pico_kib': round(pico / 1024, 1),
+            'status': sorted(status),
+        }
+        click.echo(f'  {nome:<18} p50 {resultados[nome]["p50_ms"]:>8.2f}ms  p95 {resultados[nome]["p95_ms"]:>8.2f}ms  '
+                   f'sql {resultados[nome]["sql"]:>3}  linhas {resultados[nome]["linhas"]:>6}', err=True)
+    return resultados
+
+
+def _executar_interno(pedidos, semente, repeticoes, aquecimento, passadas_memoria, saida):
+    app = current_app._get_current_object()
+    _preparar_banco(pedidos, semente)
+
+    ids = {
+        'admin_id': db.session.execute(select(User.id).where(User.is_admin == True)
+                                       .order_by(User.id).limit(1)).scalar(),
+        'cliente_id': cliente_com_mais_pedidos(),
+        'categoria_id': db.session.execute(select(Categoria.id).where(Categoria.ativo == True)
+                                           .order_by(Categoria.id).limit(1)).scalar(),
+        'produto_id': db.session.execute(select(Produto.id).where(Produto.ativo == True)
+                                         .order_by(Produto.id).limit(1)).scalar(),
+    }
+    ids['endereco_id'] = db.session.execute(select(Endereco.id).where(Endereco.user_id == ids['cliente_id'])
+                                            .order_by(Endereco.id).limit(1)).scalar()
+    db.session.remove()
+    _instalar_contador_linhas(db.engine)
+
+    resultados = contextvars.Context().run(_medir, app, ids, repeticoes, aquecimento, passadas_memoria)
+    resultados['_processo'] = {'rss_pico_kib': _rss_pico_kib()}
+    with open(saida, 'w') as arquivo:
+        json.dump(resultados, arquivo)
+
+
+def _rss_pico_kib():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == 'darwin' else pico  # no macOS vem em bytes
+
+
+def _rodar_tamanho(app, pedidos, diretorio, semente, repeticoes, aquecimento, passadas_memoria):
+    banco = os.path.abspath(os.path.join(diretorio, f'pedidos_{pedidos}_s{semente}_v{dados_teste.VERSAO_DADOS}.db'))
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as arquivo:
+        saida = arquivo.name
+    # Pedidos gravados na própria requisição: linhas lidas e instruções do
+    # INSERT ficam na thread medida, e requisições em série não formam lotes
+    ambiente = dict(os.environ, DATABASE_URL=f'sqlite:///{banco}',
+                    CONTADORES_RECONCILIAR_SEGUNDOS='0', CATALOGO_TTL='3600', PEDIDOS_GRUPO='0')
+    comando = [sys.executable, '-m', 'flask', '--app', app.import_name, 'benchmark', '--interno',
+               '--tamanhos', str(pedidos), '--semente', str(semente), '--repeticoes', str(repeticoes),
+               '--aquecimento', str(aquecimento), '--passadas-memoria', str(passadas_memoria),
+               '--saida', saida]
+    try:
+        subprocess.run(comando, env=ambiente, check=True)
+        with open(saida) as arquivo:
+            return json.load(arquivo)
+    except subprocess.CalledProcessError as erro:
+        raise click.ClickException(f'Benchmark com {pedidos} pedidos falhou (código {erro.returncode})')
+    finally:
+        os.unlink(saida)
+
+
+def comparar(atual, baseline, tolerancia):
+    """Lista de regressões (tamanho, endpoint, métrica, antes, depois) acima da tolerância."""
+    regressoes = []
+    for tamanho, endpoints in atual['tamanhos'].items():
+        anteriores = baseline.get('tamanhos', {}).get(tamanho)
+        if not anteriores:
+            continue
+        for endpoint, metricas in endpoints.items():
+            if endpoint.startswith('_') or endpoint not in anteriores:
+                continue
+            for metrica in METRICAS:
+                antes, depois = anteriores[endpoint].get(metrica), metricas.get(metrica)
+                if antes is None or depois is None:
+                    continue
+                # Contagem de SQL é exata; o resto tem ruído e usa a tolerância
+                limite = antes if metrica == 'sql' else antes * (1 + tolerancia)
+                if depois > limite:
+                    regressoes.append((tamanho, endpoint, metrica, antes, depois))
+    return regressoes
+
+
+@click.command('benchmark')
+@click.option('--tamanhos', default='1000,100000,1000000', show_default=True,
+              help='Quantidades de pedidos dos bancos, separadas por vírgula.')
+@click.option('--diretorio', default=None, help='Onde guardar os bancos semeados (padrão: instance/benchmark).')
+@click.option('--semente', default=42, show_default=True)
+@click.option('--repeticoes', default=50, show_default=True, help='Requisições medidas por endpoint.')
+@click.option('--aquecimento', default=5, show_default=True, help='Requisições descartadas antes de medir.')
+@click.option('--passadas-memoria', default=3, show_default=True, help='Requisições com tracemalloc por endpoint.')
+@click.option('--saida', default='benchmark.json', show_default=True, help='Arquivo JSON com os resultados.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='JSON de uma execução anterior para comparar.')
+@click.option('--tolerancia', default=0.2, show_default=True,
+              help='Piora relativa aceita em latência, linhas e memória (0.2 = 20%).')
+@click.option('--interno', is_flag=True, hidden=True)
+@with_appcontext
+def benchmark_command(tamanhos, diretorio, semente, repeticoes, aquecimento, passadas_memoria,
+                      saida, baseline, tolerancia, interno):
+    """Mede latência, SQL, linhas lidas e memória dos endpoints principais."""
+    app = current_app._get_current_object()
+    tamanhos = [int(t) for t in tamanhos.split(',') if t.strip()]
+    if interno:
+        _executar_interno(tamanhos[0], semente, repeticoes, aquecimento, passadas_memoria, saida)
+        return
+
+    diretorio = diretorio or os.path.join(app.instance_path, 'benchmark')
+    os.makedirs(diretorio, exist_ok=True)
+    resultado = {
+        'gerado_em': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeticoes': repeticoes,
+        'tamanhos': {},
+    }
+    for pedidos in tamanhos:
+        click.echo(f'== {pedidos} pedidos')
+        resultado['tamanhos'][str(pedidos)] = _rodar_tamanho(app, pedidos, diretorio, semente, repeticoes,
+                                                             aquecimento, passadas_memoria)
+
+    with open(saida, 'w') as arquivo:
+        json.dump(resultado, arquivo, indent=2)
+    click.echo(f'Resultados gravados em {saida}')
+
+    if baseline:
+        with open(baseline) as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), tolerancia)
+        for tamanho, endpoint, metrica, antes, depois in regressoes:
+            click.echo(f'REGRESSÃO {tamanho:>8} pedidos  {endpoint:<18} {metrica:<17} {antes} -> {depois}')
+        if regressoes:
+            raise click.ClickException(f'{len(regressoes)} regressão(ões) em relação a {baseline}')
+        click.echo(f'Nenhuma regressão em relação a {baseline}.')
@@ -0,0 +1,174 @@
+import re
+import unicodedata
+import weakref
+from collections import namedtuple
+
+from sqlalchemy import column, event, func, literal_column, or_, select, table
+
+from models import db, Categoria, Produto
+
+# Busca de produtos no servidor com um índice FTS5 do SQLite. O tokenizador
+# unicode61 com remove_diacritics 2 dobra os acentos tanto no índice quanto na
+# consulta ("pao" acha "Pão"), e cada palavra digitada vira um prefixo
+# ("calab" acha "Calabresa"). O plural também é dobrado, do lado da consulta:
+# cada palavra é buscada no singular e no plural (ão/ões/ães/ãos, s final),
+# então "porcao" acha a categoria "Porções" e "batatas" acha "Batata". A
+# tabela produto_busca guarda
+# nome, descrição e nome da categoria de cada produto e é mantida por triggers
+# em produto e categoria, então nenhum caminho de escrita precisa lembrar
+# dela. Os resultados vêm ordenados por relevância (bm25, com peso maior para
+# o nome). Em bancos sem FTS5 (PostgreSQL) a busca cai para LIKE.
+
+TABELA = 'produto_busca'
+PESOS = (10.0, 2.0, 1.0)  # nome, descrição, categoria
+POR_PAGINA = 20
+POR_PAGINA_MAXIMO = 50
+
+ResultadoBusca = namedtuple('ResultadoBusca', 'produto_ids tem_mais')
+
+_CRIAR = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5(
+        nome, descricao, categoria,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA}_produto_ai AFTER INSERT ON produto BEGIN
+        INSERT INTO {TABELA} (rowid, nome, descricao, categoria)
+        VALUES (new.id, new.nome, coalesce(new.descricao, ''),
+                coalesce((SELECT nome FROM categoria WHERE id = new.categoria_id), ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA}_produto_au AFTER UPDATE OF nome, descricao, categoria_id ON produto BEGIN
+        UPDATE {TABELA}
+        SET nome = new.nome, descricao = coalesce(new.descricao, ''),
+            categoria = coalesce((SELECT nome FROM categoria WHERE id = new.categoria_id), '')
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA}_produto_ad AFTER DELETE ON produto BEGIN
+        DELETE FROM {TABELA} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA}_categoria_au AFTER UPDATE OF nome ON categoria BEGIN
+        UPDATE {TABELA} SET categoria = new.nome
+        WHERE rowid IN (SELECT id FROM produto WHERE categoria_id = new.id);
+    END""",
+]
+
+_REINDEXAR = [
+    f'DELETE FROM {TABELA}',
+    f"""INSERT INTO {TABELA} (rowid, nome, descricao, categoria)
+        SELECT produto.id, produto.nome, coalesce(produto.descricao, ''), coalesce(categoria.nome, '')
+        FROM produto LEFT JOIN categoria ON categoria.id = produto.categoria_id""",
+]
+
+_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+_indice = table(TABELA, column('rowid'))
+_ativo = weakref.WeakKeyDictionary()  # engine -> índice FTS disponível
+
+
+def suportado(conexao):
+    if conexao.dialect.name != 'sqlite':
+        return False
+    opcoes = conexao.exec_driver_sql('PRAGMA compile_options').scalars().all()
+    return 'ENABLE_FTS5' in opcoes
+
+
+def _existe(conexao):
+    return conexao.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABELA,)
+    ).first() is not None
+
+
+def _fts_ativo(conexao):
+    # Depois que o índice é encontrado, não é conferido de novo a cada busca
+    if _ativo.get(conexao.engine):
+        return True
+    ativo = suportado(conexao) and _existe(conexao)
+    if ativo:
+        _ativo[conexao.engine] = True
+    return ativo
+
+
+def reindexar(conexao):
+    for instrucao in _REINDEXAR:
+        conexao.exec_driver_sql(instrucao)
+
+
+def criar_indice_busca(conexao):
+    """Passo de migração: cria a tabela FTS e os triggers e indexa os produtos existentes."""
+    if not suportado(conexao) or _existe(conexao):
+        return []
+    for instrucao in _CRIAR:
+        conexao.exec_driver_sql(instrucao)
+    reindexar(conexao)
+    return [f'índice de busca {TABELA}']
+
+
+# create_all()/drop_all() (init_db, testes, benchmark) cuidam do índice junto com as tabelas
+@event.listens_for(db.metadata, 'after_create')
+def _apos_criar_tabelas(metadata, conexao, **kw):
+    criar_indice_busca(conexao)
+    _ativo.pop(conexao.engine, None)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _antes_de_apagar_tabelas(metadata, conexao, **kw):
+    if conexao.dialect.name == 'sqlite':
+        conexao.exec_driver_sql(f'DROP TABLE IF EXISTS {TABELA}')
+    _ativo.pop(conexao.engine, None)
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def formas(palavra):
+    """Singular e plural da palavra, sem acentos (o índice também não tem): porção -> porcao, porcoes, ..."""
+    palavra = _sem_acentos(palavra).lower()
+    encontradas = [palavra]
+    if palavra.endswith(('oes', 'aes', 'aos')) and len(palavra) > 3:
+        encontradas.append(palavra[:-3] + 'ao')
+    elif palavra.endswith('ao') and len(palavra) > 2:
+        encontradas.extend(palavra[:-2] + final for final in ('oes', 'aes', 'aos'))
+    elif palavra.endswith('s') and len(palavra) > 3:
+        encontradas.append(palavra[:-1])
+    # O prefixo do singular já cobre o plural com s ("batata"* acha "batatas")
+    return list(dict.fromkeys(encontradas))
+
+
+def consulta_fts(termo):
+    """Converte o texto digitado em uma consulta FTS5: todas as palavras, cada uma como prefixo em qualquer das suas formas."""
+    grupos = []
+    for palavra in _PALAVRA.findall(termo):
+        termos = ' OR '.join(f'"{forma}"*' for forma in formas(palavra))
+        grupos.append(f'({termos})')
+    return ' AND '.join(grupos)
+
+
+def _disponiveis(stmt):
+    return (stmt.join(Categoria, Produto.categoria_id == Categoria.id)
+            .where(Produto.ativo == True, Categoria.ativo == True))
+
+
+def buscar(termo, pagina=1, por_pagina=POR_PAGINA):
+    """Ids dos produtos disponíveis que casam com `termo`, do mais relevante ao menos."""
+    consulta = consulta_fts(termo)
+    if not consulta:
+        return ResultadoBusca((), False)
+    inicio = (pagina - 1) * por_pagina
+
+    if _fts_ativo(db.session.connection()):
+        stmt = (
+            _disponiveis(select(Produto.id).select_from(_indice).join(Produto, Produto.id == _indice.c.rowid))
+            .where(literal_column(TABELA).op('MATCH')(consulta))
+            .order_by(func.bm25(literal_column(TABELA), *PESOS), Produto.id)
+        )
+    else:
+        stmt = select(Produto.id)
+        for palavra in _PALAVRA.findall(termo):
+            padrao = f'%{palavra.lower()}%'
+            stmt = stmt.where(or_(func.lower(Produto.nome).like(padrao), func.lower(Produto.descricao).like(padrao)))
+        stmt = _disponiveis(stmt).order_by(Produto.nome, Produto.id)
+
+    # Um a mais que a página diz se existe a próxima, sem COUNT
+    ids = db.session.execute(stmt.limit(por_pagina + 1).offset(inicio)).scalars().all()
+    return ResultadoBusca(tuple(ids[:por_pagina]), len(ids) > por_pagina)
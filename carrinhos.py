@@ -0,0 +1,252 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, session
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import delete, func, select, update
+
+import catalogo
+from models import db, CarrinhoItem
+
+# Carrinho guardado no servidor, por usuário, em vez do cookie de sessão.
+# Cada linha guarda só produto, quantidade e observação; nome e preço vêm do
+# snapshot do catálogo na leitura, então o carrinho sempre mostra o preço
+# atual. Dois backends com a mesma interface:
+#   memoria - dict em processo com TTL e limite LRU de usuários (um processo só)
+#   banco   - tabela carrinho_item, compartilhada entre workers e restarts
+ItemCarrinho = namedtuple('ItemCarrinho', 'indice produto_id nome preco quantidade observacao subtotal')
+
+QUANTIDADE_MAXIMA = 99
+
+
+def _linha(produto_id, quantidade, observacao):
+    return {'produto_id': produto_id, 'quantidade': quantidade, 'observacao': observacao or ''}
+
+
+class CarrinhoMemoria:
+    def __init__(self, ttl=7 * 24 * 3600, max_usuarios=10000):
+        self.ttl = ttl
+        self.max_usuarios = max_usuarios
+        self._lock = threading.Lock()
+        self._carrinhos = OrderedDict()  # user_id -> [expira_em, linhas]
+
+    def _linhas(self, user_id, criar=False):
+        # Chamado com o lock; renova o TTL e a posição LRU do usuário
+        agora = time.monotonic()
+        entrada = self._carrinhos.get(user_id)
+        if entrada is not None and entrada[0] < agora:
+            del self._carrinhos[user_id]
+            entrada = None
+        if entrada is None:
+            if not criar:
+                return []
+            entrada = self._carrinhos[user_id] = [0, []]
+            while len(self._carrinhos) > self.max_usuarios:
+                self._carrinhos.popitem(last=False)
+        entrada[0] = agora + self.ttl
+        self._carrinhos.move_to_end(user_id)
+        return entrada[1]
+
+    def linhas(self, user_id):
+        with self._lock:
+            return [dict(linha) for linha in self._linhas(user_id)]
+
+    def contar(self, user_id):
+        with self._lock:
+            return sum(linha['quantidade'] for linha in self._linhas(user_id))
+
+    def adicionar(self, user_id, produto_id, quantidade=1, observacao=''):
+        with self._lock:
+            linhas = self._linhas(user_id, criar=True)
+            existente = next((linha for linha in linhas if linha['produto_id'] == produto_id
+                              and linha['observacao'] == (observacao or '')), None)
+            if existente:
+                existente['quantidade'] = min(existente['quantidade'] + quantidade, QUANTIDADE_MAXIMA)
+            else:
+                linhas.append(_linha(produto_id, min(quantidade, QUANTIDADE_MAXIMA), observacao))
+            return sum(linha['quantidade'] for linha in linhas)
+
+    def atualizar(self, user_id, indice, quantidade=None, observacao=None):
+        with self._lock:
+            linhas = self._linhas(user_id)
+            if not 0 <= indice < len(linhas):
+                return False
+            if quantidade is not None:
+                linhas[indice]['quantidade'] = min(quantidade, QUANTIDADE_MAXIMA)
+            if observacao is not None:
+                linhas[indice]['observacao'] = observacao
+            return True
+
+    def remover(self, user_id, indice):
+        with self._lock:
+            linhas = self._linhas(user_id)
+            if not 0 <= indice < len(linhas):
+                return None
+            return linhas.pop(indice)
+
+    def limpar(self, user_id):
+        with self._lock:
+            return bool(self._carrinhos.pop(user_id, None))
+
+    def expirar(self):
+        agora = time.monotonic()
+        with self._lock:
+            expirados = [user_id for user_id, (expira_em, _) in self._carrinhos.items() if expira_em < agora]
+            for user_id in expirados:
+                del self._carrinhos[user_id]
+        return len(expirados)
+
+
+class CarrinhoBanco:
+    # Cada escrita faz commit na sessão do request; as rotas do carrinho não
+    # têm outras alterações pendentes
+    def __init__(self, ttl=7 * 24 * 3600):
+        self.ttl = ttl
+
+    def _limite(self):
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def _consulta(self, user_id):
+        return (select(CarrinhoItem)
+                .where(CarrinhoItem.user_id == user_id, CarrinhoItem.atualizado_em >= self._limite())
+                .order_by(CarrinhoItem.id))
+
+    def _itens(self, user_id):
+        return db.session.execute(self._consulta(user_id)).scalars().all()
+
+    def _renovar(self, user_id):
+        db.session.execute(update(CarrinhoItem).where(CarrinhoItem.user_id == user_id)
+                           .values(atualizado_em=datetime.utcnow()))
+
+    def linhas(self, user_id):
+        return [_linha(item.produto_id, item.quantidade, item.observacao) for item in self._itens(user_id)]
+
+    def contar(self, user_id):
+        return db.session.execute(
+            select(func.coalesce(func.sum(CarrinhoItem.quantidade), 0))
+            .where(CarrinhoItem.user_id == user_id, CarrinhoItem.atualizado_em >= self._limite())
+        ).scalar()
+
+    def adicionar(self, user_id, produto_id, quantidade=1, observacao=''):
+        observacao = observacao or ''
+        existente = db.session.execute(
+            self._consulta(user_id).where(CarrinhoItem.produto_id == produto_id,
+                                          CarrinhoItem.observacao == observacao)
+        ).scalars().first()
+        if existente:
+            existente.quantidade = min(existente.quantidade + quantidade, QUANTIDADE_MAXIMA)
+        else:
+            db.session.add(CarrinhoItem(user_id=user_id, produto_id=produto_id, observacao=observacao,
+                                        quantidade=min(quantidade, QUANTIDADE_MAXIMA)))
+        db.session.flush()
+        self._renovar(user_id)
+        db.session.commit()
+        return self.contar(user_id)
+
+    def atualizar(self, user_id, indice, quantidade=None, observacao=None):
+        itens = self._itens(user_id)
+        if not 0 <= indice < len(itens):
+            return False
+        if quantidade is not None:
+            itens[indice].quantidade = min(quantidade, QUANTIDADE_MAXIMA)
+        if observacao is not None:
+            itens[indice].observacao = observacao
+        self._renovar(user_id)
+        db.session.commit()
+        return True
+
+    def remover(self, user_id, indice):
+        itens = self._itens(user_id)
+        if not 0 <= indice < len(itens):
+            return None
+        item = itens[indice]
+        linha = _linha(item.produto_id, item.quantidade, item.observacao)
+        db.session.delete(item)
+        db.session.commit()
+        return linha
+
+    def limpar(self, user_id):
+        resultado = db.session.execute(delete(CarrinhoItem).where(CarrinhoItem.user_id == user_id))
+        db.session.commit()
+        return resultado.rowcount > 0
+
+    def expirar(self):
+        resultado = db.session.execute(delete(CarrinhoItem).where(CarrinhoItem.atualizado_em < self._limite()))
+        db.session.commit()
+        return resultado.rowcount
+
+
+BACKENDS = {'memoria': CarrinhoMemoria, 'banco': CarrinhoBanco}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = current_app.config
+                backend = config.get('CARRINHO_BACKEND', 'banco')
+                ttl = config.get('CARRINHO_TTL', 7 * 24 * 3600)
+                if backend == 'memoria':
+                    _store = CarrinhoMemoria(ttl=ttl, max_usuarios=config.get('CARRINHO_MAX_USUARIOS', 10000))
+                elif backend == 'banco':
+                    _store = CarrinhoBanco(ttl=ttl)
+                else:
+                    raise ValueError(f'CARRINHO_BACKEND inválido: {backend!r} (use {" ou ".join(BACKENDS)})')
+    return _store
+
+
+def itens(user_id):
+    """Linhas do carrinho com nome e preço atuais; produtos indisponíveis ficam de fora."""
+    snapshot = catalogo.atual()
+    resultado = []
+    for indice, linha in enumerate(store().linhas(user_id)):
+        produto = snapshot.produto_disponivel(linha['produto_id'])
+        if produto is None:
+            continue
+        resultado.append(ItemCarrinho(indice, produto.id, produto.nome, produto.preco, linha['quantidade'],
+                                      linha['observacao'], produto.preco * linha['quantidade']))
+    return resultado
+
+
+def total(itens_carrinho):
+    return sum(item.subtotal for item in itens_carrinho)
+
+
+def _contador_carrinho():
+    # Contador do badge do menu renderizado junto com a página
+    if current_user.is_authenticated:
+        return {'carrinho_count': store().contar(current_user.id)}
+    return {'carrinho_count': 0}
+
+
+def _migrar_carrinho_da_sessao():
+    # Sessões abertas antes do carrinho no servidor ainda trazem a lista no cookie
+    if 'carrinho' not in session or not current_user.is_authenticated:
+        return
+    for linha in session.pop('carrinho') or []:
+        try:
+            store().adicionar(current_user.id, int(linha['produto_id']), 1, linha.get('observacao', ''))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+@click.command('limpar-carrinhos')
+@with_appcontext
+def limpar_carrinhos_command():
+    """Remove carrinhos abandonados há mais de CARRINHO_TTL segundos."""
+    removidos = store().expirar()
+    click.echo(f'{removidos} registro(s) expirado(s) removido(s).')
+
+
+def init_app(app):
+    app.cli.add_command(limpar_carrinhos_command)
+    app.before_request(_migrar_carrinho_da_sessao)
+    app.context_processor(_contador_carrinho)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+import imagens
+from models import db, Categoria, Produto
+
+# Snapshot imutável do catálogo em memória. As rotas do cliente leem preços e
+# disponibilidade daqui, sem SQL; qualquer commit que toque Produto/Categoria
+# descarta o snapshot e o próximo acesso monta um novo (troca atômica da
+# referência global).
+ProdutoInfo = namedtuple('ProdutoInfo', 'id nome descricao preco imagem ativo categoria_id imagens')
+CategoriaInfo = namedtuple('CategoriaInfo', 'id nome descricao ativo')
+
+CATALOGO_TTL_PADRAO = 60  # segundos; limita a defasagem entre processos
+
+_lock = threading.Lock()
+_snapshot = None
+_anterior = None
+
+
+class Catalogo:
+    __slots__ = ('categorias', 'produtos', 'por_categoria', 'corpo', 'versao', 'modificado_em', 'criado_em')
+
+    def __init__(self, categorias, produtos, por_categoria, corpo, versao, modificado_em):
+        self.categorias = categorias  # categorias ativas, em ordem
+        self.produtos = produtos  # todos os produtos por id
+        self.por_categoria = por_categoria  # produtos ativos por categoria ativa
+        self.corpo = corpo  # JSON pronto de /api/cardapio
+        self.versao = versao
+        self.modificado_em = modificado_em
+        self.criado_em = time.monotonic()
+
+    def produto_disponivel(self, produto_id):
+        """Retorna o produto se ele e sua categoria estiverem ativos."""
+        produto = self.produtos.get(produto_id)
+        if produto is None or not produto.ativo or produto.categoria_id not in self.por_categoria:
+            return None
+        return produto
+
+
+def produto_json(produto):
+    return {
+        'id': produto.id,
+        'nome': produto.nome,
+        'descricao': produto.descricao,
+        'preco': produto.preco,
+        'imagem': produto.imagem,
+        'imagens': produto.imagens,
+        'categoria_id': produto.categoria_id
+    }
+
+
+def _montar():
+    # Uma única consulta: todas as categorias com todos os seus produtos
+    linhas = (
+        db.session.query(Categoria, Produto)
+        .outerjoin(Produto, Produto.categoria_id == Categoria.id)
+        .order_by(Categoria.id, Produto.id)
+        .all()
+    )
+
+    categorias = []
+    produtos = {}
+    por_categoria = {}
+    pasta_imagens = imagens.pasta()
+    for categoria, produto in linhas:
+        if categoria.ativo and categoria.id not in por_categoria:
+            categorias.append(CategoriaInfo(categoria.id, categoria.nome, categoria.descricao, categoria.ativo))
+            por_categoria[categoria.id] = []
+        if produto is not None:
+            urls = None
+            if produto.imagem:
+                urls = imagens.urls(produto.imagem, imagens.variantes(produto.imagem, pasta_imagens))
+            info = ProdutoInfo(produto.id, produto.nome, produto.descricao, produto.preco,
+                               produto.imagem, bool(produto.ativo), produto.categoria_id, urls)
+            produtos[info.id] = info
+            if info.ativo and categoria.ativo:
+                por_categoria[categoria.id].append(info)
+
+    por_categoria = {cid: tuple(itens) for cid, itens in por_categoria.items()}
+
+    payload = {
+        'categorias': [
+            {
+                'id': categoria.id,
+                'nome': categoria.nome,
+                'descricao': categoria.descricao,
+                'produtos': [produto_json(p) for p in por_categoria[categoria.id]]
+            }
+            for categoria in categorias
+        ]
+    }
+    corpo = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    versao = hashlib.sha256(corpo).hexdigest()[:32]
+
+    # Mesmo conteúdo do snapshot anterior: preserva o Last-Modified
+    if _anterior is not None and _anterior.versao == versao:
+        modificado_em = _anterior.modificado_em
+    else:
+        modificado_em = datetime.utcnow().replace(microsecond=0)
+
+    return Catalogo(tuple(categorias), MappingProxyType(produtos), MappingProxyType(por_categoria),
+                    corpo, versao, modificado_em)
+
+
+def _ttl():
+    if has_app_context():
+        return current_app.config.get('CATALOGO_TTL', CATALOGO_TTL_PADRAO)
+    return CATALOGO_TTL_PADRAO
+
+
+def atual():
+    """Retorna o snapshot vigente, montando um novo se necessário."""
+    global _snapshot, _anterior
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.criado_em < _ttl():
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is not None and time.monotonic() - snapshot.criado_em < _ttl():
+            return snapshot
+        if snapshot is not None:
+            _anterior = snapshot
+        _snapshot = _montar()
+        return _snapshot
+
+
+def invalidar():
+    global _snapshot, _anterior
+    with _lock:
+        if _snapshot is not None:
+            _anterior = _snapshot
+        _snapshot = None
+
+
+def cardapio():
+    """Retorna (corpo_json, versao, modificado_em) do cardápio ativo."""
+    snapshot = atual()
+    return snapshot.corpo, snapshot.versao, snapshot.modificado_em
+
+
+# Invalidação ligada ao ORM: qualquer escrita em Produto/Categoria marca a
+# sessão e o snapshot é descartado quando (e somente se) ela fizer commit.
+def _marcar_alterado(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['catalogo_alterado'] = True
+
+
+for _modelo in (Produto, Categoria):
+    for _evento in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_modelo, _evento, _marcar_alterado)
+
+
+def _marcar_alterado_em_massa(contexto):
+    if contexto.mapper.class_ in (Produto, Categoria):
+        contexto.session.info['catalogo_alterado'] = True
+
+
+event.listen(Session, 'after_bulk_update', _marcar_alterado_em_massa)
+event.listen(Session, 'after_bulk_delete', _marcar_alterado_em_massa)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_apos_commit(session):
+    if session.info.pop('catalogo_alterado', False):
+        invalidar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marca(session):
+    session.info.pop('catalogo_alterado', None)
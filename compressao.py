@@ -0,0 +1,176 @@
+import zlib
+
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+
+try:
+    import brotli
+except ImportError:  # sem o pacote brotli a negociação fica só no gzip
+    brotli = None
+
+# Compressão das respostas dinâmicas (HTML, JSON, CSV...) como middleware WSGI
+# em volta de app.wsgi_app. Escolhe br ou gzip pelo Accept-Encoding, só
+# comprime tipos de texto da lista e respostas acima de um tamanho mínimo, e
+# deixa passar o que já vem comprimido (arquivos de static/dist, imagens).
+# Respostas sem Content-Length (streaming) são comprimidas pedaço a pedaço,
+# com flush a cada pedaço para o cliente continuar recebendo os dados aos
+# poucos. SSE fica de fora: heartbeats comprimidos não passariam pelos
+# proxies que bufferizam até ter um bloco inteiro.
+
+TIPOS_PADRAO = frozenset({
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+})
+MINIMO_PADRAO = 500  # bytes; abaixo disso os cabeçalhos do gzip não compensam
+
+
+class _Gzip:
+    nome = 'gzip'
+
+    def __init__(self, nivel):
+        self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def parte(self, dados):
+        return self._compressor.compress(dados) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self):
+        return self._compressor.flush()
+
+    def tudo(self, dados):
+        return self._compressor.compress(dados) + self._compressor.flush()
+
+
+class _Brotli:
+    nome = 'br'
+
+    def __init__(self, qualidade):
+        self._compressor = brotli.Compressor(quality=qualidade)
+
+    def parte(self, dados):
+        return self._compressor.process(dados) + self._compressor.flush()
+
+    def fim(self):
+        return self._compressor.finish()
+
+    def tudo(self, dados):
+        return self._compressor.process(dados) + self._compressor.finish()
+
+
+class Compressao:
+    def __init__(self, app, minimo=MINIMO_PADRAO, tipos=TIPOS_PADRAO, nivel_gzip=6, qualidade_brotli=4):
+        self.app = app
+        self.minimo = minimo
+        self.tipos = frozenset(tipos)
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_brotli = qualidade_brotli
+
+    def _codificacao(self, environ):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return None
+        aceitas = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and aceitas['br']:
+            return 'br'
+        if aceitas['gzip']:
+            return 'gzip'
+        return None
+
+    def _compressor(self, codificacao):
+        if codificacao == 'br':
+            return _Brotli(self.qualidade_brotli)
+        return _Gzip(self.nivel_gzip)
+
+    def _comprimivel(self, status, headers):
+        """True/False para o tipo e os cabeçalhos; o tamanho é conferido depois."""
+        codigo = int(status.split(' ', 1)[0])
+        if codigo < 200 or codigo in (204, 206, 304):
+            return False
+        tipo = None
+        for nome, valor in headers:
+            nome = nome.lower()
+            if nome == 'content-type':
+                tipo = valor.split(';', 1)[0].strip().lower()
+            elif nome == 'content-encoding':
+                return False
+            elif nome == 'cache-control' and parse_cache_control_header(valor).no_transform:
+                return False
+        return tipo in self.tipos
+
+    def __call__(self, environ, start_response):
+        codificacao = self._codificacao(environ)
+        estado = {}
+
+        def iniciar(status, headers, exc_info=None):
+            if not self._comprimivel(status, headers):
+                return start_response(status, headers, exc_info)
+            headers = _com_vary(headers)
+            tamanho = _cabecalho(headers, 'content-length')
+            if codificacao is None or (tamanho is not None and int(tamanho) < self.minimo):
+                return start_response(status, headers, exc_info)
+            # Cabeçalhos finais só quando o corpo comprimido estiver pronto
+            estado.update(status=status, headers=headers, exc_info=exc_info, tamanho=tamanho)
+            return _escrever_proibido
+
+        corpo = self.app(environ, iniciar)
+        if not estado:
+            return corpo
+        return self._comprimir(corpo, estado, codificacao, start_response)
+
+    def _comprimir(self, corpo, estado, codificacao, start_response):
+        try:
+            compressor = self._compressor(codificacao)
+            headers = [(nome, _etag_fraca(valor) if nome.lower() == 'etag' else valor)
+                       for nome, valor in estado['headers'] if nome.lower() != 'content-length']
+            headers.append(('Content-Encoding', compressor.nome))
+
+            if estado['tamanho'] is not None:
+                # Tamanho conhecido: comprime tudo de uma vez e informa o novo tamanho
+                saida = compressor.tudo(b''.join(corpo))
+                headers.append(('Content-Length', str(len(saida))))
+                start_response(estado['status'], headers, estado['exc_info'])
+                yield saida
+                return
+
+            start_response(estado['status'], headers, estado['exc_info'])
+            for pedaco in corpo:
+                if pedaco:
+                    saida = compressor.parte(pedaco)
+                    if saida:
+                        yield saida
+            yield compressor.fim()
+        finally:
+            if hasattr(corpo, 'close'):
+                corpo.close()
+
+
+def _cabecalho(headers, nome):
+    for chave, valor in headers:
+        if chave.lower() == nome:
+            return valor
+    return None
+
+
+def _com_vary(headers):
+    vary = _cabecalho(headers, 'vary')
+    if vary is None:
+        return list(headers) + [('Vary', 'Accept-Encoding')]
+    if 'accept-encoding' in vary.lower() or vary.strip() == '*':
+        return list(headers)
+    return [(nome, f'{valor}, Accept-Encoding' if nome.lower() == 'vary' else valor) for nome, valor in headers]
+
+
+def _etag_fraca(valor):
+    # A versão comprimida não é byte a byte igual à original
+    return valor if valor.startswith('W/') else f'W/{valor}'
+
+
+def _escrever_proibido(dados):
+    raise RuntimeError('write() do WSGI não é suportado com compressão; retorne um iterável')
+
+
+def init_app(app):
+    if not app.config.get('COMPRESSAO', True):
+        return
+    app.wsgi_app = Compressao(app.wsgi_app,
+                              minimo=app.config.get('COMPRESSAO_MINIMO', MINIMO_PADRAO),
+                              nivel_gzip=app.config.get('COMPRESSAO_NIVEL_GZIP', 6),
+                              qualidade_brotli=app.config.get('COMPRESSAO_QUALIDADE_BROTLI', 4))
@@ -0,0 +1,131 @@
+import os
+
+# Configuração da aplicação lida do ambiente. Sem nenhuma variável definida o
+# comportamento é o de desenvolvimento (SQLite em instance/junior_food.db).
+
+
+def _int(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+def _uri_banco():
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///junior_food.db')
+    # Provedores que ainda usam o esquema antigo do Heroku
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def opcoes_engine(uri):
+    """Opções do create_engine conforme o banco escolhido."""
+    if uri.startswith('sqlite'):
+        em_memoria = uri in ('sqlite://', 'sqlite:///:memory:')
+        opcoes = {
+            'connect_args': {
+                # Timeout do driver em segundos; o busy_timeout do PRAGMA vale o mesmo
+                'timeout': _int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+                'check_same_thread': False,
+            }
+        }
+        if not em_memoria:
+            opcoes.update({
+                'pool_size': _int('DB_POOL_SIZE', 10),
+                'max_overflow': _int('DB_MAX_OVERFLOW', 20),
+                'pool_timeout': _int('DB_POOL_TIMEOUT', 30),
+            })
+        return opcoes
+
+    return {
+        'pool_size': _int('DB_POOL_SIZE', 10),
+        'max_overflow': _int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'sua-chave-secreta-aqui-mude-em-producao')
+
+    SQLALCHEMY_DATABASE_URI = _uri_banco()
+    SQLALCHEMY_ENGINE_OPTIONS = opcoes_engine(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # PRAGMAs aplicados a cada nova conexão SQLite (ignorados em outros bancos).
+    # WAL deixa leitores e o escritor trabalharem ao mesmo tempo; NORMAL só
+    # sincroniza no checkpoint, o que é seguro em WAL.
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': _int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'mmap_size': _int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'cache_size': -_int('SQLITE_CACHE_SIZE_KB', 32 * 1024),  # negativo = KiB
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+
+    CATALOGO_TTL = _int('CATALOGO_TTL', 60)  # segundos até o snapshot do catálogo ser recarregado
+    CONTADORES_RECONCILIAR_SEGUNDOS = _int('CONTADORES_RECONCILIAR_SEGUNDOS', 300)  # 0 desliga
+
+    # Streams de pedidos em tempo real (SSE)
+    SSE_MAX_ASSINANTES = _int('SSE_MAX_ASSINANTES', 50)  # cada stream ocupa uma thread: fique abaixo de --threads
+    SSE_REPLAY = _int('SSE_REPLAY', 500)  # eventos guardados para reconexão com Last-Event-ID
+    SSE_HEARTBEAT_SEGUNDOS = _int('SSE_HEARTBEAT_SEGUNDOS', 15)
+    SSE_DURACAO_MAXIMA = _int('SSE_DURACAO_MAXIMA', 300)  # segundos até o stream fechar e o navegador reconectar
+
+    # Instrumentação (metricas.py): cabeçalho Server-Timing nas respostas e
+    # token opcional para o Prometheus raspar /admin/metrics sem login
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+
+    # Fuso da loja: dia e hora dos relatórios de vendas (relatorios.py). Os
+    # horários continuam gravados em UTC; depois de mudar, rode `flask migrar`
+    LOJA_FUSO = os.environ.get('LOJA_FUSO', 'America/Sao_Paulo')
+
+    # Hash de senhas em pool de processos (senhas.py). Mudar SENHA_METODO faz
+    # os hashes antigos serem refeitos no próximo login de cada usuário
+    SENHA_METODO = os.environ.get('SENHA_METODO', 'pbkdf2:sha256:600000')
+    SENHA_PROCESSOS = _int('SENHA_PROCESSOS', 2)  # 0 = calcula na própria requisição
+    SENHA_FILA_MAXIMA = _int('SENHA_FILA_MAXIMA', 16)  # acima disso a requisição falha na hora (503)
+    SENHA_TIMEOUT = _int('SENHA_TIMEOUT', 10)
+
+    # Cache do usuário logado (identidade.py); o TTL limita a defasagem entre
+    # processos quando um usuário muda (ex.: perde o acesso de admin)
+    IDENTIDADE_TTL = _int('IDENTIDADE_TTL', 60)
+    IDENTIDADE_MAX = _int('IDENTIDADE_MAX', 10000)
+
+    # Carrinho no servidor: 'banco' (tabela carrinho_item, vale para vários
+    # workers) ou 'memoria' (um processo só, com limite LRU de usuários)
+    CARRINHO_BACKEND = os.environ.get('CARRINHO_BACKEND', 'banco')
+    CARRINHO_TTL = _int('CARRINHO_TTL', 7 * 24 * 3600)  # segundos sem mexer até o carrinho expirar
+    CARRINHO_MAX_USUARIOS = _int('CARRINHO_MAX_USUARIOS', 10000)
+
+    # Arquivos estáticos com hash no nome (estaticos.py). O manifesto é lido no
+    # primeiro uso e recompilado só se os originais mudaram; com '0' a app
+    # só lê o gerado antes por `flask compilar-estaticos` (ex.: no deploy)
+    ESTATICOS_COMPILAR = os.environ.get('ESTATICOS_COMPILAR', '1') != '0'
+
+    # Gravação de pedidos em grupo (gravador.py): uma thread por processo junta
+    # os pedidos que chegam juntos em uma transação e um commit só
+    PEDIDOS_GRUPO = os.environ.get('PEDIDOS_GRUPO', '1') != '0'  # '0' grava na própria requisição
+    PEDIDOS_LOTE_MAXIMO = _int('PEDIDOS_LOTE_MAXIMO', 32)
+    PEDIDOS_ESPERA_MS = _int('PEDIDOS_ESPERA_MS', 5)  # quanto o primeiro do lote espera pelos seguintes
+    PEDIDOS_FILA_MAXIMA = _int('PEDIDOS_FILA_MAXIMA', 256)  # acima disso o pedido falha na hora
+    PEDIDOS_TIMEOUT = _int('PEDIDOS_TIMEOUT', 10)
+
+    # Estimador de andamento dos pedidos (andamento.py): durações recentes por
+    # etapa e vazão por hora, relidos do histórico de status a cada intervalo
+    ANDAMENTO_AMOSTRAS = _int('ANDAMENTO_AMOSTRAS', 200)  # durações guardadas por etapa
+    ANDAMENTO_JANELA_HORAS = _int('ANDAMENTO_JANELA_HORAS', 24)
+    ANDAMENTO_INTERVALO = _int('ANDAMENTO_INTERVALO', 5)  # segundos entre leituras de eventos novos
+
+    # Compressão gzip/Brotli das respostas dinâmicas (compressao.py)
+    COMPRESSAO = os.environ.get('COMPRESSAO', '1') != '0'  # desligue se o proxy já comprime
+    COMPRESSAO_MINIMO = _int('COMPRESSAO_MINIMO', 500)  # bytes
+    COMPRESSAO_NIVEL_GZIP = _int('COMPRESSAO_NIVEL_GZIP', 6)
+    COMPRESSAO_QUALIDADE_BROTLI = _int('COMPRESSAO_QUALIDADE_BROTLI', 4)  # 11 é lento demais por requisição
+
+    # Configurações para upload de imagens
+    UPLOAD_FOLDER = 'static/uploads/produtos'
+    IMAGENS_THREADS = _int('IMAGENS_THREADS', 2)  # threads gerando as variantes redimensionadas
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
@@ -0,0 +1,288 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+import contadores
+from models import db, Endereco, Pedido, PedidoItem, User
+
+# Camada de consultas de pedidos usada pelas listagens. Todo o grafo que os
+# templates percorrem (cliente, endereço, itens e produto de cada item) vem
+# carregado antecipadamente: uma consulta para os pedidos (com JOIN nas
+# relações muitos-para-um) e uma única consulta extra para os itens.
+
+
+def pedidos_com_detalhes():
+    return Pedido.query.options(
+        joinedload(Pedido.cliente),
+        joinedload(Pedido.endereco_entrega),
+        selectinload(Pedido.itens).joinedload(PedidoItem.produto),
+    )
+
+
+def pedidos_recentes(limite):
+    return pedidos_com_detalhes().order_by(Pedido.created_at.desc()).limit(limite).all()
+
+
+def pedidos_do_usuario(user_id, limite):
+    return (
+        pedidos_com_detalhes()
+        .filter(Pedido.user_id == user_id)
+        .order_by(Pedido.created_at.desc())
+        .limit(limite)
+        .all()
+    )
+
+
+def pedido_detalhado_or_404(pedido_id):
+    return pedidos_com_detalhes().filter(Pedido.id == pedido_id).first_or_404()
+
+
+# Paginação por cursor (keyset) da lista de pedidos do admin. Em vez de
+# OFFSET + COUNT(*), cada página busca "os próximos N depois de
+# (created_at, id)", então a página 1000 custa o mesmo que a página 1.
+class PaginaPedidos:
+    def __init__(self, itens, proximo, anterior, total_aproximado=None):
+        self.itens = itens
+        self.proximo = proximo  # cursor opaco da próxima página (ou None)
+        self.anterior = anterior  # cursor opaco da página anterior (ou None)
+        self.total_aproximado = total_aproximado
+
+
+def codificar_cursor(pedido, direcao):
+    bruto = json.dumps([pedido.created_at.isoformat(), pedido.id, direcao], separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (created_at, id, direcao) ou None se o cursor for inválido."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pedido_id, direcao = json.loads(bruto)
+        if direcao not in ('proxima', 'anterior'):
+            return None
+        return datetime.fromisoformat(created_at), int(pedido_id), direcao
+    except (ValueError, TypeError):
+        return None
+
+
+def total_aproximado_pedidos():
+    # Lido do contador incremental; pode divergir por alguns pedidos até a
+    # próxima reconciliação, por isso "aproximado"
+    return contadores.valor('pedidos')
+
+
+def consulta_pagina_pedidos(query, ordenacao='mais_novos', posicao=None, por_pagina=10):
+    """Monta a consulta de uma página; `posicao` é o cursor já decodificado."""
+    crescente = ordenacao == 'mais_antigos'
+    direcao = posicao[2] if posicao is not None else 'proxima'
+    # Voltar uma página = percorrer a chave no sentido contrário da ordenação
+    sentido_crescente = crescente if direcao == 'proxima' else not crescente
+
+    if posicao is not None:
+        chave = tuple_(Pedido.created_at, Pedido.id)
+        referencia = tuple_(posicao[0], posicao[1])
+        query = query.filter(chave > referencia if sentido_crescente else chave < referencia)
+
+    if sentido_crescente:
+        query = query.order_by(Pedido.created_at.asc(), Pedido.id.asc())
+    else:
+        query = query.order_by(Pedido.created_at.desc(), Pedido.id.desc())
+
+    return query.limit(por_pagina + 1)
+
+
+def paginar_pedidos(query, ordenacao='mais_novos', cursor=None, por_pagina=10, contar=False):
+    posicao = decodificar_cursor(cursor) if cursor else None
+    direcao = posicao[2] if posicao is not None else 'proxima'
+
+    itens = consulta_pagina_pedidos(query, ordenacao, posicao, por_pagina).all()
+    tem_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+
+    if direcao == 'anterior':
+        itens.reverse()
+        tem_anterior, tem_proxima = tem_mais, True
+    else:
+        tem_anterior, tem_proxima = posicao is not None, tem_mais
+
+    proximo = codificar_cursor(itens[-1], 'proxima') if itens and tem_proxima else None
+    anterior = codificar_cursor(itens[0], 'anterior') if itens and tem_anterior else None
+    total = total_aproximado_pedidos() if contar else None
+    return PaginaPedidos(itens, proximo, anterior, total)
+
+
+# Filtros combináveis da lista de pedidos do admin (e da exportação). Ficam
+# todos na query string, então cada combinação tem uma URL própria.
+STATUS = ('pendente', 'preparando', 'pronto', 'entregue', 'cancelado')
+FORMAS_PAGAMENTO = ('cartao', 'dinheiro', 'pix')
+
+FiltrosPedidos = namedtuple('FiltrosPedidos', 'status formas_pagamento inicio fim cliente bairro')
+SEM_FILTROS = FiltrosPedidos((), (), None, None, '', '')
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+def _data(valor, nome):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        raise FiltroInvalido(f'{nome} deve estar no formato AAAA-MM-DD')
+
+
+def _opcoes(args, nome, validas):
+    escolhidas = tuple(dict.fromkeys(valor for valor in args.getlist(nome) if valor))
+    invalidas = [valor for valor in escolhidas if valor not in validas]
+    if invalidas:
+        raise FiltroInvalido(f'{nome} inválido: {", ".join(invalidas)}')
+    return escolhidas
+
+
+def filtros_pedidos(args):
+    """Lê status e forma_pagamento (repetíveis), data_inicio/data_fim (inclusivas), cliente e bairro."""
+    inicio = _data(args['data_inicio'], 'data_inicio') if args.get('data_inicio') else None
+    fim = _data(args['data_fim'], 'data_fim') + timedelta(days=1) if args.get('data_fim') else None
+    if inicio and fim and inicio >= fim:
+        raise FiltroInvalido('data_inicio deve ser anterior a data_fim')
+    return FiltrosPedidos(
+        status=_opcoes(args, 'status', STATUS),
+        formas_pagamento=_opcoes(args, 'forma_pagamento', FORMAS_PAGAMENTO),
+        inicio=inicio,
+        fim=fim,
+        cliente=args.get('cliente', '').strip()[:120],
+        bairro=args.get('bairro', '').strip()[:100],
+    )
+
+
+def parametros_url(filtros):
+    """Filtros de volta no formato da query string (para links de paginação e exportação)."""
+    parametros = {}
+    if filtros.status:
+        parametros['status'] = list(filtros.status)
+    if filtros.formas_pagamento:
+        parametros['forma_pagamento'] = list(filtros.formas_pagamento)
+    if filtros.inicio:
+        parametros['data_inicio'] = filtros.inicio.strftime('%Y-%m-%d')
+    if filtros.fim:
+        parametros['data_fim'] = (filtros.fim - timedelta(days=1)).strftime('%Y-%m-%d')
+    if filtros.cliente:
+        parametros['cliente'] = filtros.cliente
+    if filtros.bairro:
+        parametros['bairro'] = filtros.bairro
+    return parametros
+
+
+class Seletiva(ColumnElement):
+    """Condição que costuma casar com poucas linhas.
+
+    Sem isso o SQLite estima que um IN (subconsulta) sobre o bairro casa com
+    boa parte da tabela e prefere varrer pedido pelo índice que já entrega o
+    GROUP BY ordenado. No SQLite vira likelihood(condição, fração); nos outros
+    bancos é a própria condição.
+    """
+    inherit_cache = True
+    _traverse_internals = [
+        ('condicao', InternalTraversal.dp_clauseelement),
+        ('fracao', InternalTraversal.dp_plain_obj),
+    ]
+
+    def __init__(self, condicao, fracao=0.05):
+        self.condicao = condicao
+        self.fracao = float(fracao)
+
+
+@compiles(Seletiva)
+def _seletiva(elemento, compilador, **kw):
+    return compilador.process(elemento.condicao, **kw)
+
+
+@compiles(Seletiva, 'sqlite')
+def _seletiva_sqlite(elemento, compilador, **kw):
+    # A fração precisa ser uma constante no SQL, não um parâmetro
+    return f'likelihood({compilador.process(elemento.condicao, **kw)}, {elemento.fracao!r})'
+
+
+def _prefixo(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def condicoes_pedidos(filtros, facetas=False):
+    """Condições WHERE sobre Pedido. Com facetas=True, status e forma ficam de fora (são agrupados)."""
+    condicoes = []
+    if not facetas and filtros.status:
+        condicoes.append(Pedido.status.in_(filtros.status))
+    if not facetas and filtros.formas_pagamento:
+        condicoes.append(Pedido.forma_pagamento.in_(filtros.formas_pagamento))
+    if filtros.inicio:
+        condicoes.append(Pedido.created_at >= filtros.inicio)
+    if filtros.fim:
+        condicoes.append(Pedido.created_at < filtros.fim)
+    if filtros.cliente:
+        # Id exato ou começo do nome/email. O LIKE sem caixa busca pelos índices
+        # COLLATE NOCASE de user (ix_user_*_nocase); os pedidos de cada cliente
+        # encontrado vêm de ix_pedido_user_created_at. Com vários clientes a
+        # página ordena em memória só os pedidos deles.
+        if filtros.cliente.isdigit():
+            condicoes.append(Pedido.user_id == int(filtros.cliente))
+        else:
+            padrao = _prefixo(filtros.cliente)
+            condicoes.append(Pedido.user_id.in_(
+                select(User.id).where(User.username.like(padrao, escape='\\') | User.email.like(padrao, escape='\\'))
+            ))
+    if filtros.bairro:
+        # Endereços pelo índice ix_endereco_bairro_nocase, pedidos de cada um por ix_pedido_endereco_created_at
+        condicoes.append(Seletiva(Pedido.endereco_entrega_id.in_(
+            select(Endereco.id).where(Endereco.bairro.like(_prefixo(filtros.bairro), escape='\\'))
+        )))
+    return condicoes
+
+
+def filtrar_pedidos(query, filtros):
+    return query.filter(*condicoes_pedidos(filtros))
+
+
+# Facetas: quantos pedidos há em cada status e em cada forma de pagamento sob
+# os filtros atuais. Uma única consulta agrupa por (status, forma) com todos
+# os outros filtros; a faceta de status soma as formas selecionadas e a de
+# forma soma os status selecionados, como se cada uma ignorasse o próprio filtro.
+# Sem outros filtros (a lista padrão) os grupos vêm dos contadores por
+# (status, forma), que como o total da paginação podem divergir por alguns
+# pedidos até a próxima reconciliação.
+Facetas = namedtuple('Facetas', 'status formas_pagamento total')
+
+
+def consulta_facetas(filtros):
+    return (
+        select(Pedido.status, Pedido.forma_pagamento, func.count())
+        .where(*condicoes_pedidos(filtros, facetas=True))
+        .group_by(Pedido.status, Pedido.forma_pagamento)
+    )
+
+
+def facetas_pedidos(filtros):
+    status = dict.fromkeys(STATUS, 0)
+    formas = dict.fromkeys(FORMAS_PAGAMENTO, 0)
+    total = 0
+    if condicoes_pedidos(filtros, facetas=True):
+        grupos = db.session.execute(consulta_facetas(filtros))
+    else:
+        grupos = contadores.facetas()
+    for status_pedido, forma, quantidade in grupos:
+        status_ok = not filtros.status or status_pedido in filtros.status
+        forma_ok = not filtros.formas_pagamento or forma in filtros.formas_pagamento
+        if forma_ok:
+            status[status_pedido] = status.get(status_pedido, 0) + quantidade
+        if status_ok:
+            formas[forma] = formas.get(forma, 0) + quantidade
+        if status_ok and forma_ok:
+            total += quantidade
+    return Facetas(status, formas, total)
+
@@ -0,0 +1,220 @@
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, inspect, select
+
+from banco import somar
+from models import db, Contador, Pedido, User
+
+# Contadores do dashboard mantidos de forma incremental. Cada inserção,
+# exclusão ou troca de status de Pedido (e cada inserção/exclusão de User)
+# ajusta a tabela `contador` na mesma conexão e transação do flush, então o
+# dashboard lê tudo com uma consulta a uma tabela minúscula. Escritas em massa
+# (query.update/delete, inserts em lote) não passam pelos eventos; a
+# reconciliação periódica corrige qualquer diferença. Tanto o incremento
+# quanto a correção são uma instrução só (upsert; UPDATE com a contagem real
+# em subconsulta), então pedidos gravados por outros workers no meio do
+# caminho nunca são sobrescritos.
+#
+# Além do total por status há um contador por (status, forma de pagamento):
+# são as facetas da lista de pedidos do admin sem filtros, que assim não
+# precisam agrupar a tabela pedido inteira a cada carregamento.
+
+STATUS_PEDIDO = ['pendente', 'preparando', 'pronto', 'entregue', 'cancelado']
+FORMAS_PAGAMENTO = ['cartao', 'dinheiro', 'pix']
+
+_tabela = Contador.__table__
+
+
+def chave_status(status):
+    return f'pedidos:{status}'
+
+
+def chave_faceta(status, forma_pagamento):
+    return f'pedidos:{status}:{forma_pagamento}'
+
+
+CHAVES_FACETAS = [chave_faceta(status, forma) for status in STATUS_PEDIDO for forma in FORMAS_PAGAMENTO]
+
+
+def _incrementar(conexao, deltas):
+    """Soma {chave: delta} em um único upsert."""
+    somar(conexao, _tabela, [{'chave': chave, 'valor': delta} for chave, delta in sorted(deltas.items()) if delta],
+          ['chave'], ['valor'])
+
+
+def _chaves_pedido(status, forma_pagamento):
+    return chave_status(status), chave_faceta(status, forma_pagamento)
+
+
+@event.listens_for(Pedido, 'after_insert')
+def _pedido_inserido(mapper, conexao, pedido):
+    _incrementar(conexao, dict.fromkeys(('pedidos', *_chaves_pedido(pedido.status or 'pendente',
+                                                                     pedido.forma_pagamento)), 1))
+
+
+@event.listens_for(Pedido, 'after_delete')
+def _pedido_excluido(mapper, conexao, pedido):
+    _incrementar(conexao, dict.fromkeys(('pedidos', *_chaves_pedido(pedido.status or 'pendente',
+                                                                     pedido.forma_pagamento)), -1))
+
+
+def _valor_anterior(atributo, atual):
+    historico = atributo.history
+    return historico.deleted[0] if historico.has_changes() and historico.deleted else atual
+
+
+@event.listens_for(Pedido, 'after_update')
+def _pedido_atualizado(mapper, conexao, pedido):
+    atributos = inspect(pedido).attrs
+    antes = _chaves_pedido(_valor_anterior(atributos.status, pedido.status),
+                           _valor_anterior(atributos.forma_pagamento, pedido.forma_pagamento))
+    depois = _chaves_pedido(pedido.status, pedido.forma_pagamento)
+    deltas = {}
+    for chave in antes:
+        deltas[chave] = deltas.get(chave, 0) - 1
+    for chave in depois:
+        deltas[chave] = deltas.get(chave, 0) + 1
+    _incrementar(conexao, deltas)
+
+
+@event.listens_for(User, 'after_insert')
+def _usuario_inserido(mapper, conexao, usuario):
+    _incrementar(conexao, {'usuarios': 1})
+
+
+@event.listens_for(User, 'after_delete')
+def _usuario_excluido(mapper, conexao, usuario):
+    _incrementar(conexao, {'usuarios': -1})
+
+
+def ler():
+    """Todos os contadores em um dict, com zero para os que ainda não existem."""
+    valores = {'pedidos': 0, 'usuarios': 0}
+    valores.update({chave_status(status): 0 for status in STATUS_PEDIDO})
+    valores.update(db.session.execute(select(_tabela.c.chave, _tabela.c.valor)).all())
+    return valores
+
+
+def valor(chave):
+    return db.session.execute(select(_tabela.c.valor).where(_tabela.c.chave == chave)).scalar() or 0
+
+
+def consulta_facetas():
+    return select(_tabela.c.chave, _tabela.c.valor).where(_tabela.c.chave.in_(CHAVES_FACETAS))
+
+
+def facetas():
+    """[(status, forma_pagamento, pedidos)] de todos os pedidos, lido dos contadores."""
+    linhas = []
+    for chave, quantidade in db.session.execute(consulta_facetas()):
+        _, status, forma = chave.split(':')
+        linhas.append((status, forma, quantidade))
+    return linhas
+
+
+def _valores_reais(conexao):
+    """Subconsulta com o valor real de cada contador."""
+    contagem = select(func.count()).select_from(Pedido)
+    statuses = set(STATUS_PEDIDO)
+    statuses.update(conexao.execute(select(Pedido.status).distinct()).scalars())
+    reais = {chave_status(status): contagem.where(Pedido.status == status).scalar_subquery()
+             for status in sorted(statuses, key=str) if status is not None}
+    pares = {(status, forma) for status in STATUS_PEDIDO for forma in FORMAS_PAGAMENTO}
+    pares.update(tuple(par) for par in conexao.execute(select(Pedido.status, Pedido.forma_pagamento).distinct()))
+    for status, forma in sorted(pares, key=str):
+        if status is not None:
+            reais[chave_faceta(status, forma)] = contagem.where(
+                Pedido.status == status, Pedido.forma_pagamento == forma).scalar_subquery()
+    reais['pedidos'] = contagem.scalar_subquery()
+    reais['usuarios'] = select(func.count()).select_from(User).scalar_subquery()
+    return reais
+
+
+def reconciliar(conexao=None):
+    """Recalcula os contadores a partir das tabelas e corrige divergências."""
+    if conexao is None:
+        with db.engine.begin() as conexao:
+            return reconciliar(conexao)
+
+    reais = _valores_reais(conexao)
+    atuais = dict(conexao.execute(select(_tabela.c.chave, _tabela.c.valor)).all())
+    # Garante a linha de cada chave (soma zero nas que já existem)
+    somar(conexao, _tabela, [{'chave': chave, 'valor': 0} for chave in reais], ['chave'], ['valor'])
+    corrigidos = {}
+    for chave, real in reais.items():
+        # Contagem e escrita na mesma instrução: nada que outro worker grave
+        # entre a leitura e a correção é perdido
+        corrigido = conexao.execute(
+            _tabela.update()
+            .where(_tabela.c.chave == chave, _tabela.c.valor != real)
+            .values(valor=real)
+            .returning(_tabela.c.valor)
+        ).scalar()
+        if corrigido is not None or chave not in atuais:
+            corrigidos[chave] = (atuais.get(chave), corrigido if corrigido is not None else 0)
+    return corrigidos
+
+
+def popular_contadores(conexao):
+    # Passo de migração: bancos antigos ainda não têm a tabela preenchida, ou
+    # não têm os contadores por (status, forma de pagamento)
+    esperadas = ['pedidos', 'usuarios', *map(chave_status, STATUS_PEDIDO), *CHAVES_FACETAS]
+    existentes = conexao.execute(select(func.count()).select_from(_tabela)
+                                 .where(_tabela.c.chave.in_(esperadas))).scalar()
+    if existentes == len(esperadas):
+        return []
+    reconciliar(conexao)
+    return ['contadores do dashboard']
+
+
+# Reconciliação periódica em thread de fundo, iniciada no primeiro request de
+# cada processo (threads não sobrevivem ao fork dos workers)
+_reconciliador = None
+_reconciliador_lock = threading.Lock()
+
+
+def _loop_reconciliacao(app, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            with app.app_context():
+                corrigidos = reconciliar()
+            if corrigidos:
+                app.logger.warning('Contadores corrigidos na reconciliação: %s', corrigidos)
+        except Exception:
+            app.logger.exception('Falha ao reconciliar contadores')
+
+
+def _iniciar_reconciliacao(app):
+    global _reconciliador
+    intervalo = app.config.get('CONTADORES_RECONCILIAR_SEGUNDOS', 0)
+    if _reconciliador is not None or not intervalo:
+        return
+    with _reconciliador_lock:
+        if _reconciliador is None:
+            _reconciliador = threading.Thread(target=_loop_reconciliacao, args=(app, intervalo),
+                                              name='reconciliar-contadores', daemon=True)
+            _reconciliador.start()
+
+
+@click.command('reconciliar-contadores')
+@with_appcontext
+def reconciliar_contadores_command():
+    """Recalcula os contadores do dashboard a partir dos pedidos."""
+    corrigidos = reconciliar()
+    for chave, (antes, depois) in sorted(corrigidos.items()):
+        click.echo(f'{chave}: {antes} -> {depois}')
+    click.echo(f'{len(corrigidos)} contador(es) corrigido(s).')
+
+
+def _garantir_reconciliacao():
+    _iniciar_reconciliacao(current_app._get_current_object())
+
+
+def init_app(app):
+    app.cli.add_command(reconciliar_contadores_command)
+    app.before_request(_garantir_reconciliacao)
@@ -0,0 +1,249 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+import contadores
+import relatorios
+import senhas
+from models import db, User, Endereco, Produto, Pedido, PedidoItem, PedidoStatusEvento
+
+# Geração de dados sintéticos. As mesmas distribuições servem à rota
+# /admin/criar-pedidos-teste (30 pedidos pelo ORM) e ao `flask seed`, que
+# grava milhões de linhas com INSERTs executemany em lotes grandes, cada lote
+# em uma transação. Com a mesma semente e a mesma data final o resultado é
+# sempre o mesmo. Cada pedido vai para um dos endereços do cliente e ganha o
+# histórico de status que o fluxo real gravaria (andamento.py): a criação como
+# pendente e uma linha por etapa até o status sorteado.
+
+# Sobe quando os dados gerados mudam (o benchmark guarda os bancos por versão)
+VERSAO_DADOS = 2
+
+STATUS = ['pendente', 'preparando', 'pronto', 'entregue', 'cancelado']
+PESOS_STATUS = [0.3, 0.3, 0.2, 0.15, 0.05]
+FORMAS_PAGAMENTO = ['dinheiro', 'cartao', 'pix']
+
+# Movimento por hora do dia: picos no almoço e no jantar
+PESOS_HORA = [1, 1, 0, 0, 0, 0, 1, 2, 3, 4, 6, 10, 12, 9, 5, 4, 5, 7, 12, 16, 15, 10, 5, 2]
+
+OBSERVACOES = [
+    "Sem cebola por favor",
+    "Entregar na portaria",
+    "Embalar para viagem",
+    "Adicionar ketchup e mostarda",
+    "Quero o lanche bem passado",
+    "Entregar o mais rápido possível",
+    "Favor não incluir maionese",
+    "Trocar batata por onion rings"
+]
+
+# Segundos em cada etapa antes da próxima (mínimo, máximo)
+DURACAO_ETAPA = {'pendente': (60, 10 * 60), 'preparando': (8 * 60, 30 * 60), 'pronto': (5 * 60, 25 * 60)}
+CAMINHO = ['pendente', 'preparando', 'pronto', 'entregue']
+
+BAIRROS = ['Centro', 'Jardim América', 'Vila Nova', 'São José', 'Santa Luzia', 'Residencial Ipê']
+RUAS = ['Rua das Flores', 'Rua XV de Novembro', 'Avenida Brasil', 'Rua São Paulo', 'Rua 7 de Setembro']
+
+
+def data_aleatoria(rng, agora, dias):
+    """Instante nos últimos `dias` dias, concentrado nos horários de pico."""
+    dia = (agora - timedelta(days=rng.randint(0, dias))).replace(hour=0, minute=0, second=0, microsecond=0)
+    hora = rng.choices(range(24), weights=PESOS_HORA)[0]
+    data = dia + timedelta(hours=hora, minutes=rng.randint(0, 59), seconds=rng.randint(0, 59))
+    return min(data, agora)
+
+
+def pedido_aleatorio(rng, user_id, produtos, data_pedido, endereco_id=None):
+    """Dados de um pedido e de seus itens (dicts prontos para Pedido/PedidoItem)."""
+    status = rng.choices(STATUS, weights=PESOS_STATUS)[0]
+    forma_pagamento = rng.choice(FORMAS_PAGAMENTO)
+
+    troco_para = 0.0
+    if forma_pagamento == 'dinheiro' and rng.random() > 0.5:
+        troco_para = float(rng.randint(50, 100))
+
+    observacao = rng.choice(OBSERVACOES) if rng.random() < 0.3 else ''
+
+    itens = []
+    for _ in range(rng.randint(1, 4)):
+        produto = rng.choice(produtos)
+        itens.append({
+            'produto_id': produto.id,
+            'quantidade': rng.randint(1, 3),
+            'observacao': 'Observação do item' if rng.random() < 0.2 else '',
+            'preco_unitario': produto.preco,
+            'created_at': data_pedido,
+        })
+
+    pedido = {
+        'user_id': user_id,
+        'endereco_entrega_id': endereco_id,
+        'forma_pagamento': forma_pagamento,
+        'troco_para': troco_para,
+        'observacao': observacao,
+        'status': status,
+        'total': round(sum(item['preco_unitario'] * item['quantidade'] for item in itens), 2),
+        'created_at': data_pedido,
+        'updated_at': data_pedido,
+    }
+    return pedido, itens
+
+
+def historico_aleatorio(rng, pedido, agora):
+    """Eventos de status (dicts para PedidoStatusEvento, sem pedido_id) que levam o
+    pedido de pendente ao seu status; ajusta updated_at para o último."""
+    status = pedido['status']
+    if status == 'cancelado':
+        caminho = CAMINHO[:rng.randint(1, 3)] + ['cancelado']
+    else:
+        caminho = CAMINHO[:CAMINHO.index(status) + 1]
+
+    quando = pedido['created_at']
+    eventos = [{'de': None, 'para': caminho[0], 'criado_em': quando}]
+    for de, para in zip(caminho, caminho[1:]):
+        quando = min(quando + timedelta(seconds=rng.randint(*DURACAO_ETAPA[de])), agora)
+        eventos.append({'de': de, 'para': para, 'criado_em': quando})
+    pedido['updated_at'] = quando
+    return eventos
+
+
+def _proximo_id(conexao, modelo):
+    return (conexao.execute(select(func.max(modelo.id))).scalar() or 0) + 1
+
+
+class _Vazao:
+    def __init__(self):
+        self.linhas = {}
+        self.inicio = time.perf_counter()
+
+    def somar(self, tabela, quantidade):
+        self.linhas[tabela] = self.linhas.get(tabela, 0) + quantidade
+
+    def relatorio(self):
+        segundos = max(time.perf_counter() - self.inicio, 1e-9)
+        total = sum(self.linhas.values())
+        detalhes = ', '.join(f'{tabela}: {quantidade}' for tabela, quantidade in self.linhas.items())
+        return f'{total} linhas em {segundos:.1f}s ({total / segundos:,.0f} linhas/s) - {detalhes}'
+
+
+def _gravar_em_lotes(engine, gerar_lote, lotes, vazao, nome):
+    for numero, lote in enumerate(gerar_lote(), 1):
+        with engine.begin() as conexao:
+            for tabela_lote, linhas in lote:
+                conexao.execute(tabela_lote.insert(), linhas)
+                vazao.somar(tabela_lote.name, len(linhas))
+        click.echo(f'  {nome}: lote {numero}/{lotes} - {vazao.relatorio()}')
+
+
+def semear(usuarios, pedidos, semente=42, lote=20000, dias=365, data_final=None):
+    rng = random.Random(semente)
+    agora = data_final or datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=0)
+    engine = db.engine
+    vazao = _Vazao()
+
+    with engine.connect() as conexao:
+        produtos = conexao.execute(select(Produto.id, Produto.preco).where(Produto.ativo == True)
+                                   .order_by(Produto.id)).all()
+        primeiro_usuario = _proximo_id(conexao, User)
+        primeiro_endereco = _proximo_id(conexao, Endereco)
+        primeiro_pedido = _proximo_id(conexao, Pedido)
+        primeiro_evento = _proximo_id(conexao, PedidoStatusEvento)
+    if not produtos:
+        raise click.ClickException('É necessário ter produtos ativos (rode init_db antes)')
+
+    # Um único hash para todos: gerar milhões de hashes levaria horas
+    senha = senhas.gerar_hash('cliente123')
+    usuario_ids = range(primeiro_usuario, primeiro_usuario + usuarios)
+    enderecos = {}  # user_id -> ids dos endereços do cliente
+
+    def lotes_usuarios():
+        endereco_id = primeiro_endereco
+        for inicio in range(0, usuarios, lote):
+            linhas_usuarios, linhas_enderecos = [], []
+            for user_id in usuario_ids[inicio:inicio + lote]:
+                criado_em = agora - timedelta(days=dias, seconds=rng.randint(0, 86400 * 30))
+                linhas_usuarios.append({
+                    'id': user_id, 'username': f'cliente{user_id}', 'email': f'cliente{user_id}@seed.local',
+                    'password_hash': senha, 'is_admin': False, 'created_at': criado_em, 'updated_at': criado_em,
+                })
+                quantidade = 1 if rng.random() < 0.7 else 2
+                enderecos[user_id] = tuple(range(endereco_id, endereco_id + quantidade))
+                for n in range(quantidade):
+                    linhas_enderecos.append({
+                        'id': endereco_id, 'user_id': user_id, 'cep': f'15{rng.randint(100, 999)}-000',
+                        'logradouro': rng.choice(RUAS), 'numero': str(rng.randint(1, 2000)),
+                        'complemento': None, 'bairro': rng.choice(BAIRROS), 'cidade': 'Ubarana',
+                        'estado': 'SP', 'principal': n == 0, 'created_at': criado_em,
+                    })
+                    endereco_id += 1
+            yield [(User.__table__, linhas_usuarios), (Endereco.__table__, linhas_enderecos)]
+
+    # Poucos clientes fazem muitos pedidos: pesos 1/posição (Zipf)
+    if usuarios:
+        clientes = list(usuario_ids)
+        acumulado = list(accumulate(1 / posicao for posicao in range(1, usuarios + 1)))
+    else:
+        with engine.connect() as conexao:
+            clientes = conexao.execute(select(User.id).where(User.is_admin == False)).scalars().all()
+            por_cliente = {}
+            for user_id, endereco_id in conexao.execute(select(Endereco.user_id, Endereco.id).order_by(Endereco.id)):
+                por_cliente.setdefault(user_id, []).append(endereco_id)
+            enderecos.update((user_id, tuple(ids)) for user_id, ids in por_cliente.items())
+        if not clientes and pedidos:
+            raise click.ClickException('Nenhum cliente para os pedidos; use --usuarios')
+        acumulado = None
+
+    def lotes_pedidos():
+        pedido_id, evento_id = primeiro_pedido, primeiro_evento
+        for inicio in range(0, pedidos, lote):
+            linhas_pedidos, linhas_itens, linhas_eventos = [], [], []
+            for _ in range(min(lote, pedidos - inicio)):
+                user_id = rng.choices(clientes, cum_weights=acumulado)[0]
+                do_cliente = enderecos.get(user_id)
+                endereco_id = rng.choice(do_cliente) if do_cliente else None
+                pedido, itens = pedido_aleatorio(rng, user_id, produtos, data_aleatoria(rng, agora, dias),
+                                                 endereco_id)
+                pedido['id'] = pedido_id
+                linhas_pedidos.append(pedido)
+                for item in itens:
+                    item['pedido_id'] = pedido_id
+                linhas_itens.extend(itens)
+                for evento in historico_aleatorio(rng, pedido, agora):
+                    linhas_eventos.append({'id': evento_id, 'pedido_id': pedido_id, **evento})
+                    evento_id += 1
+                pedido_id += 1
+            yield [(Pedido.__table__, linhas_pedidos), (PedidoItem.__table__, linhas_itens),
+                   (PedidoStatusEvento.__table__, linhas_eventos)]
+
+    if usuarios:
+        _gravar_em_lotes(engine, lotes_usuarios, -(-usuarios // lote), vazao, 'usuários')
+    if pedidos:
+        _gravar_em_lotes(engine, lotes_pedidos, -(-pedidos // lote), vazao, 'pedidos')
+
+    # Os INSERTs em lote não passam pelos eventos do ORM
+    contadores.reconciliar()
+    if pedidos:
+        with engine.begin() as conexao:
+            relatorios.recalcular(conexao)
+    return vazao
+
+
+@click.command('seed')
+@click.option('--usuarios', default=1000, show_default=True, help='Clientes novos (cada um com 1 ou 2 endereços).')
+@click.option('--pedidos', default=100000, show_default=True, help='Pedidos novos (1 a 4 itens cada).')
+@click.option('--semente', default=42, show_default=True, help='Semente do gerador aleatório.')
+@click.option('--lote', default=20000, show_default=True, help='Linhas principais por INSERT/transação.')
+@click.option('--dias', default=365, show_default=True, help='Janela de datas dos pedidos.')
+@click.option('--data-final', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Último dia dos pedidos (padrão: hoje). Fixe para repetir exatamente o mesmo banco.')
+@with_appcontext
+def seed_command(usuarios, pedidos, semente, lote, dias, data_final):
+    """Gera clientes, endereços e pedidos sintéticos em massa para testes de carga."""
+    if data_final is not None:
+        data_final = data_final.replace(hour=23, minute=59, second=59)
+    vazao = semear(usuarios, pedidos, semente=semente, lote=max(lote, 1), dias=dias, data_final=data_final)
+    click.echo(f'Concluído: {vazao.relatorio()}')
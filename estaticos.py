@@ -0,0 +1,232 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # sem o pacote brotli só o .gz é gerado
+    brotli = None
+
+# Arquivos estáticos com o hash do conteúdo no nome. `flask compilar-estaticos`
+# (ou o primeiro uso, se o manifesto estiver desatualizado) copia cada arquivo
+# de static/ para static/dist/ como <nome>.<hash>.<ext>, junto com versões .gz
+# e .br já comprimidas. url_for('static', filename='css/style.css') passa a gerar a URL
+# do arquivo com hash, que é servido com cache "immutable": uma nova versão
+# tem outro nome, então o navegador nunca precisa revalidar. A versão
+# comprimida é escolhida pelo Accept-Encoding e lida direto do disco.
+# As imagens de produto já têm o hash no nome (imagens.py) e ficam de fora.
+#
+# Nada disso roda na inicialização: cada processo carrega o manifesto no
+# primeiro url_for('static') ou pedido a dist/. O manifesto guarda mtime e
+# tamanho dos originais, então conferir se ele vale custa só um stat por
+# arquivo; hash e compressão só rodam quando algum original mudou.
+
+PASTA_DIST = 'dist'
+PASTAS_IGNORADAS = (PASTA_DIST, 'uploads')
+COMPRIMIVEIS = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml', '.ico'}
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))  # ordem de preferência
+CACHE_IMUTAVEL = 365 * 24 * 3600
+MANIFESTO = 'manifest.json'
+
+_manifesto = {}  # 'css/style.css' -> 'dist/css/style.<hash>.css'
+_comprimidos = {}  # 'dist/css/style.<hash>.css' -> ('br', 'gzip')
+_lock = threading.Lock()
+_pronto = False
+_lock_carga = threading.Lock()
+
+
+def _gravar(destino, conteudo):
+    # Nome temporário por processo: vários workers podem compilar ao mesmo tempo
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, destino)
+
+
+def _comprimir(codificacao, conteudo):
+    if codificacao == 'br':
+        return brotli.compress(conteudo, quality=11) if brotli is not None else None
+    return gzip.compress(conteudo, compresslevel=9, mtime=0)
+
+
+def _arquivos(pasta):
+    for raiz, pastas, arquivos in os.walk(pasta):
+        if raiz == pasta:
+            pastas[:] = [p for p in pastas if p not in PASTAS_IGNORADAS]
+        for nome in arquivos:
+            if not nome.startswith('.'):
+                caminho = os.path.join(raiz, nome)
+                yield os.path.relpath(caminho, pasta).replace(os.sep, '/'), caminho
+
+
+def _fontes(pasta):
+    # Assinatura barata dos originais: [mtime_ns, tamanho] por arquivo
+    fontes = {}
+    for relativo, caminho in _arquivos(pasta):
+        info = os.stat(caminho)
+        fontes[relativo] = [info.st_mtime_ns, info.st_size]
+    return fontes
+
+
+def compilar(pasta, fontes=None):
+    """Gera static/dist com os arquivos renomeados pelo hash e as versões comprimidas."""
+    if fontes is None:
+        fontes = _fontes(pasta)
+    manifesto, comprimidos = {}, {}
+    for relativo, caminho in sorted(_arquivos(pasta)):
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        base, extensao = os.path.splitext(relativo)
+        nome = f'{PASTA_DIST}/{base}.{hashlib.sha256(conteudo).hexdigest()[:12]}{extensao}'
+        destino = os.path.join(pasta, *nome.split('/'))
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if not os.path.exists(destino):
+            _gravar(destino, conteudo)
+
+        disponiveis = []
+        if extensao.lower() in COMPRIMIVEIS:
+            for codificacao, sufixo in CODIFICACOES:
+                if not os.path.exists(destino + sufixo):
+                    comprimido = _comprimir(codificacao, conteudo)
+                    # Só vale a pena se ficar menor que o original
+                    if comprimido is None or len(comprimido) >= len(conteudo):
+                        continue
+                    _gravar(destino + sufixo, comprimido)
+                disponiveis.append(codificacao)
+        manifesto[relativo] = nome
+        comprimidos[nome] = tuple(disponiveis)
+
+    dados = json.dumps({'arquivos': manifesto, 'comprimidos': comprimidos, 'fontes': fontes},
+                       indent=2, sort_keys=True)
+    _gravar(os.path.join(pasta, PASTA_DIST, MANIFESTO), dados.encode())
+    _ativar(manifesto, comprimidos)
+    return manifesto
+
+
+def carregar(pasta, fontes=None):
+    """Usa o manifesto de uma compilação anterior; False se ele não existir ou,
+    com `fontes`, se foi gerado a partir de outros originais."""
+    try:
+        with open(os.path.join(pasta, PASTA_DIST, MANIFESTO)) as arquivo:
+            dados = json.load(arquivo)
+    except (OSError, ValueError):
+        return False
+    if fontes is not None and dados.get('fontes') != fontes:
+        return False
+    _ativar(dados['arquivos'], {nome: tuple(cods) for nome, cods in dados['comprimidos'].items()})
+    return True
+
+
+def _ativar(manifesto, comprimidos):
+    global _manifesto, _comprimidos
+    with _lock:
+        _manifesto, _comprimidos = manifesto, comprimidos
+
+
+def _garantir():
+    # Uma vez por processo, no primeiro uso
+    global _pronto
+    if _pronto:
+        return
+    with _lock_carga:
+        if _pronto:
+            return
+        pasta = current_app.static_folder
+        if current_app.config.get('ESTATICOS_COMPILAR', True):
+            fontes = _fontes(pasta)
+            if not carregar(pasta, fontes):
+                compilar(pasta, fontes)
+        elif not carregar(pasta):
+            _ativar({}, {})
+            current_app.logger.warning('static/dist sem manifesto: rode `flask compilar-estaticos`')
+        _pronto = True
+
+
+def invalidar():
+    """Faz o próximo uso reler (e, se preciso, recompilar) o manifesto."""
+    global _pronto
+    with _lock_carga:
+        _pronto = False
+
+
+def limpar(pasta):
+    """Remove de static/dist os arquivos que não estão no manifesto atual."""
+    manter = {MANIFESTO}
+    for nome in _manifesto.values():
+        relativo = nome.split('/', 1)[1]
+        manter.add(relativo)
+        manter.update(relativo + sufixo for _, sufixo in CODIFICACOES)
+    removidos = 0
+    for relativo, caminho in list(_arquivos(os.path.join(pasta, PASTA_DIST))):
+        if relativo not in manter:
+            os.remove(caminho)
+            removidos += 1
+    return removidos
+
+
+def _url_com_hash(endpoint, values):
+    if endpoint == 'static':
+        _garantir()
+        nome = _manifesto.get(values.get('filename'))
+        if nome is not None:
+            values['filename'] = nome
+
+
+def _servir_compilado(filename):
+    # Arquivos de dist/ nunca mudam; a versão comprimida vem pronta do disco
+    _garantir()
+    aceitas = request.accept_encodings
+    sufixo = codificacao = None
+    for opcao, extensao in CODIFICACOES:
+        if opcao in _comprimidos.get(filename, ()) and aceitas[opcao]:
+            codificacao, sufixo = opcao, extensao
+            break
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    resposta = send_from_directory(current_app.static_folder, filename + (sufixo or ''),
+                                   mimetype=mimetype, max_age=CACHE_IMUTAVEL)
+    if codificacao is not None:
+        resposta.headers['Content-Encoding'] = codificacao
+    if filename in _comprimidos:
+        resposta.vary.add('Accept-Encoding')
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    resposta.cache_control.no_cache = None
+    return resposta
+
+
+@click.command('compilar-estaticos')
+@click.option('--limpar', 'remover_antigos', is_flag=True,
+              help='Remove de static/dist as versões que não estão mais em uso.')
+@with_appcontext
+def compilar_estaticos_command(remover_antigos):
+    """Gera static/dist com nomes por hash e versões .gz/.br dos arquivos estáticos."""
+    pasta = current_app.static_folder
+    manifesto = compilar(pasta)
+    for original, nome in sorted(manifesto.items()):
+        codificacoes = ', '.join(_comprimidos.get(nome, ())) or '-'
+        click.echo(f'{original:<30} -> {nome}  [{codificacoes}]')
+    if brotli is None:
+        click.echo('Pacote brotli não instalado: só versões .gz foram geradas.')
+    if remover_antigos:
+        click.echo(f'{limpar(pasta)} arquivo(s) antigo(s) removido(s).')
+
+
+def init_app(app):
+    app.url_defaults(_url_com_hash)
+    servir_original = app.view_functions['static']
+
+    def servir_estatico(filename):
+        if filename.startswith(PASTA_DIST + '/') and filename != f'{PASTA_DIST}/{MANIFESTO}':
+            return _servir_compilado(filename)
+        return servir_original(filename=filename)
+
+    app.view_functions['static'] = servir_estatico
+    app.cli.add_command(compilar_estaticos_command)
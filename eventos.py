@@ -0,0 +1,187 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from models import Pedido
+
+# Broker pub/sub em processo para o acompanhamento de pedidos em tempo real
+# via Server-Sent Events. Os eventos são coletados pelos eventos do ORM
+# durante o flush e só publicados depois do commit, então nada que sofreu
+# rollback chega ao navegador. O buffer de replay permite que um cliente
+# reconectado (cabeçalho Last-Event-ID) receba o que perdeu.
+#
+# O broker é por processo: só as conexões abertas no processo que fez o
+# commit recebem o evento, e o replay também é local. Por isso a app roda em
+# um único processo com threads (gunicorn -k gthread, veja wsgi.py), onde
+# todo stream e todo commit passam pelo mesmo broker. Cada stream ocupa uma
+# thread enquanto está aberto; depois de SSE_DURACAO_MAXIMA segundos ele é
+# encerrado e o EventSource reconecta sozinho com Last-Event-ID, então
+# nenhuma thread fica presa a uma aba esquecida.
+
+
+class LimiteAssinantes(Exception):
+    pass
+
+
+class Evento:
+    __slots__ = ('id', 'tipo', 'dados', 'user_id', 'texto')
+
+    def __init__(self, id, tipo, dados, user_id):
+        self.id = id
+        self.tipo = tipo
+        self.dados = dados
+        self.user_id = user_id
+        self.texto = f'id: {id}\nevent: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n'
+
+
+class Assinatura:
+    def __init__(self, user_id, tamanho_fila):
+        self.user_id = user_id  # None = todos os pedidos (admin)
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+
+    def aceita(self, evento):
+        return self.user_id is None or self.user_id == evento.user_id
+
+
+class Broker:
+    def __init__(self, max_assinantes=50, tamanho_replay=500, tamanho_fila=100):
+        self.max_assinantes = max_assinantes
+        self.tamanho_fila = tamanho_fila
+        self._lock = threading.Lock()
+        self._assinantes = set()
+        self._replay = deque(maxlen=tamanho_replay)
+        # Ids começam no relógio para continuarem crescendo após um restart
+        self._ultimo_id = int(time.time() * 1000)
+
+    def publicar(self, tipo, dados, user_id=None):
+        with self._lock:
+            self._ultimo_id += 1
+            evento = Evento(self._ultimo_id, tipo, dados, user_id)
+            self._replay.append(evento)
+            for assinatura in list(self._assinantes):
+                if not assinatura.aceita(evento):
+                    continue
+                try:
+                    assinatura.fila.put_nowait(evento)
+                except queue.Full:
+                    # Cliente lento: encerra o stream; ele reconecta com
+                    # Last-Event-ID e recupera o que faltou pelo replay
+                    self._assinantes.discard(assinatura)
+                    self._encerrar(assinatura)
+        return evento
+
+    def assinar(self, user_id=None, ultimo_id=None):
+        with self._lock:
+            if len(self._assinantes) >= self.max_assinantes:
+                raise LimiteAssinantes()
+            assinatura = Assinatura(user_id, self.tamanho_fila)
+            if ultimo_id is not None:
+                perdidos = [e for e in self._replay if e.id > ultimo_id and assinatura.aceita(e)]
+                for evento in perdidos[-self.tamanho_fila:]:
+                    assinatura.fila.put_nowait(evento)
+            self._assinantes.add(assinatura)
+            return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinantes.discard(assinatura)
+
+    @staticmethod
+    def _encerrar(assinatura):
+        try:
+            while True:
+                assinatura.fila.get_nowait()
+        except queue.Empty:
+            pass
+        assinatura.fila.put_nowait(None)
+
+    def stream(self, assinatura, heartbeat, duracao_maxima=None):
+        fim = time.monotonic() + duracao_maxima if duracao_maxima else None
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                espera = heartbeat
+                if fim is not None:
+                    restante = fim - time.monotonic()
+                    if restante <= 0:
+                        return  # o cliente reconecta e recebe o que perdeu pelo replay
+                    espera = min(heartbeat, restante)
+                try:
+                    evento = assinatura.fila.get(timeout=espera)
+                except queue.Empty:
+                    if fim is None or time.monotonic() < fim:
+                        yield ': ping\n\n'
+                    continue
+                if evento is None:
+                    return
+                yield evento.texto
+        finally:
+            self.cancelar(assinatura)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = current_app.config
+                _broker = Broker(max_assinantes=config.get('SSE_MAX_ASSINANTES', 50),
+                                 tamanho_replay=config.get('SSE_REPLAY', 500))
+    return _broker
+
+
+def dados_pedido(pedido):
+    return {
+        'id': pedido.id,
+        'status': pedido.status,
+        'total': pedido.total,
+        'user_id': pedido.user_id,
+        'created_at': pedido.created_at.isoformat() if pedido.created_at else None,
+    }
+
+
+# Coleta durante o flush e publicação após o commit
+def _enfileirar(pedido, tipo):
+    session = object_session(pedido)
+    if session is not None:
+        session.info.setdefault('eventos_pedido', []).append((tipo, dados_pedido(pedido)))
+
+
+@event.listens_for(Pedido, 'after_insert')
+def _pedido_criado(mapper, conexao, pedido):
+    _enfileirar(pedido, 'pedido_criado')
+
+
+@event.listens_for(Pedido, 'after_update')
+def _pedido_atualizado(mapper, conexao, pedido):
+    if inspect(pedido).attrs.status.history.has_changes():
+        _enfileirar(pedido, 'status_atualizado')
+
+
+@event.listens_for(Pedido, 'after_delete')
+def _pedido_excluido(mapper, conexao, pedido):
+    _enfileirar(pedido, 'pedido_excluido')
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_apos_commit(session):
+    pendentes = session.info.pop('eventos_pedido', None)
+    if not pendentes or _broker is None:
+        return
+    for tipo, dados in pendentes:
+        _broker.publicar(tipo, dados, user_id=dados['user_id'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_eventos(session):
+    session.info.pop('eventos_pedido', None)
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from consultas import condicoes_pedidos
+from models import db, Endereco, Pedido, PedidoItem, Produto, User
+
+# Exportação de pedidos para a contabilidade. Uma única consulta junta pedido,
+# cliente, endereço, itens e produto, e é lida do banco em lotes fixos
+# (yield_per): cada lote vira um pedaço da resposta e é descartado antes do
+# próximo, então a memória é a mesma para mil ou cinco milhões de pedidos.
+# CSV tem uma linha por item; NDJSON tem um objeto por pedido com os itens.
+# Os filtros são os mesmos da lista de pedidos do admin (consultas.filtros_pedidos).
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+LOTE = 1000
+
+COLUNAS = (
+    'pedido_id', 'data', 'status', 'forma_pagamento', 'total', 'troco_para', 'observacao',
+    'cliente_id', 'cliente', 'email',
+    'cep', 'logradouro', 'numero', 'complemento', 'bairro', 'cidade', 'estado',
+    'item_id', 'produto_id', 'produto', 'quantidade', 'preco_unitario', 'subtotal', 'item_observacao',
+)
+_COLUNAS_PEDIDO = COLUNAS[:COLUNAS.index('item_id')]
+_COLUNAS_ITEM = COLUNAS[COLUNAS.index('item_id'):]
+
+# Texto digitado pelo cliente que o Excel/LibreOffice interpretariam como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+def consulta(filtros):
+    stmt = (
+        select(
+            Pedido.id.label('pedido_id'), Pedido.created_at.label('data'), Pedido.status,
+            Pedido.forma_pagamento, Pedido.total, Pedido.troco_para, Pedido.observacao,
+            User.id.label('cliente_id'), User.username.label('cliente'), User.email,
+            Endereco.cep, Endereco.logradouro, Endereco.numero, Endereco.complemento,
+            Endereco.bairro, Endereco.cidade, Endereco.estado,
+            PedidoItem.id.label('item_id'), PedidoItem.produto_id, Produto.nome.label('produto'),
+            PedidoItem.quantidade, PedidoItem.preco_unitario, PedidoItem.observacao.label('item_observacao'),
+        )
+        .join(User, Pedido.user_id == User.id)
+        .outerjoin(Endereco, Pedido.endereco_entrega_id == Endereco.id)
+        .outerjoin(PedidoItem, PedidoItem.pedido_id == Pedido.id)
+        .outerjoin(Produto, PedidoItem.produto_id == Produto.id)
+        # Mesma ordem do índice (created_at, id): sem ordenação em memória no banco
+        .order_by(Pedido.created_at, Pedido.id, PedidoItem.id)
+    )
+    return stmt.where(*condicoes_pedidos(filtros))
+
+
+def _lotes(filtros, lote):
+    resultado = db.session.execute(consulta(filtros).execution_options(yield_per=lote))
+    try:
+        for linhas in resultado.partitions():
+            yield linhas
+    finally:
+        resultado.close()
+
+
+def _subtotal(linha):
+    if linha.item_id is None:
+        return None
+    return round(linha.quantidade * linha.preco_unitario, 2)
+
+
+def _celula_csv(valor):
+    if valor is None:
+        return ''
+    # O apóstrofo faz a planilha tratar a célula como texto (injeção de fórmula)
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def gerar_csv(filtros, lote=LOTE):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para o Excel abrir os acentos corretamente
+    buffer.write('\ufeff')
+    escritor.writerow(COLUNAS)
+    for linhas in _lotes(filtros, lote):
+        for linha in linhas:
+            dados = linha._asdict()
+            dados['data'] = dados['data'].isoformat(sep=' ', timespec='seconds') if dados['data'] else ''
+            dados['subtotal'] = _subtotal(linha)
+            escritor.writerow([_celula_csv(dados[coluna]) for coluna in COLUNAS])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _pedido_json(linha):
+    pedido = {coluna: getattr(linha, coluna) for coluna in _COLUNAS_PEDIDO}
+    pedido['data'] = pedido['data'].isoformat(timespec='seconds') if pedido['data'] else None
+    pedido['itens'] = []
+    return pedido
+
+
+def gerar_ndjson(filtros, lote=LOTE):
+    # As linhas chegam ordenadas por pedido; um pedido pode atravessar dois lotes
+    atual = None
+    for linhas in _lotes(filtros, lote):
+        pedaco = []
+        for linha in linhas:
+            if atual is None or atual['pedido_id'] != linha.pedido_id:
+                if atual is not None:
+                    pedaco.append(json.dumps(atual, ensure_ascii=False))
+                atual = _pedido_json(linha)
+            if linha.item_id is not None:
+                item = {coluna: getattr(linha, coluna) for coluna in _COLUNAS_ITEM if coluna != 'subtotal'}
+                item['subtotal'] = _subtotal(linha)
+                atual['itens'].append(item)
+        if pedaco:
+            yield ('\n'.join(pedaco) + '\n').encode('utf-8')
+    if atual is not None:
+        yield (json.dumps(atual, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+GERADORES = {'csv': gerar_csv, 'ndjson': gerar_ndjson}
+
+
+def nome_arquivo(formato, filtros):
+    partes = ['pedidos']
+    if filtros.inicio:
+        partes.append(filtros.inicio.strftime('%Y%m%d'))
+    if filtros.fim:
+        partes.append((filtros.fim - timedelta(days=1)).strftime('%Y%m%d'))
+    partes.extend(filtros.status)
+    partes.extend(filtros.formas_pagamento)
+    return '_'.join(partes) + '.' + formato
@@ -0,0 +1,123 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import metricas
+from models import db
+from orcamento_sql import contar_sql
+
+# Gravação em grupo (group commit). No SQLite cada transação de escrita
+# espera o lock do banco e faz seu próprio fsync, então no pico os pedidos
+# entram um por vez no ritmo do disco. Aqui as requisições só validam e
+# enfileiram o que vai ser gravado; uma única thread por processo tira da fila
+# até `lote_maximo` itens (esperando no máximo `espera_ms` pelos
+# seguintes), grava todos em uma transação e faz um commit só. Cada
+# requisição espera o próprio Future, que recebe o resultado (o id do
+# pedido) depois do commit. As instruções SQL de um lote são de todos os
+# pedidos juntos (um INSERT em lote para os itens de todos, por exemplo),
+# então não são divididas entre as requisições: cada lote é registrado com
+# seus totais nos histogramas batch_* de metricas.py, e o orçamento de
+# @limite_sql da requisição conta só o que ela mesma executa (a validação).
+# Com a fila cheia a requisição falha na hora (FilaCheia) em vez de acumular
+# espera.
+
+
+class FilaCheia(Exception):
+    pass
+
+
+class GravacaoPendente(Exception):
+    """O item já estava sendo gravado quando o tempo acabou: pode ou não ter sido salvo."""
+
+
+class GravadorEmGrupo:
+    def __init__(self, app, gravar, lote_maximo=32, espera_ms=5, fila_maxima=256, timeout=10, nome='pedidos'):
+        self.app = app
+        self.nome = nome  # rótulo dos histogramas de lote
+        self.gravar = gravar  # função(lista de itens) -> lista de resultados; o commit fica aqui
+        self.lote_maximo = max(1, lote_maximo)
+        self.espera = espera_ms / 1000
+        self.timeout = timeout
+        self._fila = queue.Queue(maxsize=fila_maxima)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _garantir_thread(self):
+        # Threads não sobrevivem ao fork dos workers: uma por processo
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self._thread = threading.Thread(target=self._executar, name='gravador-pedidos', daemon=True)
+                    self._pid = os.getpid()
+                    self._thread.start()
+
+    def enviar(self, item):
+        """Enfileira o item e espera o resultado da gravação."""
+        self._garantir_thread()
+        futuro = Future()
+        try:
+            self._fila.put_nowait((item, futuro))
+        except queue.Full:
+            raise FilaCheia()
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            # Ainda na fila: desiste sem gravar
+            if futuro.cancel():
+                raise FilaCheia()
+            # Já em gravação: espera o commit mais um timeout, e depois desiste
+            try:
+                return futuro.result(timeout=self.timeout)
+            except TimeoutError:
+                raise GravacaoPendente()
+
+    def _proximo_lote(self):
+        lote = [self._fila.get()]
+        limite = time.monotonic() + self.espera
+        while len(lote) < self.lote_maximo:
+            try:
+                restante = limite - time.monotonic()
+                lote.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        # Itens cujo Future foi cancelado (timeout da requisição) ficam de fora
+        return [(item, futuro) for item, futuro in lote if futuro.set_running_or_notify_cancel()]
+
+    def _executar(self):
+        while True:
+            lote = self._proximo_lote()
+            if not lote:
+                continue
+            try:
+                with self.app.app_context():
+                    self._gravar_lote(lote)
+            except Exception as e:
+                self.app.logger.exception('Falha no gravador de pedidos')
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+    def _gravar_lote(self, lote):
+        inicio = time.perf_counter()
+        try:
+            with contar_sql() as contador:
+                resultados = self.gravar([item for item, _ in lote])
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(lote) == 1:
+                lote[0][1].set_exception(e)
+                return
+            # Um item com problema não derruba os outros: regrava um a um
+            for item in lote:
+                self._gravar_lote([item])
+            return
+        metricas.registro.registrar_lote(self.nome, len(lote), contador.total, time.perf_counter() - inicio)
+        for (_, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+    def tamanho_fila(self):
+        return self._fila.qsize()
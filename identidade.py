@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from models import db, User
+
+# Cache de identidade para o user_loader do Flask-Login. Em vez de carregar
+# o User completo a cada requisição, guarda um registro imutável com os campos
+# que as páginas leem (id, username, email, is_admin, created_at) em um mapa
+# LRU com TTL. current_user passa a ser um UsuarioAtual, que responde esses
+# campos do cache e só carrega a instância do ORM (na sessão da requisição)
+# quando a rota usa outra coisa: enderecos, check_password, set_password...
+# Commits que alteram ou excluem um User invalidam a entrada; o TTL limita a
+# defasagem entre processos.
+IdentidadeInfo = namedtuple('IdentidadeInfo', 'id username email is_admin created_at')
+
+PADRAO_TTL = 60
+PADRAO_MAX = 10000
+
+_CAMPOS = (User.id, User.username, User.email, User.is_admin, User.created_at)
+
+
+class UsuarioAtual(UserMixin):
+    # Igualdade vem do UserMixin (compara get_id), então vale também contra User
+    def __init__(self, info):
+        self._info = info
+        self._modelo = None
+
+    id = property(lambda self: self._info.id)
+    username = property(lambda self: self._info.username)
+    email = property(lambda self: self._info.email)
+    is_admin = property(lambda self: self._info.is_admin)
+    created_at = property(lambda self: self._info.created_at)
+
+    @property
+    def modelo(self):
+        """Instância User do ORM, carregada na primeira vez que é pedida."""
+        if self._modelo is None:
+            self._modelo = db.session.get(User, self._info.id)
+        return self._modelo
+
+    def __getattr__(self, nome):
+        # Chamado só para o que não está no cache (relacionamentos, métodos)
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        return getattr(self.modelo, nome)
+
+    def __repr__(self):
+        return f'<UsuarioAtual {self.username}>'
+
+
+class CacheIdentidades:
+    def __init__(self, ttl=PADRAO_TTL, maximo=PADRAO_MAX):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # id -> (expira_em, IdentidadeInfo)
+
+    def obter(self, user_id):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is not None:
+                if entrada[0] >= agora:
+                    self._entradas.move_to_end(user_id)
+                    return entrada[1]
+                del self._entradas[user_id]
+        return None
+
+    def guardar(self, info):
+        with self._lock:
+            self._entradas[info.id] = (time.monotonic() + self.ttl, info)
+            self._entradas.move_to_end(info.id)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entradas.clear()
+            else:
+                for user_id in user_ids:
+                    self._entradas.pop(user_id, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = current_app.config if has_app_context() else {}
+                _cache = CacheIdentidades(ttl=config.get('IDENTIDADE_TTL', PADRAO_TTL),
+                                          maximo=config.get('IDENTIDADE_MAX', PADRAO_MAX))
+    return _cache
+
+
+def carregar(user_id):
+    """Usado no user_loader: UsuarioAtual do cache ou de uma consulta só com os campos do registro."""
+    info = cache().obter(user_id)
+    if info is None:
+        linha = db.session.execute(select(*_CAMPOS).where(User.id == user_id)).first()
+        if linha is None:
+            return None
+        info = IdentidadeInfo(linha.id, linha.username, linha.email, bool(linha.is_admin), linha.created_at)
+        cache().guardar(info)
+    return UsuarioAtual(info)
+
+
+# Invalidação ligada ao ORM, aplicada só depois do commit
+def _marcar_alterado(mapper, connection, usuario):
+    session = object_session(usuario)
+    if session is not None:
+        alterados = session.info.setdefault('identidades_alteradas', set())
+        if alterados is not None:
+            alterados.add(usuario.id)
+
+
+for _evento in ('after_update', 'after_delete'):
+    event.listen(User, _evento, _marcar_alterado)
+
+
+def _marcar_alterado_em_massa(contexto):
+    if contexto.mapper.class_ is User:
+        contexto.session.info['identidades_alteradas'] = None  # todas
+
+
+event.listen(Session, 'after_bulk_update', _marcar_alterado_em_massa)
+event.listen(Session, 'after_bulk_delete', _marcar_alterado_em_massa)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_apos_commit(session):
+    if 'identidades_alteradas' not in session.info:
+        return
+    alterados = session.info.pop('identidades_alteradas')
+    if _cache is not None:
+        _cache.invalidar(alterados)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marca(session):
+    session.info.pop('identidades_alteradas', None)
@@ -0,0 +1,176 @@
+import glob
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, request
+
+# Imagens de produto. O upload é gravado com o hash do conteúdo no nome
+# (<hash>.<ext>) e, em segundo plano, vira variantes de largura fixa em WebP
+# e JPEG (<hash>-<largura>.webp/.jpg). Como o nome muda sempre que o conteúdo
+# muda, os arquivos são servidos com cache "immutable". O catálogo é
+# descartado quando as variantes ficam prontas, para o próximo /api/cardapio
+# já trazer o srcset.
+
+LARGURAS = (320, 640, 960)
+FORMATOS = (('webp', 'WEBP', {'quality': 80, 'method': 4}),
+            ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+LARGURA_PADRAO = 640  # src do <img> para navegadores sem srcset
+
+_NOME_HASH = re.compile(r'^[0-9a-f]{16}(-\d+)?\.[a-z]+$')
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pillow = None
+
+
+def pillow():
+    """Módulos (Image, ImageOps) do Pillow, importados no primeiro uso; None sem o pacote."""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image, ImageOps
+            _pillow = (Image, ImageOps)
+        except ImportError:  # Pillow é opcional: sem ele só o original é servido
+            _pillow = False
+    return _pillow or None
+
+
+def pasta():
+    return os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=current_app.config.get('IMAGENS_THREADS', 2),
+                                               thread_name_prefix='imagens')
+    return _executor
+
+
+def _extensao_permitida(nome):
+    return '.' in nome and nome.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def salvar_upload(arquivo):
+    """Grava o upload como <hash>.<ext> e agenda as variantes. Retorna o nome ou None."""
+    if not arquivo or not _extensao_permitida(arquivo.filename):
+        return None
+    conteudo = arquivo.read()
+    modulos = pillow()
+    if modulos is not None:
+        try:
+            modulos[0].open(io.BytesIO(conteudo)).verify()
+        except Exception:
+            return None
+
+    extensao = arquivo.filename.rsplit('.', 1)[1].lower()
+    nome = f'{hashlib.sha256(conteudo).hexdigest()[:16]}.{extensao}'
+    os.makedirs(pasta(), exist_ok=True)
+    caminho = os.path.join(pasta(), nome)
+    if not os.path.exists(caminho):  # mesmo conteúdo já enviado antes
+        with open(caminho, 'wb') as destino:
+            destino.write(conteudo)
+
+    if modulos is not None:
+        futuro = _pool().submit(gerar_variantes, caminho)
+        futuro.add_done_callback(_variantes_prontas)
+    return nome
+
+
+def gerar_variantes(caminho):
+    """Redimensiona o original para cada largura (sem ampliar) nos dois formatos."""
+    Image, ImageOps = pillow()
+    base = os.path.splitext(caminho)[0]
+    with Image.open(caminho) as original:
+        original = ImageOps.exif_transpose(original)
+        geradas = []
+        for largura in LARGURAS:
+            if largura > original.width and largura != LARGURAS[0]:
+                break
+            copia = original.copy()
+            copia.thumbnail((largura, largura * 4), Image.LANCZOS)
+            for extensao, formato, opcoes in FORMATOS:
+                destino = f'{base}-{largura}.{extensao}'
+                if os.path.exists(destino):
+                    continue
+                imagem = copia
+                if formato == 'JPEG' and imagem.mode not in ('RGB', 'L'):
+                    imagem = imagem.convert('RGB')
+                temporario = destino + '.tmp'
+                imagem.save(temporario, formato, **opcoes)
+                os.replace(temporario, destino)  # nunca serve arquivo pela metade
+            geradas.append(largura)
+    return geradas
+
+
+def _variantes_prontas(futuro):
+    if futuro.exception() is not None:
+        logger.error('Falha ao gerar variantes de imagem', exc_info=futuro.exception())
+        return
+    import catalogo
+    catalogo.invalidar()
+
+
+def variantes(nome, diretorio=None):
+    """Larguras com as duas variantes já gravadas para a imagem `nome`."""
+    if not nome:
+        return ()
+    base = os.path.splitext(os.path.join(diretorio or pasta(), nome))[0]
+    return tuple(largura for largura in LARGURAS
+                 if all(os.path.exists(f'{base}-{largura}.{extensao}') for extensao, _, _ in FORMATOS))
+
+
+def urls(nome, larguras):
+    """src/srcset do cartão do produto; sem variantes, só o original."""
+    prefixo = '/static/' + current_app.config['UPLOAD_FOLDER'].split('static/', 1)[-1].strip('/') + '/'
+    if not larguras:
+        return {'src': prefixo + nome}
+    base = os.path.splitext(nome)[0]
+    padrao = max((l for l in larguras if l <= LARGURA_PADRAO), default=larguras[0])
+    return {
+        'src': f'{prefixo}{base}-{padrao}.jpg',
+        'srcset_webp': ', '.join(f'{prefixo}{base}-{l}.webp {l}w' for l in larguras),
+        'srcset_jpg': ', '.join(f'{prefixo}{base}-{l}.jpg {l}w' for l in larguras),
+    }
+
+
+def remover(nome, em_uso=False):
+    """Apaga o original e as variantes, a menos que outro produto use a mesma imagem."""
+    if not nome or em_uso:
+        return
+    diretorio = pasta()
+    base = os.path.splitext(os.path.basename(nome))[0]
+    for caminho in [os.path.join(diretorio, nome)] + glob.glob(os.path.join(diretorio, f'{glob.escape(base)}-*')):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def _cache_imutavel(response):
+    # Arquivos com hash no nome nunca mudam de conteúdo
+    if request.endpoint == 'static' and response.status_code == 200:
+        arquivo = (request.view_args or {}).get('filename', '')
+        pasta_uploads = current_app.config['UPLOAD_FOLDER'].split('static/', 1)[-1].strip('/') + '/'
+        if arquivo.startswith(pasta_uploads) and _NOME_HASH.match(arquivo[len(pasta_uploads):]):
+            response.cache_control.public = True
+            response.cache_control.max_age = 365 * 24 * 3600
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+    return response
+
+
+def init_app(app):
+    app.after_request(_cache_imutavel)
+    if importlib.util.find_spec('PIL') is None:
+        app.logger.info('Pillow não instalado: imagens de produto sem variantes redimensionadas')
@@ -0,0 +1,267 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from flask import before_render_template, current_app, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Instrumentação de cada requisição: tempo total, número de instruções SQL e
+# tempo no banco (eventos de cursor do SQLAlchemy, mais o tempo buscando as
+# linhas: o SQLite só calcula a maior parte do resultado no fetch), tempo de renderização dos
+# templates e tamanho da resposta. Os valores vão no cabeçalho Server-Timing
+# e em histogramas por endpoint, expostos em formato Prometheus em
+# /admin/metrics. O custo por requisição é um punhado de perf_counter() e uma
+# única seção crítica curta para atualizar os histogramas. Cada processo tem
+# seus próprios histogramas (com vários workers, raspe cada um). Lotes
+# gravados em segundo plano (gravador.py) têm histogramas próprios: o SQL
+# deles é do lote inteiro, não de uma requisição.
+
+PREFIXO = 'juniorsfood'
+
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_INSTRUCOES = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMAS = (
+    # nome, ajuda, limites, campo da medição
+    ('request_duration_seconds', 'Tempo total da requisição no Flask.', LIMITES_SEGUNDOS, 'duracao'),
+    ('request_db_seconds', 'Tempo acumulado executando SQL e lendo os resultados na requisição.', LIMITES_SEGUNDOS, 'tempo_db'),
+    ('request_sql_statements', 'Instruções SQL executadas na requisição.', LIMITES_INSTRUCOES, 'instrucoes'),
+    ('request_render_seconds', 'Tempo renderizando templates Jinja na requisição.', LIMITES_SEGUNDOS, 'tempo_render'),
+    ('response_size_bytes', 'Tamanho do corpo da resposta (antes de compressão).', LIMITES_BYTES, 'tamanho'),
+)
+
+LIMITES_ITENS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+HISTOGRAMAS_LOTE = (
+    ('batch_duration_seconds', 'Tempo gravando um lote, do primeiro INSERT ao commit.', LIMITES_SEGUNDOS, 'duracao'),
+    ('batch_items', 'Itens gravados por lote.', LIMITES_ITENS, 'itens'),
+    ('batch_sql_statements', 'Instruções SQL executadas por lote.', LIMITES_INSTRUCOES, 'instrucoes'),
+)
+
+
+class Histograma:
+    __slots__ = ('limites', 'contagens', 'soma')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # a última posição é o +Inf
+        self.soma = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ('+Inf',), self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f'{nome}_sum{{{rotulos}}} {self.soma}'
+        yield f'{nome}_count{{{rotulos}}} {acumulado}'
+
+
+class Medicao:
+    __slots__ = ('inicio', 'instrucoes', 'tempo_db', 'tempo_render', 'duracao', 'tamanho', '_renders')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.instrucoes = 0
+        self.tempo_db = 0.0
+        self.tempo_render = 0.0
+        self.duracao = 0.0
+        self.tamanho = 0
+        self._renders = []
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (métrica, endpoint ou gravador) -> Histograma
+        self._respostas = {}  # (endpoint, método, status) -> total
+
+    def _observar(self, definicoes, rotulo, valores):
+        for nome, _, limites, campo in definicoes:
+            valor = valores(campo)
+            if valor is None:
+                continue
+            chave = (nome, rotulo)
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma(limites)
+            histograma.observar(valor)
+
+    def registrar(self, endpoint, metodo, status, medicao):
+        with self._lock:
+            self._observar(HISTOGRAMAS, endpoint, lambda campo: getattr(medicao, campo))
+            chave = (endpoint, metodo, status)
+            self._respostas[chave] = self._respostas.get(chave, 0) + 1
+
+    def registrar_lote(self, gravador, itens, instrucoes, duracao):
+        valores = {'itens': itens, 'instrucoes': instrucoes, 'duracao': duracao}
+        with self._lock:
+            self._observar(HISTOGRAMAS_LOTE, gravador, valores.get)
+
+    def texto(self):
+        """Todas as séries no formato de exposição de texto do Prometheus."""
+        with self._lock:
+            histogramas = {chave: (h.limites, list(h.contagens), h.soma) for chave, h in self._histogramas.items()}
+            respostas = dict(self._respostas)
+
+        linhas = []
+        for definicoes, rotulo in ((HISTOGRAMAS, 'endpoint'), (HISTOGRAMAS_LOTE, 'gravador')):
+            for nome, ajuda, _, _ in definicoes:
+                completo = f'{PREFIXO}_{nome}'
+                linhas.append(f'# HELP {completo} {ajuda}')
+                linhas.append(f'# TYPE {completo} histogram')
+                for (metrica, valor), (limites, contagens, soma) in sorted(histogramas.items()):
+                    if metrica != nome:
+                        continue
+                    histograma = Histograma(limites)
+                    histograma.contagens, histograma.soma = contagens, soma
+                    linhas.extend(histograma.linhas(completo, f'{rotulo}="{valor}"'))
+
+        completo = f'{PREFIXO}_responses_total'
+        linhas.append(f'# HELP {completo} Respostas por endpoint, método e status.')
+        linhas.append(f'# TYPE {completo} counter')
+        for (endpoint, metodo, status), total in sorted(respostas.items()):
+            linhas.append(f'{completo}{{endpoint="{endpoint}",method="{metodo}",status="{status}"}} {total}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+
+_local = threading.local()
+
+
+def medicao_atual():
+    return getattr(_local, 'medicao', None)
+
+
+class _CursorMedido:
+    """Cursor DBAPI que soma na medição o tempo gasto buscando as linhas."""
+    __slots__ = ('_cursor', '_medicao')
+
+    def __init__(self, cursor, medicao):
+        self._cursor = cursor
+        self._medicao = medicao
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def _medir(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            self._medicao.tempo_db += time.perf_counter() - inicio
+
+    def fetchone(self):
+        return self._medir(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._medir(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._medir(self._cursor.fetchall)
+
+
+# SQL: início guardado na conexão, acumulado na medição da thread
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'medicao', None) is not None:
+        conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+
+def _fim_sql(conn):
+    medicao = getattr(_local, 'medicao', None)
+    inicios = conn.info.get('metricas_inicio')
+    if medicao is None or not inicios:
+        return None
+    medicao.tempo_db += time.perf_counter() - inicios.pop()
+    medicao.instrucoes += 1
+    return medicao
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    medicao = _fim_sql(conn)
+    # O resultado é montado sobre context.cursor logo depois deste evento
+    if medicao is not None and context is not None and context.cursor is cursor and cursor.description:
+        context.cursor = _CursorMedido(cursor, medicao)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _erro_sql(contexto):
+    # Instrução que falhou não chega ao after_cursor_execute
+    if contexto.connection is not None:
+        _fim_sql(contexto.connection)
+
+
+def _antes_render(sender, template, context, **extra):
+    medicao = medicao_atual()
+    if medicao is not None:
+        medicao._renders.append(time.perf_counter())
+
+
+def _depois_render(sender, template, context, **extra):
+    medicao = medicao_atual()
+    if medicao is not None and medicao._renders:
+        inicio = medicao._renders.pop()
+        # render_template dentro de outro render não conta duas vezes
+        if not medicao._renders:
+            medicao.tempo_render += time.perf_counter() - inicio
+
+
+def _iniciar():
+    _local.medicao = Medicao()
+
+
+def server_timing(medicao):
+    return (f'app;dur={medicao.duracao * 1000:.1f}, '
+            f'db;dur={medicao.tempo_db * 1000:.1f};desc="{medicao.instrucoes} SQL", '
+            f'tpl;dur={medicao.tempo_render * 1000:.1f}')
+
+
+def _finalizar(response):
+    medicao = medicao_atual()
+    if medicao is None:
+        return response
+    medicao.duracao = time.perf_counter() - medicao.inicio
+    # Respostas em streaming (SSE, exportações) não têm tamanho conhecido aqui;
+    # arquivos estáticos já trazem o Content-Length
+    if response.is_streamed or response.direct_passthrough:
+        medicao.tamanho = response.content_length
+    else:
+        medicao.tamanho = response.calculate_content_length()
+
+    if current_app.config.get('SERVER_TIMING', True):
+        response.headers['Server-Timing'] = server_timing(medicao)
+    registro.registrar(request.endpoint or 'sem_rota', request.method, response.status_code, medicao)
+    return response
+
+
+def _encerrar(exc):
+    _local.medicao = None
+
+
+def token_valido():
+    """Permite que o Prometheus raspe /admin/metrics com METRICAS_TOKEN no Authorization."""
+    token = current_app.config.get('METRICAS_TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def resposta():
+    return current_app.response_class(registro.texto(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_app(app):
+    app.before_request(_iniciar)
+    app.after_request(_finalizar)
+    app.teardown_request(_encerrar)
+    before_render_template.connect(_antes_render, app)
+    template_rendered.connect(_depois_render, app)
@@ -0,0 +1,78 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+
+import contadores
+import relatorios
+from models import db
+
+# Atualiza bancos já existentes (como instance/junior_food.db) para o schema
+# atual dos modelos sem apagar dados. Todos os passos são idempotentes: rodar
+# `flask migrar` de novo em um banco atualizado não faz nada.
+
+
+def _indices(conexao, tabela):
+    return {indice['name'] for indice in inspect(conexao).get_indexes(tabela)}
+
+
+def criar_indices_faltantes(conexao):
+    # create_all() só cria índices junto com tabelas novas; aqui entram os
+    # índices declarados depois que a tabela já existia
+    criados = []
+    for tabela in db.metadata.sorted_tables:
+        existentes = _indices(conexao, tabela.name)
+        faltantes = [indice for indice in tabela.indexes if indice.name not in existentes]
+        for indice in faltantes:
+            indice.create(conexao)
+        if faltantes:
+            # Índices com ddl_if de outro banco (ex.: COLLATE NOCASE) não são criados
+            existentes = _indices(conexao, tabela.name)
+            criados.extend(f'índice {indice.name}' for indice in faltantes if indice.name in existentes)
+    return criados
+
+
+# Índices substituídos por outros em models.py: tabela -> nomes
+INDICES_OBSOLETOS = {
+    'endereco': ('ix_endereco_bairro',),  # virou ix_endereco_bairro_nocase (LIKE sem caixa usa o índice)
+}
+
+
+def remover_indices_obsoletos(conexao):
+    removidos = []
+    for tabela, nomes in INDICES_OBSOLETOS.items():
+        existentes = _indices(conexao, tabela)
+        for nome in nomes:
+            if nome in existentes:
+                conexao.exec_driver_sql(f'DROP INDEX {nome}')
+                removidos.append(f'índice {nome} removido')
+    return removidos
+
+
+PASSOS = [
+    criar_indices_faltantes,
+    remover_indices_obsoletos,
+    contadores.popular_contadores,
+    relatorios.popular_relatorios,
+]
+
+
+def migrar():
+    """Aplica o schema atual ao banco configurado e retorna o que mudou."""
+    db.create_all()
+
+    alteracoes = []
+    with db.engine.begin() as conexao:
+        for passo in PASSOS:
+            alteracoes.extend(passo(conexao))
+
+    return alteracoes
+
+
+@click.command('migrar')
+@with_appcontext
+def migrar_command():
+    """Atualiza o schema do banco existente sem apagar dados."""
+    alteracoes = migrar()
+    for alteracao in alteracoes:
+        click.echo(f'- {alteracao}')
+    click.echo('Banco de dados atualizado.' if alteracoes else 'Banco de dados já está atualizado.')
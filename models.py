@@ -1,11 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+import senhas
 from datetime import datetime
 
 db = SQLAlchemy()
 
+
+def indice_sem_caixa(nome, coluna):
+    # Índice COLLATE NOCASE (só SQLite): é o que permite ao LIKE sem distinção
+    # de maiúsculas ('abc%') buscar pelo índice em vez de varrer a tabela
+    return db.Index(nome, db.text(f'{coluna} COLLATE NOCASE')).ddl_if(dialect='sqlite')
+
+
 class User(UserMixin, db.Model):
+    # Busca de clientes por começo do nome ou do email (filtro do admin)
+    __table_args__ = (
+        indice_sem_caixa('ix_user_username_nocase', 'username'),
+        indice_sem_caixa('ix_user_email_nocase', 'email'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -17,16 +30,23 @@ class User(UserMixin, db.Model):
     pedidos = db.relationship('Pedido', backref='cliente', lazy=True, cascade='all, delete-orphan')
     enderecos = db.relationship('Endereco', backref='usuario', lazy=True, cascade='all, delete-orphan')
     
+    # O hash roda no pool de processos de senhas.py; ambos podem levantar
+    # senhas.SenhasOcupadas quando o pool está saturado
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = senhas.gerar_hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return senhas.verificar(self.password_hash, password)
     
     def __repr__(self):
         return f'<User {self.username}>'
 
 class Endereco(db.Model):
+    __table_args__ = (
+        db.Index('ix_endereco_user_principal', 'user_id', 'principal'),
+        indice_sem_caixa('ix_endereco_bairro_nocase', 'bairro'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     cep = db.Column(db.String(10), nullable=False)
@@ -58,6 +78,10 @@ class Categoria(db.Model):
         return f'<Categoria {self.nome}>'
 
 class Produto(db.Model):
+    __table_args__ = (
+        db.Index('ix_produto_categoria_ativo', 'categoria_id', 'ativo'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
     descricao = db.Column(db.Text)
@@ -73,6 +97,19 @@ class Produto(db.Model):
         return f'<Produto {self.nome}>'
 
 class Pedido(db.Model):
+    # Índices alinhados com os filtros de app.py: paginação por (created_at, id),
+    # pedidos do cliente por data, contagens/listagens por status, filtro por
+    # endereço (bairro) e as facetas status x forma de pagamento do admin
+    # (cobertas pelo índice, com ou sem período)
+    __table_args__ = (
+        db.Index('ix_pedido_created_at_id', 'created_at', 'id'),
+        db.Index('ix_pedido_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_pedido_endereco_created_at', 'endereco_entrega_id', 'created_at'),
+        db.Index('ix_pedido_status_created_at', 'status', 'created_at'),
+        db.Index('ix_pedido_status_forma_created_at', 'status', 'forma_pagamento', 'created_at'),
+        db.Index('ix_pedido_created_at_status_forma', 'created_at', 'status', 'forma_pagamento'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     endereco_entrega_id = db.Column(db.Integer, db.ForeignKey('endereco.id'))  
@@ -89,14 +126,97 @@ class Pedido(db.Model):
     def __repr__(self):
         return f'<Pedido {self.id} - {self.status}>'
 
-class PedidoItem(db.Model):
+class PedidoStatusEvento(db.Model):
+    # Histórico de status do pedido, só de inserção (ver andamento.py): uma
+    # linha na criação (de=None) e uma a cada troca de status; some junto
+    # com o pedido
+    __table_args__ = (
+        db.Index('ix_pedido_status_evento_pedido_id', 'pedido_id', 'id'),
+        db.Index('ix_pedido_status_evento_criado_em', 'criado_em'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), nullable=False)
-    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
+    de = db.Column(db.String(20))
+    para = db.Column(db.String(20), nullable=False)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PedidoStatusEvento {self.pedido_id}: {self.de} -> {self.para}>'
+
+class PedidoItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), nullable=False, index=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False, index=True)
     quantidade = db.Column(db.Integer, nullable=False, default=1)
     observacao = db.Column(db.Text)
     preco_unitario = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<PedidoItem {self.id} - {self.quantidade}x {self.produto.nome}>'
\ No newline at end of file
+        return f'<PedidoItem {self.id} - {self.quantidade}x {self.produto.nome}>'
+
+class Contador(db.Model):
+    # Agregados mantidos incrementalmente (ver contadores.py): 'pedidos',
+    # 'pedidos:<status>' e 'usuarios'
+    chave = db.Column(db.String(40), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<Contador {self.chave}={self.valor}>'
+
+class VendaResumo(db.Model):
+    # Rollup de vendas por dia, hora, forma de pagamento e cancelamento, mantido
+    # incrementalmente por relatorios.py; os relatórios nunca somam Pedido
+    __tablename__ = 'venda_resumo'
+    
+    dia = db.Column(db.Date, primary_key=True)
+    hora = db.Column(db.Integer, primary_key=True)
+    forma_pagamento = db.Column(db.String(20), primary_key=True)
+    cancelado = db.Column(db.Boolean, primary_key=True)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<VendaResumo {self.dia} {self.hora}h {self.forma_pagamento}: {self.pedidos}>'
+
+class ProdutoVendaResumo(db.Model):
+    # Rollup de itens vendidos por dia e produto (relatorios.py); nome e
+    # categoria do produto entram só na leitura
+    __tablename__ = 'produto_venda_resumo'
+    
+    dia = db.Column(db.Date, primary_key=True)
+    produto_id = db.Column(db.Integer, primary_key=True)
+    cancelado = db.Column(db.Boolean, primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ProdutoVendaResumo {self.dia} {self.produto_id}: {self.quantidade}>'
+
+class Parametro(db.Model):
+    # Valores de configuração com que os dados derivados foram gerados (ex.:
+    # o fuso dos rollups de relatorios.py), para a migração saber quando refazê-los
+    chave = db.Column(db.String(40), primary_key=True)
+    valor = db.Column(db.String(200), nullable=False)
+    
+    def __repr__(self):
+        return f'<Parametro {self.chave}={self.valor}>'
+
+class CarrinhoItem(db.Model):
+    # Linhas do carrinho no servidor (backend "banco" de carrinhos.py); nome e
+    # preço não são guardados, vêm do catálogo na leitura
+    __tablename__ = 'carrinho_item'
+    __table_args__ = (
+        db.Index('ix_carrinho_item_user_id', 'user_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=1)
+    observacao = db.Column(db.Text, nullable=False, default='')
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<CarrinhoItem {self.user_id}: {self.quantidade}x {self.produto_id}>'
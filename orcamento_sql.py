@@ -0,0 +1,188 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+import click
+from flask import current_app, g, request, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+from models import db, User, Pedido, Produto, Categoria
+
+# Orçamento de consultas SQL por endpoint. Cada rota declara quantas
+# instruções pode executar com @limite_sql(n); `flask verificar-orcamentos`
+# percorre essas rotas com o banco atual e falha se alguma passar do limite,
+# para que problemas de N+1 não voltem sem ninguém perceber;
+# tests/test_orcamento_sql.py faz a mesma conferência na suíte de testes.
+
+_local = threading.local()
+
+
+class ContadorSQL:
+    def __init__(self):
+        self.instrucoes = []
+
+    @property
+    def total(self):
+        return len(self.instrucoes)
+
+
+def _pilha():
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+@contextmanager
+def contar_sql():
+    """Conta as instruções SQL executadas nesta thread dentro do bloco."""
+    pilha = _pilha()
+    contador = ContadorSQL()
+    pilha.append(contador)
+    try:
+        yield contador
+    finally:
+        pilha.remove(contador)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _registrar_instrucao(conn, cursor, statement, parameters, context, executemany):
+    for contador in getattr(_local, 'pilha', ()):
+        contador.instrucoes.append(statement)
+
+
+def limite_sql(limite):
+    def decorator(view):
+        view.limite_sql = limite
+        return view
+    return decorator
+
+
+def _iniciar_contagem():
+    # Em desenvolvimento, avisa no log quando uma rota estoura o orçamento
+    if not (current_app.debug or current_app.testing):
+        return
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'limite_sql', None) is None:
+        return
+    contador = ContadorSQL()
+    _pilha().append(contador)
+    g._contador_sql = contador
+
+
+def _conferir_contagem(exc):
+    contador = g.pop('_contador_sql', None)
+    if contador is None:
+        return
+    _pilha().remove(contador)
+
+    limite = current_app.view_functions[request.endpoint].limite_sql
+    if contador.total > limite:
+        current_app.logger.warning('Orçamento SQL excedido em %s: %d instruções (limite %d)',
+                                   request.endpoint, contador.total, limite)
+
+
+def _argumentos_de_exemplo():
+    pedido = Pedido.query.order_by(Pedido.id.desc()).first()
+    categoria = Categoria.query.filter_by(ativo=True).first()
+    produto = Produto.query.first()
+    return {
+        'pedido_id': pedido.id if pedido else None,
+        'categoria_id': categoria.id if categoria else None,
+        'produto_id': produto.id if produto else None,
+    }
+
+
+def cliente_com_mais_pedidos():
+    linha = (
+        db.session.query(Pedido.user_id)
+        .join(User, User.id == Pedido.user_id)
+        .filter(User.is_admin == False)
+        .group_by(Pedido.user_id)
+        .order_by(func.count(Pedido.id).desc())
+        .first()
+    )
+    return linha[0] if linha else None
+
+
+def _medir_rotas(app, admin_id, cliente_id, exemplos):
+    resultados = []
+    for regra in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        limite = getattr(app.view_functions[regra.endpoint], 'limite_sql', None)
+        if limite is None or 'GET' not in regra.methods:
+            continue
+
+        valores = {arg: exemplos.get(arg) for arg in regra.arguments}
+        if any(v is None for v in valores.values()):
+            resultados.append((regra.endpoint, None, None, limite, None))
+            continue
+
+        with app.test_request_context():
+            url = url_for(regra.endpoint, **valores)
+
+        cliente = app.test_client()
+        usuario_id = admin_id if regra.endpoint.rsplit('.', 1)[-1].startswith('admin_') else cliente_id
+        with cliente.session_transaction() as sessao:
+            sessao['_user_id'] = str(usuario_id)
+            sessao['_fresh'] = True
+
+        with contar_sql() as contador:
+            resposta = cliente.get(url)
+        resultados.append((regra.endpoint, url, contador.total, limite, resposta.status_code))
+    return resultados
+
+
+class SemDadosDeExemplo(Exception):
+    pass
+
+
+def medir_orcamentos(app):
+    """Mede cada rota GET com @limite_sql: [(endpoint, url, total, limite, status)]."""
+    with app.app_context():
+        admin_id = db.session.query(User.id).filter_by(is_admin=True).order_by(User.id).limit(1).scalar()
+        cliente_id = cliente_com_mais_pedidos()
+        exemplos = _argumentos_de_exemplo()
+        db.session.remove()
+
+    if admin_id is None or cliente_id is None:
+        raise SemDadosDeExemplo('O banco precisa de um admin e de um cliente com pedidos '
+                                '(use a tela "Criar Pedidos Teste" ou "flask seed").')
+
+    # Roda fora de qualquer app context, para que cada requisição tenha
+    # seu próprio contexto (g, usuário logado e sessão do banco)
+    return contextvars.Context().run(_medir_rotas, app, admin_id, cliente_id, exemplos)
+
+
+def dentro_do_orcamento(total, limite, status):
+    return status < 400 and total <= limite
+
+
+@click.command('verificar-orcamentos')
+@with_appcontext
+def verificar_orcamentos_command():
+    """Confere o número de consultas SQL de cada rota com orçamento declarado."""
+    try:
+        resultados = medir_orcamentos(current_app._get_current_object())
+    except SemDadosDeExemplo as e:
+        raise click.ClickException(str(e))
+
+    falhas = 0
+    for endpoint, url, total, limite, status in resultados:
+        if url is None:
+            click.echo(f'{endpoint:<28} sem dados de exemplo, ignorado')
+            continue
+        ok = dentro_do_orcamento(total, limite, status)
+        if not ok:
+            falhas += 1
+        click.echo(f'{endpoint:<28} {url:<32} {total:>3}/{limite:<3} HTTP {status} {"OK" if ok else "FALHOU"}')
+
+    if falhas:
+        raise click.ClickException(f'{falhas} rota(s) acima do orçamento de consultas')
+
+
+def init_app(app):
+    app.cli.add_command(verificar_orcamentos_command)
+    app.before_request(_iniciar_contagem)
+    app.teardown_request(_conferir_contagem)
@@ -0,0 +1,179 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from sqlalchemy import insert, select
+
+import relatorios
+from gravador import FilaCheia, GravacaoPendente, GravadorEmGrupo
+from models import db, Categoria, Endereco, Pedido, PedidoItem, Produto
+
+# Montagem do pedido a partir das linhas do carrinho. O número de instruções
+# SQL não depende do tamanho do carrinho: um SELECT ... IN resolve todos os
+# produtos, os preços vêm do banco (nunca do carrinho) e os itens entram com
+# um único INSERT em lote, tudo na mesma transação do pedido. A validação
+# roda na requisição; a gravação vai para o gravador em grupo (gravador.py),
+# que junta os pedidos de várias requisições em um commit só.
+
+FORMAS_PAGAMENTO = ('cartao', 'dinheiro', 'pix')
+
+# Pedido já validado e precificado; itens = ((produto_id, observacao, quantidade, preco_unitario), ...)
+NovoPedido = namedtuple('NovoPedido', 'user_id forma_pagamento troco_para observacao total endereco_entrega_id itens')
+
+
+class PedidoInvalido(Exception):
+    pass
+
+
+def agrupar_linhas(linhas):
+    """Soma as quantidades de linhas com o mesmo produto e a mesma observação."""
+    agrupadas = OrderedDict()
+    for linha in linhas:
+        chave = (int(linha['produto_id']), (linha.get('observacao') or '').strip())
+        agrupadas[chave] = agrupadas.get(chave, 0) + max(1, int(linha.get('quantidade', 1)))
+    return [(produto_id, observacao, quantidade) for (produto_id, observacao), quantidade in agrupadas.items()]
+
+
+def precos_atuais(produto_ids):
+    """Preço de cada produto disponível (produto e categoria ativos), em uma consulta."""
+    linhas = db.session.execute(
+        select(Produto.id, Produto.preco)
+        .join(Categoria, Produto.categoria_id == Categoria.id)
+        .where(Produto.id.in_(produto_ids), Produto.ativo == True, Categoria.ativo == True)
+    ).all()
+    return dict(linhas)
+
+
+def _troco(forma_pagamento, troco_para, total):
+    if forma_pagamento != 'dinheiro' or not troco_para:
+        return 0
+    try:
+        troco_para = float(troco_para)
+    except (TypeError, ValueError):
+        raise PedidoInvalido('Valor para troco inválido')
+    if troco_para < total:
+        raise PedidoInvalido('Valor para troco deve ser maior ou igual ao total')
+    return troco_para
+
+
+def preparar_pedido(user_id, linhas, forma_pagamento, endereco_entrega_id, troco_para=0, observacao=''):
+    """Valida e reprecifica o pedido, sem gravar nada.
+
+    Levanta PedidoInvalido com uma mensagem para o cliente se algo impedir o
+    pedido (carrinho vazio, endereço de outro usuário, produto indisponível...).
+    """
+    itens = agrupar_linhas(linhas)
+    if not itens:
+        raise PedidoInvalido('Carrinho vazio')
+    if forma_pagamento not in FORMAS_PAGAMENTO:
+        raise PedidoInvalido('Selecione uma forma de pagamento')
+    if not endereco_entrega_id:
+        raise PedidoInvalido('Selecione um endereço para entrega')
+
+    try:
+        endereco_entrega_id = int(endereco_entrega_id)
+    except (TypeError, ValueError):
+        raise PedidoInvalido('Endereço inválido')
+    endereco = db.session.execute(
+        select(Endereco.id).where(Endereco.id == endereco_entrega_id, Endereco.user_id == user_id)
+    ).scalar()
+    if endereco is None:
+        raise PedidoInvalido('Endereço inválido')
+
+    precos = precos_atuais({produto_id for produto_id, _, _ in itens})
+    if len(precos) < len({produto_id for produto_id, _, _ in itens}):
+        raise PedidoInvalido('Algum produto do carrinho não está mais disponível; revise o carrinho')
+
+    total = round(sum(precos[produto_id] * quantidade for produto_id, _, quantidade in itens), 2)
+    troco = _troco(forma_pagamento, troco_para, total)
+
+    return NovoPedido(
+        user_id=user_id,
+        forma_pagamento=forma_pagamento,
+        troco_para=troco,
+        observacao=observacao,
+        total=total,
+        endereco_entrega_id=endereco_entrega_id,
+        itens=tuple((produto_id, observacao_item, quantidade, precos[produto_id])
+                    for produto_id, observacao_item, quantidade in itens),
+    )
+
+
+def gravar_pedidos(novos):
+    """Insere os pedidos na sessão atual, sem commit, e retorna os ids na mesma ordem."""
+    # Os pedidos passam pelo ORM (contadores e eventos dependem do flush);
+    # os itens de todos eles vão em um único INSERT executemany
+    pedidos = [
+        Pedido(
+            user_id=novo.user_id,
+            forma_pagamento=novo.forma_pagamento,
+            troco_para=novo.troco_para,
+            observacao=novo.observacao,
+            total=novo.total,
+            endereco_entrega_id=novo.endereco_entrega_id
+        )
+        for novo in novos
+    ]
+    db.session.add_all(pedidos)
+    db.session.flush()
+    itens_por_pedido = [
+        [
+            {
+                'pedido_id': pedido.id,
+                'produto_id': produto_id,
+                'quantidade': quantidade,
+                'observacao': observacao_item,
+                'preco_unitario': preco_unitario,
+            }
+            for produto_id, observacao_item, quantidade, preco_unitario in novo.itens
+        ]
+        for pedido, novo in zip(pedidos, novos)
+    ]
+    db.session.execute(insert(PedidoItem), [item for itens in itens_por_pedido for item in itens])
+    conexao = db.session.connection()
+    for pedido, itens in zip(pedidos, itens_por_pedido):
+        relatorios.itens_inseridos(conexao, pedido, itens)
+    return [pedido.id for pedido in pedidos]
+
+
+_gravador_lock = threading.Lock()
+
+
+def gravador():
+    # Um gravador por app: a thread grava no banco da app que a criou
+    app = current_app._get_current_object()
+    atual = app.extensions.get('gravador_pedidos')
+    if atual is None:
+        with _gravador_lock:
+            atual = app.extensions.get('gravador_pedidos')
+            if atual is None:
+                config = app.config
+                atual = app.extensions['gravador_pedidos'] = GravadorEmGrupo(
+                    app, gravar_pedidos,
+                    lote_maximo=config.get('PEDIDOS_LOTE_MAXIMO', 32),
+                    espera_ms=config.get('PEDIDOS_ESPERA_MS', 5),
+                    fila_maxima=config.get('PEDIDOS_FILA_MAXIMA', 256),
+                    timeout=config.get('PEDIDOS_TIMEOUT', 10))
+    return atual
+
+
+def criar_pedido(user_id, linhas, forma_pagamento, endereco_entrega_id, troco_para=0, observacao=''):
+    """Valida, reprecifica e grava o pedido com seus itens; retorna o id depois do commit.
+
+    Levanta PedidoInvalido se o pedido não puder ser feito, FilaCheia se o
+    gravador estiver sobrecarregado e GravacaoPendente se o commit não
+    terminar a tempo (o pedido pode ter sido salvo).
+    """
+    novo = preparar_pedido(user_id, linhas, forma_pagamento, endereco_entrega_id, troco_para, observacao)
+    # A transação de leitura da requisição não pode segurar o banco enquanto o gravador escreve
+    db.session.rollback()
+    if current_app.config.get('PEDIDOS_GRUPO', True):
+        return gravador().enviar(novo)
+
+    try:
+        pedido_id, = gravar_pedidos([novo])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return pedido_id
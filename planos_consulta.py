@@ -0,0 +1,171 @@
+import re
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, func, select
+
+import consultas
+import contadores
+from models import db, User, Endereco, Produto, Pedido, PedidoItem, PedidoStatusEvento, CarrinhoItem
+
+# Regressão de planos de consulta: roda EXPLAIN QUERY PLAN nas consultas
+# críticas de app.py e falha se alguma percorrer uma tabela inteira (direto
+# ou por um índice, sem busca por chave) ou ordenar o resultado em uma B-tree
+# temporária. Por padrão usa um banco em memória com o schema dos modelos;
+# --banco-atual confere o banco configurado (útil para saber se `flask
+# migrar` já foi aplicado). tests/test_planos_consulta.py roda a mesma
+# verificação na suíte de testes.
+
+# "SCAN t", "SCAN t USING INDEX i" e "SCAN t USING COVERING INDEX i" leem a
+# tabela ou o índice inteiro; só SEARCH usa uma chave
+_VARREDURA_COMPLETA = re.compile(r'^SCAN (\w+)\b(?! USING (?:INTEGER )?PRIMARY KEY)')
+_ORDENACAO_TEMPORARIA = 'USE TEMP B-TREE FOR ORDER BY'
+
+VARREDURA = 'varredura completa'
+ORDENACAO = 'ordenação em B-tree temporária'
+
+# Exceções aceitas em consultas específicas (terceiro item da lista):
+# - percorrer o índice na ordem do ORDER BY com LIMIT lê só as primeiras linhas;
+# - com vários clientes/endereços encontrados, a página ordena em memória só
+#   os pedidos deles (cada conjunto já veio de uma busca no índice).
+LIMITADA = {VARREDURA}
+ORDENA_ENCONTRADOS = {ORDENACAO}
+
+_FILTROS_EXEMPLO = consultas.SEM_FILTROS._replace(status=('pendente',), formas_pagamento=('pix',), bairro='Cent')
+
+
+def _pagina(filtros):
+    return consultas.consulta_pagina_pedidos(consultas.filtrar_pedidos(Pedido.query, filtros), 'mais_novos').statement
+
+
+def _consultas_criticas():
+    agora = datetime.utcnow()
+    _periodo = consultas.SEM_FILTROS._replace(inicio=agora - timedelta(days=30), fim=agora)
+    _cliente_id = consultas.SEM_FILTROS._replace(cliente='42')
+    _cliente_nome = consultas.SEM_FILTROS._replace(cliente='maria')
+    _bairro = consultas.SEM_FILTROS._replace(bairro='jardim')
+    return [
+        ('login por email',
+         select(User).where(User.email == 'cliente@exemplo.com')),
+        ('cardápio: produtos ativos da categoria',
+         select(Produto).where(Produto.categoria_id == 1, Produto.ativo == True)),
+        ('admin_pedidos: primeira página',
+         consultas.consulta_pagina_pedidos(Pedido.query, 'mais_novos').statement, LIMITADA),
+        ('admin_pedidos: página seguinte (mais novos)',
+         consultas.consulta_pagina_pedidos(Pedido.query, 'mais_novos', (agora, 100, 'proxima')).statement),
+        ('admin_pedidos: página seguinte (mais antigos)',
+         consultas.consulta_pagina_pedidos(Pedido.query, 'mais_antigos', (agora, 100, 'proxima')).statement),
+        ('admin_pedidos: página anterior',
+         consultas.consulta_pagina_pedidos(Pedido.query, 'mais_novos', (agora, 100, 'anterior')).statement),
+        ('admin_pedidos: filtros status + pagamento + bairro',
+         _pagina(_FILTROS_EXEMPLO)),
+        ('admin_pedidos: filtro por período',
+         _pagina(_periodo)),
+        ('admin_pedidos: filtro por id do cliente',
+         _pagina(_cliente_id)),
+        ('admin_pedidos: filtro por nome do cliente',
+         _pagina(_cliente_nome), ORDENA_ENCONTRADOS),
+        ('admin_pedidos: filtro por bairro',
+         _pagina(_bairro), ORDENA_ENCONTRADOS),
+        ('admin_pedidos: facetas sem filtros (contadores)',
+         contadores.consulta_facetas()),
+        ('admin_pedidos: facetas do período',
+         consultas.consulta_facetas(_periodo)),
+        ('admin_pedidos: facetas por cliente',
+         consultas.consulta_facetas(_cliente_nome)),
+        ('admin_pedidos: facetas por bairro',
+         consultas.consulta_facetas(_bairro)),
+        ('andamento: eventos de status da janela',
+         select(PedidoStatusEvento).where(PedidoStatusEvento.criado_em >= agora - timedelta(hours=24))
+         .order_by(PedidoStatusEvento.criado_em, PedidoStatusEvento.id)),
+        ('andamento: eventos novos',
+         select(PedidoStatusEvento).where(PedidoStatusEvento.id > 100).order_by(PedidoStatusEvento.id)),
+        ('dashboard: contagem por status',
+         select(func.count()).select_from(Pedido).where(Pedido.status == 'pendente')),
+        ('dashboard: pedidos recentes',
+         select(Pedido).order_by(Pedido.created_at.desc()).limit(5), LIMITADA),
+        ('perfil: pedidos do cliente',
+         select(Pedido).where(Pedido.user_id == 1).order_by(Pedido.created_at.desc()).limit(10)),
+        ('itens dos pedidos da página',
+         select(PedidoItem).where(PedidoItem.pedido_id.in_([1, 2, 3]))),
+        ('itens que usam um produto',
+         select(PedidoItem).where(PedidoItem.produto_id == 1)),
+        ('carrinho do cliente',
+         select(CarrinhoItem).where(CarrinhoItem.user_id == 1, CarrinhoItem.atualizado_em >= agora)
+         .order_by(CarrinhoItem.id)),
+        ('endereços do cliente',
+         select(Endereco).where(Endereco.user_id == 1).order_by(Endereco.principal.desc())),
+    ]
+
+
+def _parametro(valor):
+    return valor.isoformat(' ') if isinstance(valor, datetime) else valor
+
+
+def explicar(conexao, statement):
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN da instrução."""
+    compilado = statement.compile(conexao, compile_kwargs={'render_postcompile': True})
+    parametros = compilado.construct_params()
+    posicionais = tuple(_parametro(parametros[nome]) for nome in (compilado.positiontup or ()))
+    linhas = conexao.exec_driver_sql('EXPLAIN QUERY PLAN ' + compilado.string, posicionais).fetchall()
+    return [linha[-1] for linha in linhas]
+
+
+def problemas_do_plano(detalhes, tabelas, aceitos=()):
+    problemas = []
+    for detalhe in detalhes:
+        varredura = _VARREDURA_COMPLETA.match(detalhe)
+        if varredura and varredura.group(1) in tabelas and VARREDURA not in aceitos:
+            problemas.append(f'{VARREDURA} de {varredura.group(1)}')
+        if detalhe.startswith(_ORDENACAO_TEMPORARIA) and ORDENACAO not in aceitos:
+            problemas.append(ORDENACAO)
+    return problemas
+
+
+def analisar(conexao):
+    """(nome, detalhes do plano, problemas) de cada consulta crítica."""
+    tabelas = set(db.metadata.tables)
+    resultado = []
+    for nome, statement, *aceitos in _consultas_criticas():
+        detalhes = explicar(conexao, statement)
+        resultado.append((nome, detalhes, problemas_do_plano(detalhes, tabelas, *aceitos)))
+    return resultado
+
+
+def _verificar(conexao):
+    falhas = 0
+    for nome, detalhes, problemas in analisar(conexao):
+        click.echo(f'{"FALHOU" if problemas else "OK":<7} {nome}')
+        for detalhe in detalhes:
+            click.echo(f'        {detalhe}')
+        if problemas:
+            falhas += 1
+            click.echo(f'        -> {", ".join(problemas)}')
+
+    return falhas
+
+
+@click.command('verificar-planos')
+@click.option('--banco-atual', is_flag=True,
+              help='Analisa o banco configurado em vez de um schema limpo criado a partir dos modelos.')
+@with_appcontext
+def verificar_planos_command(banco_atual):
+    """Falha se alguma consulta crítica não usar índice (SQLite)."""
+    if banco_atual:
+        conexao = db.session.connection()
+        if conexao.dialect.name != 'sqlite':
+            raise click.ClickException('A verificação de planos só está disponível para SQLite.')
+        falhas = _verificar(conexao)
+    else:
+        # Schema dos modelos em memória, sem estatísticas de dados: o resultado
+        # não depende de quantas linhas o banco local tem
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        with engine.connect() as conexao:
+            falhas = _verificar(conexao)
+        engine.dispose()
+
+    if falhas:
+        dica = 'rode "flask migrar"' if banco_atual else 'revise os índices em models.py'
+        raise click.ClickException(f'{falhas} consulta(s) sem índice adequado; {dica}')
@@ -0,0 +1,351 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, event, extract, func, inspect, select
+
+from banco import somar
+from models import db, Categoria, Parametro, Pedido, PedidoItem, Produto, ProdutoVendaResumo, VendaResumo
+
+# Relatórios de vendas a partir de rollups diários. Cada pedido soma uma linha
+# em venda_resumo (dia, hora, forma de pagamento, cancelado) e seus itens em
+# produto_venda_resumo (dia, produto, cancelado), na mesma transação do flush,
+# como os contadores do dashboard. Cancelar ou "descancelar" um pedido move os
+# valores entre as linhas cancelado/não cancelado. A leitura de um período
+# percorre só as linhas do rollup daqueles dias, então o custo não cresce com
+# o histórico. INSERTs em lote (flask seed) não passam pelos eventos: quem os
+# faz chama recalcular(), que também é o backfill de `flask recalcular-relatorios`.
+#
+# Dia e hora dos rollups são os do fuso da loja (LOJA_FUSO), não os de UTC em
+# que created_at é gravado: um pedido das 22h em São Paulo é do mesmo dia que
+# o do almoço. O fuso usado fica na tabela parametro, e `flask migrar` refaz
+# os rollups quando ele muda.
+
+DIAS_PADRAO = 30
+DIAS_MAXIMO = 366
+PRODUTOS_NO_RANKING = 20
+PARAMETRO_FUSO = 'relatorios_fuso'
+MINUTOS_GRUPO = 15  # todo fuso real tem deslocamento múltiplo de 15 minutos
+
+_vendas = VendaResumo.__table__
+_produtos = ProdutoVendaResumo.__table__
+
+
+class PeriodoInvalido(ValueError):
+    pass
+
+
+def fuso():
+    return ZoneInfo(current_app.config['LOJA_FUSO'])
+
+
+def _local(momento):
+    """datetime UTC sem tzinfo (como created_at) -> horário da loja, sem tzinfo."""
+    return momento.replace(tzinfo=timezone.utc).astimezone(fuso()).replace(tzinfo=None)
+
+
+def _utc(dia):
+    """Meia-noite do dia no fuso da loja, em UTC sem tzinfo."""
+    return datetime.combine(dia, time(), fuso()).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _somar_pedido(conexao, created_at, forma_pagamento, status, pedidos, receita):
+    local = _local(created_at)
+    somar(conexao, _vendas, [{
+        'dia': local.date(),
+        'hora': local.hour,
+        'forma_pagamento': forma_pagamento,
+        'cancelado': status == 'cancelado',
+        'pedidos': pedidos,
+        'receita': receita,
+    }], ('dia', 'hora', 'forma_pagamento', 'cancelado'), ('pedidos', 'receita'))
+
+
+def _somar_itens(conexao, created_at, status, itens, sinal):
+    """`itens`: (produto_id, quantidade, receita); linhas do mesmo produto são agrupadas."""
+    por_produto = defaultdict(lambda: [0, 0.0])
+    for produto_id, quantidade, receita in itens:
+        por_produto[produto_id][0] += quantidade
+        por_produto[produto_id][1] += receita
+    dia = _local(created_at).date()
+    somar(conexao, _produtos, [{
+        'dia': dia,
+        'produto_id': produto_id,
+        'cancelado': status == 'cancelado',
+        'quantidade': sinal * quantidade,
+        'receita': sinal * receita,
+    } for produto_id, (quantidade, receita) in sorted(por_produto.items())],
+        ('dia', 'produto_id', 'cancelado'), ('quantidade', 'receita'))
+
+
+@event.listens_for(Pedido, 'after_insert')
+def _pedido_inserido(mapper, conexao, pedido):
+    _somar_pedido(conexao, pedido.created_at, pedido.forma_pagamento, pedido.status or 'pendente', 1, pedido.total)
+
+
+@event.listens_for(Pedido, 'after_delete')
+def _pedido_excluido(mapper, conexao, pedido):
+    _somar_pedido(conexao, pedido.created_at, pedido.forma_pagamento, pedido.status or 'pendente', -1, -pedido.total)
+
+
+@event.listens_for(Pedido, 'after_update')
+def _pedido_atualizado(mapper, conexao, pedido):
+    historico = inspect(pedido).attrs.status.history
+    if not historico.has_changes() or not historico.deleted:
+        return
+    anterior, novo = historico.deleted[0], pedido.status
+    if (anterior == 'cancelado') == (novo == 'cancelado'):
+        return
+    _somar_pedido(conexao, pedido.created_at, pedido.forma_pagamento, anterior, -1, -pedido.total)
+    _somar_pedido(conexao, pedido.created_at, pedido.forma_pagamento, novo, 1, pedido.total)
+    itens = conexao.execute(
+        select(PedidoItem.produto_id, PedidoItem.quantidade, PedidoItem.quantidade * PedidoItem.preco_unitario)
+        .where(PedidoItem.pedido_id == pedido.id)
+    ).all()
+    _somar_itens(conexao, pedido.created_at, anterior, itens, -1)
+    _somar_itens(conexao, pedido.created_at, novo, itens, 1)
+
+
+def _item_alterado(sinal):
+    def ouvinte(mapper, conexao, item):
+        pedido = conexao.execute(
+            select(Pedido.created_at, Pedido.status).where(Pedido.id == item.pedido_id)
+        ).first()
+        if pedido is not None:
+            _somar_itens(conexao, pedido.created_at, pedido.status,
+                         [(item.produto_id, item.quantidade, item.quantidade * item.preco_unitario)], sinal)
+    return ouvinte
+
+
+event.listen(PedidoItem, 'after_insert', _item_alterado(1))
+event.listen(PedidoItem, 'after_delete', _item_alterado(-1))
+
+
+def itens_inseridos(conexao, pedido, itens):
+    """Para itens gravados com INSERT em lote (dicts de PedidoItem), que não disparam eventos."""
+    _somar_itens(conexao, pedido.created_at, pedido.status or 'pendente',
+                 [(item['produto_id'], item['quantidade'], item['quantidade'] * item['preco_unitario'])
+                  for item in itens], 1)
+
+
+# Backfill
+def _grupo_utc(coluna):
+    # (dia, hora, quarto de hora) em UTC: o banco agrupa sem saber do fuso e
+    # cada grupo cai inteiro em um dia e uma hora locais
+    return (func.date(coluna), extract('hour', coluna), extract('minute', coluna) // MINUTOS_GRUPO)
+
+
+def _dia_hora_local(dia, hora, quarto):
+    inicio = datetime.combine(date.fromisoformat(str(dia)), time(int(hora), int(quarto) * MINUTOS_GRUPO))
+    local = _local(inicio)
+    return local.date(), local.hour
+
+
+def recalcular(conexao, desde=None, ate=None):
+    """Refaz o rollup dos dias [desde, ate] (todos, se omitidos) a partir dos pedidos."""
+    filtros_pedido, filtros_rollup = [], {_vendas: [], _produtos: []}
+    if desde is not None:
+        filtros_pedido.append(Pedido.created_at >= _utc(desde))
+        for tabela in filtros_rollup:
+            filtros_rollup[tabela].append(tabela.c.dia >= desde)
+    if ate is not None:
+        filtros_pedido.append(Pedido.created_at < _utc(ate + timedelta(days=1)))
+        for tabela in filtros_rollup:
+            filtros_rollup[tabela].append(tabela.c.dia <= ate)
+
+    for tabela, filtros in filtros_rollup.items():
+        conexao.execute(tabela.delete().where(*filtros))
+
+    grupo = _grupo_utc(Pedido.created_at)
+    cancelado = case((Pedido.status == 'cancelado', True), else_=False)
+
+    vendas = defaultdict(lambda: [0, 0.0])
+    for dia, hora, quarto, forma, cancelado_, pedidos, receita in conexao.execute(
+        select(*grupo, Pedido.forma_pagamento, cancelado, func.count(), func.sum(Pedido.total))
+        .where(*filtros_pedido)
+        .group_by(*grupo, Pedido.forma_pagamento, cancelado)
+    ):
+        linha = vendas[(*_dia_hora_local(dia, hora, quarto), forma, bool(cancelado_))]
+        linha[0] += pedidos
+        linha[1] += receita
+    if vendas:
+        conexao.execute(_vendas.insert(), [
+            {'dia': dia, 'hora': hora, 'forma_pagamento': forma, 'cancelado': cancelado_,
+             'pedidos': pedidos, 'receita': receita}
+            for (dia, hora, forma, cancelado_), (pedidos, receita) in vendas.items()])
+
+    produtos = defaultdict(lambda: [0, 0.0])
+    for dia, hora, quarto, produto_id, cancelado_, quantidade, receita in conexao.execute(
+        select(*grupo, PedidoItem.produto_id, cancelado, func.sum(PedidoItem.quantidade),
+               func.sum(PedidoItem.quantidade * PedidoItem.preco_unitario))
+        .join(Pedido, PedidoItem.pedido_id == Pedido.id)
+        .where(*filtros_pedido)
+        .group_by(*grupo, PedidoItem.produto_id, cancelado)
+    ):
+        linha = produtos[(_dia_hora_local(dia, hora, quarto)[0], produto_id, bool(cancelado_))]
+        linha[0] += quantidade
+        linha[1] += receita
+    if produtos:
+        conexao.execute(_produtos.insert(), [
+            {'dia': dia, 'produto_id': produto_id, 'cancelado': cancelado_,
+             'quantidade': quantidade, 'receita': receita}
+            for (dia, produto_id, cancelado_), (quantidade, receita) in produtos.items()])
+
+
+def limites_pedidos():
+    """Datas do primeiro e do último pedido, ou (None, None) sem pedidos."""
+    primeiro, ultimo = db.session.execute(select(func.min(Pedido.created_at), func.max(Pedido.created_at))).one()
+    if primeiro is None:
+        return None, None
+    return _local(primeiro).date(), _local(ultimo).date()
+
+
+def popular_relatorios(conexao):
+    # Passo de migração: bancos com pedidos anteriores aos rollups ou com
+    # rollups de outro fuso (os de antes do LOJA_FUSO estão em UTC)
+    nome_fuso = current_app.config['LOJA_FUSO']
+    parametro = Parametro.__table__
+    gravado = conexao.execute(select(parametro.c.valor).where(parametro.c.chave == PARAMETRO_FUSO)).scalar()
+    if gravado != nome_fuso:
+        conexao.execute(parametro.delete().where(parametro.c.chave == PARAMETRO_FUSO))
+        conexao.execute(parametro.insert().values(chave=PARAMETRO_FUSO, valor=nome_fuso))
+
+    existentes = conexao.execute(select(func.count()).select_from(_vendas)).scalar()
+    if existentes and gravado == nome_fuso:
+        return []
+    if not conexao.execute(select(Pedido.id).limit(1)).first():
+        return []
+    recalcular(conexao)
+    return [f'rollups de relatórios refeitos no fuso {nome_fuso}' if existentes else 'rollups de relatórios']
+
+
+# Leitura
+def _data(valor, nome):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise PeriodoInvalido(f'{nome} deve estar no formato AAAA-MM-DD')
+
+
+def periodo(args, hoje=None):
+    """(desde, ate) da query string; padrão: os últimos DIAS_PADRAO dias."""
+    ate = _data(args['ate'], 'ate') if args.get('ate') else (hoje or datetime.now(fuso()).date())
+    desde = _data(args['desde'], 'desde') if args.get('desde') else ate - timedelta(days=DIAS_PADRAO - 1)
+    if desde > ate:
+        raise PeriodoInvalido('desde deve ser anterior a ate')
+    if (ate - desde).days + 1 > DIAS_MAXIMO:
+        raise PeriodoInvalido(f'O período pode ter no máximo {DIAS_MAXIMO} dias')
+    return desde, ate
+
+
+def _media(receita, pedidos):
+    return round(receita / pedidos, 2) if pedidos else 0.0
+
+
+def resumo(desde, ate, limite_produtos=PRODUTOS_NO_RANKING):
+    """Receita e volume do período por dia, hora, forma de pagamento, produto e categoria."""
+    linhas = db.session.execute(
+        select(_vendas.c.dia, _vendas.c.hora, _vendas.c.forma_pagamento, _vendas.c.cancelado,
+               _vendas.c.pedidos, _vendas.c.receita)
+        .where(_vendas.c.dia >= desde, _vendas.c.dia <= ate)
+    ).all()
+    produtos = db.session.execute(
+        select(_produtos.c.produto_id, Produto.nome, Categoria.nome,
+               func.sum(_produtos.c.quantidade), func.sum(_produtos.c.receita))
+        .outerjoin(Produto, Produto.id == _produtos.c.produto_id)
+        .outerjoin(Categoria, Categoria.id == Produto.categoria_id)
+        .where(_produtos.c.dia >= desde, _produtos.c.dia <= ate, _produtos.c.cancelado == False)
+        .group_by(_produtos.c.produto_id, Produto.nome, Categoria.nome)
+    ).all()
+
+    dias = {desde + timedelta(days=n): {'pedidos': 0, 'receita': 0.0, 'cancelados': 0}
+            for n in range((ate - desde).days + 1)}
+    horas = {hora: {'pedidos': 0, 'receita': 0.0} for hora in range(24)}
+    formas = defaultdict(lambda: {'pedidos': 0, 'receita': 0.0})
+    pedidos = cancelados = 0
+    receita = 0.0
+    for linha in linhas:
+        if linha.cancelado:
+            dias[linha.dia]['cancelados'] += linha.pedidos
+            cancelados += linha.pedidos
+            continue
+        for grupo in (dias[linha.dia], horas[linha.hora], formas[linha.forma_pagamento]):
+            grupo['pedidos'] += linha.pedidos
+            grupo['receita'] += linha.receita
+        pedidos += linha.pedidos
+        receita += linha.receita
+
+    categorias = defaultdict(lambda: {'quantidade': 0, 'receita': 0.0})
+    ranking = []
+    for produto_id, nome, categoria, quantidade, receita_produto in produtos:
+        if not quantidade:
+            continue
+        categoria = categoria or 'Sem categoria'
+        categorias[categoria]['quantidade'] += quantidade
+        categorias[categoria]['receita'] += receita_produto
+        ranking.append({'produto_id': produto_id, 'produto': nome or f'Produto #{produto_id}',
+                        'categoria': categoria, 'quantidade': quantidade, 'receita': round(receita_produto, 2)})
+    ranking.sort(key=lambda produto: (-produto['receita'], produto['produto_id']))
+
+    return {
+        'periodo': {'desde': desde.isoformat(), 'ate': ate.isoformat()},
+        'totais': {
+            'pedidos': pedidos,
+            'receita': round(receita, 2),
+            'ticket_medio': _media(receita, pedidos),
+            'cancelados': cancelados,
+            'taxa_cancelamento': round(cancelados / (pedidos + cancelados), 4) if pedidos + cancelados else 0.0,
+        },
+        'por_dia': [{'dia': dia.isoformat(), 'pedidos': valores['pedidos'], 'receita': round(valores['receita'], 2),
+                     'ticket_medio': _media(valores['receita'], valores['pedidos']),
+                     'cancelados': valores['cancelados']}
+                    for dia, valores in sorted(dias.items())],
+        'por_hora': [{'hora': hora, 'pedidos': valores['pedidos'], 'receita': round(valores['receita'], 2)}
+                     for hora, valores in sorted(horas.items())],
+        'por_forma_pagamento': [{'forma_pagamento': forma, 'pedidos': valores['pedidos'],
+                                 'receita': round(valores['receita'], 2),
+                                 'ticket_medio': _media(valores['receita'], valores['pedidos'])}
+                                for forma, valores in sorted(formas.items(), key=lambda f: -f[1]['receita'])],
+        'por_categoria': [{'categoria': categoria, 'quantidade': valores['quantidade'],
+                           'receita': round(valores['receita'], 2)}
+                          for categoria, valores in sorted(categorias.items(), key=lambda c: -c[1]['receita'])],
+        'por_produto': ranking[:limite_produtos],
+    }
+
+
+@click.command('recalcular-relatorios')
+@click.option('--desde', default=None, help='Primeiro dia (AAAA-MM-DD); padrão: o do pedido mais antigo.')
+@click.option('--ate', default=None, help='Último dia (AAAA-MM-DD); padrão: o do pedido mais recente.')
+@click.option('--janela', default=31, show_default=True, help='Dias recalculados por transação.')
+@with_appcontext
+def recalcular_relatorios_command(desde, ate, janela):
+    """Refaz os rollups de vendas a partir dos pedidos (backfill)."""
+    try:
+        desde = _data(desde, '--desde') if desde else None
+        ate = _data(ate, '--ate') if ate else None
+    except PeriodoInvalido as erro:
+        raise click.BadParameter(str(erro))
+    primeiro, ultimo = limites_pedidos()
+    db.session.remove()
+    if primeiro is None and (desde is None or ate is None):
+        click.echo('Nenhum pedido para recalcular.')
+        return
+    desde, ate = desde or primeiro, ate or ultimo
+
+    # Transações curtas: o app continua gravando pedidos durante o backfill
+    inicio, dias = desde, 0
+    while inicio <= ate:
+        fim = min(ate, inicio + timedelta(days=janela - 1))
+        with db.engine.begin() as conexao:
+            recalcular(conexao, inicio, fim)
+        dias += (fim - inicio).days + 1
+        click.echo(f'{inicio.isoformat()} a {fim.isoformat()} recalculados')
+        inicio = fim + timedelta(days=1)
+    click.echo(f'{dias} dia(s) recalculado(s).')
+
+
+def init_app(app):
+    app.cli.add_command(recalcular_relatorios_command)
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Hash de senhas fora da thread da requisição. O KDF do Werkzeug é lento de
+# propósito (centenas de ms); rodando nos workers web, um pico de logins na
+# abertura da loja ocupa todos eles e o cardápio para de responder. Aqui o
+# trabalho vai para um pool de processos de tamanho fixo, com um limite de
+# tarefas em espera: acima dele a requisição falha na hora (SenhasOcupadas)
+# em vez de enfileirar indefinidamente.
+
+PADROES = {
+    'SENHA_METODO': 'pbkdf2:sha256:600000',
+    'SENHA_PROCESSOS': 2,
+    'SENHA_FILA_MAXIMA': 16,
+    'SENHA_TIMEOUT': 10,
+}
+
+
+class SenhasOcupadas(Exception):
+    pass
+
+
+def _config(nome):
+    if has_app_context():
+        return current_app.config.get(nome, PADROES[nome])
+    return PADROES[nome]
+
+
+# Executadas nos processos do pool
+def _gerar(senha, metodo):
+    return generate_password_hash(senha, method=metodo)
+
+
+def _verificar(hash_senha, senha):
+    return check_password_hash(hash_senha, senha)
+
+
+class PoolSenhas:
+    def __init__(self, processos, fila_maxima, timeout):
+        self.processos = processos
+        self.timeout = timeout
+        # Tarefas em execução + em espera
+        self._vagas = threading.BoundedSemaphore(processos + fila_maxima)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Um pool por processo: depois do fork de um worker o pool herdado não serve
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # Nunca fork: este processo já tem threads (gravador, reconciliação,
+                    # SSE) e um filho copiado com um lock tomado por outra thread trava.
+                    # Os filhos importam só este módulo (app.py não cria nada ao ser importado)
+                    metodos = multiprocessing.get_all_start_methods()
+                    contexto = multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+                    self._executor = ProcessPoolExecutor(max_workers=self.processos, mp_context=contexto)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def executar(self, funcao, *args):
+        if self.processos <= 0:
+            return funcao(*args)
+        if not self._vagas.acquire(blocking=False):
+            raise SenhasOcupadas()
+        try:
+            futuro = self._pool().submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            futuro.cancel()
+            raise SenhasOcupadas()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolSenhas(_config('SENHA_PROCESSOS'), _config('SENHA_FILA_MAXIMA'),
+                                   _config('SENHA_TIMEOUT'))
+    return _pool
+
+
+def gerar_hash(senha):
+    return pool().executar(_gerar, senha, _config('SENHA_METODO'))
+
+
+def verificar(hash_senha, senha):
+    return pool().executar(_verificar, hash_senha, senha)
+
+
+def _parametros(metodo):
+    # Forma completa que o Werkzeug grava no hash: ele preenche os parâmetros
+    # omitidos ("scrypt" vira "scrypt:32768:8:1", "pbkdf2" vira
+    # "pbkdf2:sha256:600000"). Calculada do texto, sem rodar o KDF na requisição
+    nome, *argumentos = metodo.split(':')
+    if nome == 'scrypt':
+        return metodo if argumentos else 'scrypt:32768:8:1'
+    if nome == 'pbkdf2':
+        hash_nome = argumentos[0] if argumentos else 'sha256'
+        iteracoes = argumentos[1] if len(argumentos) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_nome}:{int(iteracoes)}'
+    return metodo
+
+
+def precisa_rehash(hash_senha):
+    """True se o hash foi gerado com parâmetros diferentes dos configurados."""
+    return hash_senha.split('$', 1)[0] != _parametros(_config('SENHA_METODO'))
@@ -6,7 +6,7 @@ class JuniorsLanchesSystem {
     init() {
         this.setupEventListeners();
         this.initializeComponents();
-        this.updateCartBadgeCount(); // Nome corrigido
+        // O contador do carrinho já vem renderizado no menu (carrinho_count)
     }
 
     setupEventListeners() {
@@ -163,6 +163,40 @@ function validarSenha(senha) {
     return senha.length >= 6;
 }
 
+// Acompanhamento de pedidos em tempo real (Server-Sent Events). O navegador
+// reconecta sozinho e envia Last-Event-ID para recuperar o que perdeu.
+function acompanharPedidos(url, handlers) {
+    if (!window.EventSource) {
+        return null;
+    }
+
+    const fonte = new EventSource(url);
+    Object.entries(handlers).forEach(([tipo, handler]) => {
+        fonte.addEventListener(tipo, (e) => handler(JSON.parse(e.data)));
+    });
+    return fonte;
+}
+
+function atualizarBadgeStatus(pedidoId, status) {
+    document.querySelectorAll(`.status-badge[data-pedido-id="${pedidoId}"]`).forEach(badge => {
+        badge.className = `status-badge status-${status}`;
+        badge.textContent = status.charAt(0).toUpperCase() + status.slice(1);
+    });
+}
+
+// Os <option> desabilitados vêm do status de quando a página foi gerada;
+// quando o status muda pelo stream, recalcula a partir das transições válidas
+function atualizarSelectStatus(pedidoId, status, transicoes) {
+    document.querySelectorAll(`.status-select[data-pedido-id="${pedidoId}"]`).forEach(select => {
+        select.value = status;
+        select.dataset.status = status;
+        const permitidos = transicoes[status] || [];
+        Array.from(select.options).forEach(opcao => {
+            opcao.disabled = opcao.value !== status && !permitidos.includes(opcao.value);
+        });
+    });
+}
+
 // Inicialização do sistema quando o DOM estiver carregado
 document.addEventListener('DOMContentLoaded', function() {
     window.juniorsSystem = new JuniorsLanchesSystem();
@@ -0,0 +1,74 @@
+import pytest
+
+import catalogo
+import estaticos
+import identidade
+from app import create_app, init_db
+from models import db, Endereco, User
+
+# Cada teste recebe uma app nova sobre um SQLite próprio em tmp_path, com o
+# cardápio de exemplo do init-db. Hash de senha barato e sem pool de
+# processos, e pedidos gravados na própria requisição (o gravador em grupo
+# tem testes próprios).
+
+CONFIG_TESTE = {
+    'TESTING': True,
+    'SENHA_PROCESSOS': 0,
+    'SENHA_METODO': 'pbkdf2:sha256:1000',
+    'PEDIDOS_GRUPO': False,
+    'CONTADORES_RECONCILIAR_SEGUNDOS': 0,
+    'ESTATICOS_COMPILAR': False,
+    'COMPRESSAO': False,
+}
+
+
+def nova_app(**config):
+    app = create_app({**CONFIG_TESTE, **config})
+    with app.app_context():
+        init_db()
+    # Caches por processo não podem levar dados de um banco de teste para outro
+    catalogo.invalidar()
+    identidade.cache().invalidar()
+    estaticos.invalidar()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = nova_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "teste.db"}')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def login(app, email, senha):
+    cliente = app.test_client()
+    resposta = cliente.post('/login', data={'email': email, 'password': senha})
+    assert resposta.status_code == 302
+    return cliente
+
+
+@pytest.fixture
+def cliente(app):
+    with app.app_context():
+        usuario = User(username='cliente', email='cliente@teste.com')
+        usuario.set_password('123456')
+        db.session.add(usuario)
+        db.session.commit()
+        db.session.add(Endereco(user_id=usuario.id, cep='01000-000', logradouro='Rua A', numero='1',
+                                bairro='Centro', cidade='São Paulo', estado='SP', principal=True))
+        db.session.commit()
+    return login(app, 'cliente@teste.com', '123456')
+
+
+@pytest.fixture
+def admin(app):
+    return login(app, 'admin@juniorfood.com', 'admin123')
+
+
+def fazer_pedido(cliente, produto_ids=(1,), forma_pagamento='pix', **extra):
+    for produto_id in produto_ids:
+        cliente.post('/adicionar_carrinho', data={'produto_id': produto_id})
+    return cliente.post('/finalizar_pedido', data={'forma_pagamento': forma_pagamento,
+                                                   'endereco_entrega_id': 1, **extra})
@@ -0,0 +1,57 @@
+import re
+
+import andamento
+from conftest import fazer_pedido
+from models import db, Pedido, PedidoStatusEvento
+
+
+def _eventos(app):
+    with app.app_context():
+        return [(evento.de, evento.para) for evento in PedidoStatusEvento.query.order_by(PedidoStatusEvento.id)]
+
+
+def _desabilitados(html):
+    return re.findall(r'<option value="(\w+)"\s+disabled>', html)
+
+
+def _mudar(admin, status):
+    return admin.post('/admin/pedido/1/status', json={'status': status}).json
+
+
+def test_transicoes_invalidas_sao_recusadas_e_nada_e_gravado(app, cliente, admin):
+    fazer_pedido(cliente)
+    assert _eventos(app) == [(None, 'pendente')]
+
+    resposta = _mudar(admin, 'entregue')
+    assert resposta == {'success': False, 'message': 'Não é possível passar o pedido de pendente para entregue'}
+    assert _mudar(admin, 'enviado') == {'success': False, 'message': 'Status inválido'}
+    assert _mudar(admin, 'pendente')['success']  # sem troca, sem evento
+    with app.app_context():
+        assert db.session.get(Pedido, 1).status == 'pendente'
+    assert _eventos(app) == [(None, 'pendente')]
+
+    # Só as transições válidas aparecem habilitadas no <select>
+    assert _desabilitados(admin.get('/admin/pedido/1').get_data(as_text=True)) == ['pronto', 'entregue']
+
+    for status in ('preparando', 'pronto', 'entregue'):
+        assert _mudar(admin, status)['success']
+    assert _mudar(admin, 'cancelado')['success'] is False
+    assert _eventos(app) == [(None, 'pendente'), ('pendente', 'preparando'),
+                             ('preparando', 'pronto'), ('pronto', 'entregue')]
+
+
+def test_eventos_alimentam_o_estimador_e_somem_com_o_pedido(app, cliente, admin):
+    fazer_pedido(cliente)
+    fazer_pedido(cliente)
+    for status in ('preparando', 'pronto', 'entregue'):
+        _mudar(admin, status)
+
+    with app.app_context():
+        etapas = andamento.estimador().etapas()
+        assert {etapa: dados.amostras for etapa, dados in etapas.items()} == {'pendente': 1, 'preparando': 1, 'pronto': 1}
+        # O pedido 2 continua pendente e tem previsão; o entregue não
+        assert list(andamento.estimador().previsoes(Pedido.query.all())) == [2]
+        assert andamento.painel()['etapas'][0]['em_andamento'] == 1
+
+    assert admin.post('/admin/pedido/1/excluir').json['success']
+    assert _eventos(app) == [(None, 'pendente')]
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+from app import create_app, init_db
+from config import Config, opcoes_engine
+from conftest import CONFIG_TESTE
+from models import Categoria, Produto, User
+
+
+def test_app_em_memoria_e_init_db_idempotente():
+    app = create_app({**CONFIG_TESTE, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == opcoes_engine('sqlite://')
+    with app.app_context():
+        assert 'usuário admin' in init_db()
+        contagens = (User.query.count(), Categoria.query.count(), Produto.query.count())
+        assert init_db() == []
+        assert (User.query.count(), Categoria.query.count(), Produto.query.count()) == contagens
+
+
+def test_opcoes_de_engine_explicitas_sao_mantidas():
+    opcoes = {'connect_args': {'check_same_thread': False}}
+    app = create_app({**CONFIG_TESTE, 'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                      'SQLALCHEMY_ENGINE_OPTIONS': opcoes})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] is opcoes
+
+
+def test_sem_config_usa_opcoes_do_ambiente():
+    app = create_app()
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == Config.SQLALCHEMY_ENGINE_OPTIONS
+
+
+def test_ferramentas_de_cli_so_sao_importadas_quando_rodam():
+    codigo = 'import sys, wsgi; print(sorted({"benchmark", "dados_teste", "planos_consulta", "migracoes"} & set(sys.modules)))'
+    saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True,
+                           env={**os.environ, 'DATABASE_URL': 'sqlite://'}).stdout
+    assert saida.strip() == '[]'
+
+    app = create_app({**CONFIG_TESTE, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    runner = app.test_cli_runner()
+    assert 'Gera clientes, endereços e pedidos' in runner.invoke(args=['--help']).output
+    assert '--pedidos' in runner.invoke(args=['seed', '--help']).output
+    resultado = runner.invoke(args=['migrar'])
+    assert resultado.exit_code == 0 and 'Banco de dados atualizado.' in resultado.output
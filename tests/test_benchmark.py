@@ -0,0 +1,7 @@
+import benchmark
+
+
+def test_sem_modulo_resource_o_pico_de_rss_fica_de_fora(monkeypatch):
+    assert benchmark._rss_pico_kib() > 0
+    monkeypatch.setattr(benchmark, 'resource', None)
+    assert benchmark._rss_pico_kib() is None
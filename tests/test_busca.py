@@ -0,0 +1,18 @@
+import pytest
+
+
+def _nomes(cliente, termo):
+    resposta = cliente.get('/api/produtos/busca', query_string={'q': termo})
+    assert resposta.status_code == 200
+    return [produto['nome'] for produto in resposta.json['produtos']]
+
+
+@pytest.mark.parametrize('termo', ['porcao', 'Porções', 'porcoes'])
+def test_porcao_acha_a_categoria_porcoes(cliente, termo):
+    assert sorted(_nomes(cliente, termo)) == ['Batata Frita', 'Onion Rings']
+
+
+def test_plural_e_singular(cliente):
+    assert _nomes(cliente, 'batatas') == ['Batata Frita']
+    assert _nomes(cliente, 'pães') == _nomes(cliente, 'pao')
+    assert 'Pizza Calabresa' in _nomes(cliente, 'calab')
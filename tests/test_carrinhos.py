@@ -0,0 +1,67 @@
+import pytest
+
+import carrinhos
+from conftest import login
+from models import CarrinhoItem, Pedido, User
+
+
+@pytest.fixture(params=['memoria', 'banco'])
+def backend(request, app, monkeypatch):
+    app.config['CARRINHO_BACKEND'] = request.param
+    monkeypatch.setattr(carrinhos, '_store', None)
+    return request.param
+
+
+def _usuario_id():
+    return User.query.filter_by(email='cliente@teste.com').one().id
+
+
+def _linhas(app):
+    with app.app_context():
+        return [(linha['produto_id'], linha['quantidade'], linha['observacao'])
+                for linha in carrinhos.store().linhas(_usuario_id())]
+
+
+def test_carrinho_nos_dois_backends(app, backend, cliente):
+    assert cliente.post('/adicionar_carrinho', data={'produto_id': 1}).json['carrinho_count'] == 1
+    assert cliente.post('/adicionar_carrinho', data={'produto_id': 1, 'quantidade': 2}).json['carrinho_count'] == 3
+    cliente.post('/adicionar_carrinho', data={'produto_id': 2, 'observacao': 'sem cebola'})
+    assert cliente.post('/adicionar_carrinho', data={'produto_id': 999}).json['success'] is False
+    assert _linhas(app) == [(1, 3, ''), (2, 1, 'sem cebola')]
+
+    resposta = cliente.post('/atualizar_carrinho', data={'index': 0, 'quantidade': 5})
+    assert resposta.json['carrinho_count'] == 6
+    cliente.get('/remover_carrinho/1')
+    assert cliente.get('/api/carrinho_count').json == {'count': 5}
+    assert b'Carrinho' in cliente.get('/carrinho').data
+
+    assert cliente.post('/finalizar_pedido', data={'forma_pagamento': 'pix', 'endereco_entrega_id': 1}).status_code == 302
+    assert cliente.get('/api/carrinho_count').json == {'count': 0}
+    with app.app_context():
+        pedido = Pedido.query.one()
+        assert [(item.produto_id, item.quantidade) for item in pedido.itens] == [(1, 5)]
+
+
+def test_carrinho_no_banco_vale_para_outra_sessao_e_outro_processo(app, cliente, monkeypatch):
+    monkeypatch.setattr(carrinhos, '_store', None)
+    cliente.post('/adicionar_carrinho', data={'produto_id': 1})
+    outra_sessao = login(app, 'cliente@teste.com', '123456')
+    assert outra_sessao.get('/api/carrinho_count').json == {'count': 1}
+    with app.app_context():
+        # Outro worker: instância nova, mesma tabela
+        assert carrinhos.CarrinhoBanco().contar(_usuario_id()) == 1
+        assert CarrinhoItem.query.count() == 1
+
+
+def test_carrinho_da_sessao_antiga_e_mesclado_ao_entrar(app, backend, cliente):
+    cliente.post('/adicionar_carrinho', data={'produto_id': 1})
+    # Sessão aberta antes do carrinho no servidor: a lista ainda está no cookie
+    with cliente.session_transaction() as sessao:
+        sessao['carrinho'] = [{'produto_id': 1}, {'produto_id': '2', 'observacao': 'bem passado'},
+                              {'nome': 'sem produto_id'}]
+    assert cliente.get('/api/carrinho_count').json == {'count': 3}
+    assert _linhas(app) == [(1, 2, ''), (2, 1, 'bem passado')]
+    with cliente.session_transaction() as sessao:
+        assert 'carrinho' not in sessao
+    # Só uma vez: a lista sai do cookie
+    assert cliente.get('/api/carrinho_count').json == {'count': 3}
@@ -0,0 +1,22 @@
+import json
+
+
+def test_cardapio_revalida_com_etag(cliente, admin):
+    resposta = cliente.get('/api/cardapio')
+    assert resposta.status_code == 200
+    etag = resposta.headers['ETag']
+    assert 'no-cache' in resposta.headers['Cache-Control']
+    produto = json.loads(resposta.data)['categorias'][0]['produtos'][0]
+
+    nao_modificado = cliente.get('/api/cardapio', headers={'If-None-Match': etag})
+    assert nao_modificado.status_code == 304
+    assert nao_modificado.data == b''
+    assert nao_modificado.headers['ETag'] == etag
+
+    # Mudança no catálogo troca a versão: a cópia antiga não vale mais
+    assert admin.post(f"/admin/produto/{produto['id']}/toggle").json['success']
+    resposta = cliente.get('/api/cardapio', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
+    ids = [p['id'] for categoria in json.loads(resposta.data)['categorias'] for p in categoria['produtos']]
+    assert produto['id'] not in ids
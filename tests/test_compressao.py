@@ -0,0 +1,63 @@
+import gzip
+
+import pytest
+
+import compressao
+from conftest import login, nova_app
+from models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = nova_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "teste.db"}', COMPRESSAO=True,
+                   SSE_HEARTBEAT_SEGUNDOS=0.05, SSE_DURACAO_MAXIMA=0.2)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize('aceitas, codificacao', [
+    pytest.param('gzip, deflate, br', 'br',
+                 marks=pytest.mark.skipif(compressao.brotli is None, reason='pacote brotli ausente')),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+])
+def test_negociacao_pelo_accept_encoding(app, aceitas, codificacao):
+    admin = login(app, 'admin@juniorfood.com', 'admin123')
+    original = admin.get('/api/cardapio')
+    assert 'Content-Encoding' not in original.headers
+
+    resposta = admin.get('/api/cardapio', headers={'Accept-Encoding': aceitas})
+    assert resposta.headers.get('Content-Encoding') == codificacao
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+    if codificacao is None:
+        assert resposta.data == original.data
+        return
+    descomprimir = compressao.brotli.decompress if codificacao == 'br' else gzip.decompress
+    assert descomprimir(resposta.data) == original.data
+    assert int(resposta.headers['Content-Length']) == len(resposta.data) < len(original.data)
+
+    # ETag fraca na versão comprimida, e a revalidação continua dando 304
+    assert resposta.headers['ETag'] == f"W/{original.headers['ETag']}"
+    revalidacao = admin.get('/api/cardapio', headers={'Accept-Encoding': aceitas,
+                                                      'If-None-Match': resposta.headers['ETag']})
+    assert revalidacao.status_code == 304
+
+
+def test_resposta_pequena_nao_e_comprimida(app):
+    admin = login(app, 'admin@juniorfood.com', 'admin123')
+    resposta = admin.get('/api/carrinho_count', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resposta.headers
+    assert resposta.headers['Vary'].endswith('Accept-Encoding')
+    assert resposta.json == {'count': 0}
+
+
+def test_sse_nao_e_comprimido(app):
+    admin = login(app, 'admin@juniorfood.com', 'admin123')
+    resposta = admin.get('/admin/stream', headers={'Accept-Encoding': 'gzip, br'})
+    assert resposta.mimetype == 'text/event-stream'
+    assert 'Content-Encoding' not in resposta.headers
+    assert resposta.get_data(as_text=True).startswith('retry:')
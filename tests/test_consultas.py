@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import consultas
+import contadores
+from orcamento_sql import contar_sql
+from conftest import fazer_pedido
+from models import db, Endereco, Pedido, User
+
+
+def _filtros(**valores):
+    return consultas.SEM_FILTROS._replace(**valores)
+
+
+def _ids(filtros):
+    return sorted(pedido.id for pedido in consultas.filtrar_pedidos(Pedido.query, filtros))
+
+
+def test_filtros_de_cliente_e_bairro_ignoram_caixa(app, cliente):
+    fazer_pedido(cliente, forma_pagamento='pix')
+    with app.app_context():
+        usuario = User.query.filter_by(username='cliente').one()
+        db.session.add(Endereco(user_id=usuario.id, cep='1', logradouro='Rua B', numero='2', bairro='Jardim América'))
+        db.session.commit()
+    fazer_pedido(cliente, forma_pagamento='dinheiro', endereco_entrega_id=2)
+
+    with app.app_context():
+        assert _ids(_filtros(cliente='CLIEN')) == [1, 2]
+        assert _ids(_filtros(cliente='Cliente@Teste')) == [1, 2]
+        assert _ids(_filtros(cliente='outro')) == []
+        # Mesma forma de consulta com outros valores (cache de instruções do SQLAlchemy)
+        assert _ids(_filtros(bairro='centro')) == [1]
+        assert _ids(_filtros(bairro='JARDIM')) == [2]
+        assert _ids(_filtros(bairro='100%')) == []
+
+        facetas = consultas.facetas_pedidos(_filtros(bairro='jardim'))
+        assert facetas.total == 1
+        assert facetas.formas_pagamento['dinheiro'] == 1
+        assert facetas.formas_pagamento['pix'] == 0
+
+
+def test_facetas_sem_filtros_vem_dos_contadores(app, cliente, admin):
+    fazer_pedido(cliente, forma_pagamento='pix')
+    fazer_pedido(cliente, forma_pagamento='dinheiro')
+    fazer_pedido(cliente, forma_pagamento='pix')
+    assert admin.post('/admin/pedido/2/status', json={'status': 'preparando'}).json['success']
+
+    with app.app_context():
+        with contar_sql() as contador:
+            facetas = consultas.facetas_pedidos(consultas.SEM_FILTROS)
+        assert not any('FROM pedido' in instrucao for instrucao in contador.instrucoes)
+        assert facetas.total == 3
+        assert facetas.status['pendente'] == 2 and facetas.status['preparando'] == 1
+        assert facetas.formas_pagamento == {'cartao': 0, 'dinheiro': 1, 'pix': 2}
+        assert contadores.valor('pedidos:preparando:dinheiro') == 1
+        assert contadores.reconciliar() == {}
+
+
+def _percorrer(ordenacao, cursor=None, campo='proximo'):
+    paginas = []
+    while True:
+        pagina = consultas.paginar_pedidos(Pedido.query, ordenacao=ordenacao, cursor=cursor, por_pagina=4)
+        paginas.append([pedido.id for pedido in pagina.itens])
+        cursor = getattr(pagina, campo)
+        if cursor is None:
+            return paginas, pagina
+
+
+def test_cursor_percorre_todos_os_pedidos_sem_repetir_nem_pular(app):
+    with app.app_context():
+        admin = User.query.filter_by(is_admin=True).one()
+        inicio = datetime(2026, 3, 1, 12, 0)
+        # Vários pedidos no mesmo instante: o id desempata a chave
+        for n in range(11):
+            db.session.add(Pedido(user_id=admin.id, forma_pagamento='pix', total=10.0,
+                                  created_at=inicio + timedelta(minutes=n // 3)))
+        db.session.commit()
+        chave = [(pedido.created_at, pedido.id) for pedido in Pedido.query]
+        mais_antigos = [pedido_id for _, pedido_id in sorted(chave)]
+
+        for ordenacao, esperado in (('mais_antigos', mais_antigos), ('mais_novos', mais_antigos[::-1])):
+            paginas, ultima = _percorrer(ordenacao)
+            assert [len(ids) for ids in paginas] == [4, 4, 3]
+            assert sum(paginas, []) == esperado
+
+            # Voltando pelos cursores "anterior" a partir da última página
+            de_volta, primeira = _percorrer(ordenacao, ultima.anterior, campo='anterior')
+            assert de_volta == paginas[-2::-1]
+            assert primeira.anterior is None and primeira.proximo is not None
+
+        assert consultas.decodificar_cursor('lixo') is None
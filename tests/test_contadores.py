@@ -0,0 +1,26 @@
+import contadores
+from conftest import fazer_pedido
+from models import db, Contador
+
+
+def test_incremento_cria_o_contador_que_falta(app, cliente):
+    with app.app_context():
+        Contador.query.filter_by(chave='pedidos:pendente').delete()
+        db.session.commit()
+    fazer_pedido(cliente)
+    fazer_pedido(cliente)
+    with app.app_context():
+        assert contadores.valor('pedidos:pendente') == 2
+        assert contadores.valor('pedidos') == 2
+
+
+def test_reconciliar_corrige_divergencias(app, cliente):
+    fazer_pedido(cliente)
+    with app.app_context():
+        Contador.query.filter_by(chave='pedidos').update({'valor': 40})
+        Contador.query.filter_by(chave='pedidos:entregue').delete()
+        db.session.commit()
+
+        assert contadores.reconciliar() == {'pedidos': (40, 1), 'pedidos:entregue': (None, 0)}
+        assert contadores.ler()['pedidos'] == 1
+        assert contadores.reconciliar() == {}
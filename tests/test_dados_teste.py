@@ -0,0 +1,33 @@
+from datetime import datetime
+from itertools import groupby
+
+import dados_teste
+from models import db, Endereco, Pedido, PedidoStatusEvento
+
+
+def test_seed_grava_endereco_e_historico_de_status(app):
+    with app.app_context():
+        dados_teste.semear(20, 300, semente=7, lote=64, dias=30, data_final=datetime(2026, 1, 31, 23, 59, 59))
+
+        pedidos = {pedido.id: pedido for pedido in Pedido.query}
+        enderecos = {endereco.id: endereco.user_id for endereco in Endereco.query}
+        assert len(pedidos) == 300
+        assert all(enderecos[pedido.endereco_entrega_id] == pedido.user_id for pedido in pedidos.values())
+
+        eventos = db.session.execute(db.select(PedidoStatusEvento).order_by(PedidoStatusEvento.id)).scalars()
+        historicos = {pedido_id: list(grupo) for pedido_id, grupo
+                      in groupby(sorted(eventos, key=lambda e: (e.pedido_id, e.id)), key=lambda e: e.pedido_id)}
+        assert historicos.keys() == pedidos.keys()
+        for pedido_id, historico in historicos.items():
+            pedido = pedidos[pedido_id]
+            assert (historico[0].de, historico[0].para, historico[0].criado_em) == (None, 'pendente', pedido.created_at)
+            assert historico[-1].para == pedido.status
+            assert historico[-1].criado_em == pedido.updated_at
+            for anterior, evento in zip(historico, historico[1:]):
+                assert evento.de == anterior.para and evento.criado_em >= anterior.criado_em
+
+
+def test_seed_para_clientes_existentes_usa_os_enderecos_deles(app, cliente):
+    with app.app_context():
+        dados_teste.semear(0, 10, semente=1)
+        assert {pedido.endereco_entrega_id for pedido in Pedido.query} == {1}
@@ -0,0 +1,57 @@
+import os
+
+from flask import url_for
+
+import estaticos
+from app import create_app
+from conftest import CONFIG_TESTE
+
+
+def app_estaticos(pasta, **config):
+    app = create_app({**CONFIG_TESTE, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', **config})
+    app.static_folder = str(pasta)
+    estaticos.invalidar()
+    return app
+
+
+def url_css(app):
+    with app.test_request_context():
+        return url_for('static', filename='css/style.css')
+
+
+def test_nada_compilado_na_inicializacao_e_manifesto_reaproveitado(tmp_path, monkeypatch):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'style.css').write_text('body { color: red; }\n' * 50)
+    app = app_estaticos(tmp_path, ESTATICOS_COMPILAR=True)
+    assert not (tmp_path / estaticos.PASTA_DIST).exists()
+
+    url = url_css(app)
+    assert url.startswith('/static/dist/css/style.') and url.endswith('.css')
+    assert app.test_client().get(url, headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+
+    # Outro processo com os mesmos originais só lê o manifesto
+    def falhar(*args, **kwargs):
+        raise AssertionError('recompilou sem mudança nos originais')
+
+    with monkeypatch.context() as m:
+        m.setattr(estaticos, 'compilar', falhar)
+        estaticos.invalidar()
+        assert url_css(app) == url
+
+    # Original alterado: o manifesto antigo não vale e a URL muda
+    (tmp_path / 'css' / 'style.css').write_text('body { color: blue; }\n' * 50)
+    os.utime(tmp_path / 'css' / 'style.css', ns=(0, 0))
+    estaticos.invalidar()
+    assert url_css(app) not in (url, '/static/css/style.css')
+
+
+def test_sem_compilar_usa_manifesto_do_deploy(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'style.css').write_text('body {}\n')
+    app = app_estaticos(tmp_path, ESTATICOS_COMPILAR=False)
+    assert url_css(app) == '/static/css/style.css'
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['compilar-estaticos']).exit_code == 0
+    estaticos.invalidar()
+    assert url_css(app).startswith('/static/dist/css/style.')
@@ -0,0 +1,23 @@
+import time
+
+from eventos import Broker
+
+
+def test_stream_fecha_apos_duracao_maxima_e_reconexao_recupera_eventos():
+    broker = Broker()
+    assinatura = broker.assinar()
+    stream = broker.stream(assinatura, heartbeat=0.05, duracao_maxima=0.2)
+    assert next(stream).startswith('retry:')
+    primeiro = broker.publicar('pedido_criado', {'id': 1}, user_id=7)
+    assert next(stream) == primeiro.texto
+
+    inicio = time.monotonic()
+    restante = list(stream)
+    assert time.monotonic() - inicio < 1
+    assert all(texto == ': ping\n\n' for texto in restante)
+    assert broker._assinantes == set()
+
+    # Publicado com o navegador desconectado: chega na reconexão (Last-Event-ID)
+    segundo = broker.publicar('status_atualizado', {'id': 1}, user_id=7)
+    reconexao = broker.assinar(user_id=7, ultimo_id=primeiro.id)
+    assert reconexao.fila.get_nowait() is segundo
@@ -0,0 +1,17 @@
+import csv
+import io
+
+from conftest import fazer_pedido
+
+
+def test_csv_neutraliza_formulas_digitadas_pelo_cliente(cliente, admin):
+    cliente.post('/adicionar_carrinho', data={'produto_id': 1, 'observacao': '@SUM(1+1)*cmd|x'})
+    fazer_pedido(cliente, produto_ids=(), observacao_geral='=HYPERLINK("http://x.example","clique")')
+
+    resposta = admin.get('/admin/pedidos/exportar?formato=csv')
+    assert resposta.status_code == 200
+    linhas = list(csv.DictReader(io.StringIO(resposta.get_data(as_text=True).lstrip('﻿'))))
+    assert len(linhas) == 1
+    assert linhas[0]['observacao'] == '\'=HYPERLINK("http://x.example","clique")'
+    assert linhas[0]['item_observacao'] == "'@SUM(1+1)*cmd|x"
+    assert float(linhas[0]['total']) > 0  # números não recebem o apóstrofo
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+import metricas
+from gravador import FilaCheia, GravacaoPendente, GravadorEmGrupo
+from models import db, Pedido
+from orcamento_sql import contar_sql
+
+
+def test_sql_do_lote_fica_fora_da_requisicao(app, cliente):
+    app.config['PEDIDOS_GRUPO'] = True
+    limite = app.view_functions['loja.finalizar_pedido'].limite_sql
+    cliente.post('/adicionar_carrinho', data={'produto_id': 1})
+
+    with contar_sql() as contador:
+        resposta = cliente.post('/finalizar_pedido', data={'forma_pagamento': 'pix', 'endereco_entrega_id': 1})
+    assert resposta.location == '/perfil'
+    assert not any(instrucao.startswith('INSERT INTO pedido ') for instrucao in contador.instrucoes)
+    assert contador.total <= limite, contador.instrucoes
+    with app.app_context():
+        assert Pedido.query.count() == 1
+    assert 'juniorsfood_batch_items_count{gravador="pedidos"}' in metricas.registro.texto()
+
+
+def _gravar_e_commit(itens):
+    db.session.execute(db.text('SELECT 1'))
+    return itens
+
+
+def _lotes(nome):
+    linhas = metricas.registro.texto().splitlines()
+    return {metrica: float(linha.rsplit(' ', 1)[1]) for linha in linhas
+            for metrica in ('batch_items', 'batch_sql_statements')
+            if linha.startswith(f'juniorsfood_{metrica}_sum{{gravador="{nome}"}}')}
+
+
+def test_lote_registra_seus_totais_sem_repartir(app):
+    liberar = threading.Event()
+
+    def gravar(itens):
+        liberar.wait(5)
+        return _gravar_e_commit(itens)
+
+    gravador = GravadorEmGrupo(app, gravar, espera_ms=200, timeout=5, nome='teste_lote')
+    totais = {}
+
+    def enviar(item):
+        with contar_sql() as contador:
+            assert gravador.enviar(item) == item
+        totais[item] = contador.total
+
+    threads = [threading.Thread(target=enviar, args=(item,)) for item in range(3)]
+    for thread in threads:
+        thread.start()
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    # Nenhuma requisição executou SQL; cada lote registrou um SELECT e seus itens
+    assert totais == {0: 0, 1: 0, 2: 0}
+    lotes = _lotes('teste_lote')
+    assert lotes['batch_items'] == 3
+    assert 1 <= lotes['batch_sql_statements'] <= 3
+
+
+def test_timeout_durante_a_gravacao_nao_pendura_a_requisicao(app):
+    liberar = threading.Event()
+    gravando = threading.Event()
+
+    def gravar(itens):
+        gravando.set()
+        liberar.wait(5)
+        return _gravar_e_commit(itens)
+
+    gravador = GravadorEmGrupo(app, gravar, espera_ms=0, timeout=0.1)
+    resultado = {}
+    primeira = threading.Thread(target=lambda: resultado.setdefault('erro', _erro(gravador, 'a')))
+    primeira.start()
+    assert gravando.wait(2)
+    # A segunda fica na fila atrás da gravação travada: desiste sem gravar
+    with pytest.raises(FilaCheia):
+        gravador.enviar('b')
+    primeira.join(2)
+    assert isinstance(resultado['erro'], GravacaoPendente)
+    liberar.set()
+
+
+def _erro(gravador, item):
+    try:
+        gravador.enviar(item)
+    except Exception as e:
+        return e
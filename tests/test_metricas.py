@@ -0,0 +1,34 @@
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import metricas
+from models import db
+
+
+@pytest.fixture
+def medicao(app):
+    with app.app_context():
+        metricas._local.medicao = metricas.Medicao()
+        yield metricas._local.medicao
+        metricas._local.medicao = None
+
+
+def test_tempo_db_inclui_o_fetch_das_linhas(medicao):
+    conexao = db.session.connection()
+    conexao.connection.driver_connection.create_function('dormir', 1, lambda s: time.sleep(s) or 1)
+    # O SQLite calcula só a primeira linha no execute; as outras saem no fetch
+    linhas = conexao.execute(text('SELECT dormir(0.02) FROM (SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3)')).all()
+    assert len(linhas) == 3
+    assert medicao.instrucoes == 1
+    assert medicao.tempo_db >= 0.055
+
+
+def test_instrucao_com_erro_nao_deixa_inicio_pendente(medicao):
+    conexao = db.session.connection()
+    with pytest.raises(OperationalError):
+        conexao.execute(text('SELECT * FROM tabela_que_nao_existe'))
+    assert conexao.info['metricas_inicio'] == []
+    assert medicao.instrucoes == 1
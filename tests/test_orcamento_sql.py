@@ -0,0 +1,28 @@
+from conftest import fazer_pedido
+from orcamento_sql import contar_sql, dentro_do_orcamento, medir_orcamentos
+
+
+def test_rotas_get_dentro_do_orcamento(app, cliente, admin):
+    for forma in ('pix', 'dinheiro', 'cartao'):
+        fazer_pedido(cliente, produto_ids=(1, 2), forma_pagamento=forma)
+    admin.post('/admin/pedido/1/status', json={'status': 'preparando'})
+
+    resultados = medir_orcamentos(app)
+    assert resultados
+    sem_dados = [endpoint for endpoint, url, *_ in resultados if url is None]
+    assert sem_dados == []
+    acima = {endpoint: (url, total, limite, status)
+             for endpoint, url, total, limite, status in resultados
+             if not dentro_do_orcamento(total, limite, status)}
+    assert acima == {}
+
+
+def test_finalizar_pedido_dentro_do_orcamento(app, cliente):
+    limite = app.view_functions['loja.finalizar_pedido'].limite_sql
+    cliente.post('/adicionar_carrinho', data={'produto_id': 1})
+    cliente.post('/adicionar_carrinho', data={'produto_id': 2, 'quantidade': 2})
+
+    with contar_sql() as contador:
+        resposta = cliente.post('/finalizar_pedido', data={'forma_pagamento': 'pix', 'endereco_entrega_id': 1})
+    assert resposta.status_code == 302 and resposta.location == '/perfil'
+    assert 0 < contador.total <= limite, contador.instrucoes
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import create_engine
+
+import planos_consulta
+from models import db
+
+TABELAS = {'pedido', 'endereco', 'user'}
+
+
+@pytest.mark.parametrize('detalhe', [
+    'SCAN pedido',
+    'SCAN pedido USING INDEX ix_pedido_status_forma_created_at',
+    'SCAN endereco USING COVERING INDEX ix_endereco_bairro',
+])
+def test_varredura_por_indice_conta_como_completa(detalhe):
+    assert planos_consulta.problemas_do_plano([detalhe], TABELAS)
+
+
+@pytest.mark.parametrize('detalhe', [
+    'SEARCH pedido USING INDEX ix_pedido_created_at_id (created_at>?)',
+    'SEARCH endereco USING COVERING INDEX ix_endereco_bairro_nocase (bairro>? AND bairro<?)',
+    'SCAN pedido USING INTEGER PRIMARY KEY',
+    'SCAN pedido_status_evento',  # tabela fora do conjunto verificado
+])
+def test_busca_por_chave_passa(detalhe):
+    assert planos_consulta.problemas_do_plano([detalhe], TABELAS) == []
+
+
+def _falhas(conexao):
+    return {nome: (detalhes, problemas) for nome, detalhes, problemas in planos_consulta.analisar(conexao) if problemas}
+
+
+def test_consultas_criticas_usam_indices_no_schema_dos_modelos(app):
+    with app.app_context():
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        with engine.connect() as conexao:
+            assert _falhas(conexao) == {}
+        engine.dispose()
+
+
+def test_consultas_criticas_usam_indices_no_banco_migrado(app):
+    # Banco criado pelo init-db (migrações), como o --banco-atual confere
+    with app.app_context():
+        assert _falhas(db.session.connection()) == {}
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+import migracoes
+import relatorios
+from models import db, Parametro, Pedido, PedidoItem, ProdutoVendaResumo, User, VendaResumo
+
+
+def criar_pedidos(*momentos):
+    admin = User.query.filter_by(is_admin=True).first()
+    for momento in momentos:
+        pedido = Pedido(user_id=admin.id, forma_pagamento='pix', total=10.0, created_at=momento)
+        pedido.itens.append(PedidoItem(produto_id=1, quantidade=2, preco_unitario=5.0))
+        db.session.add(pedido)
+    db.session.commit()
+
+
+def rollups():
+    vendas = sorted((linha.dia, linha.hora, linha.pedidos) for linha in VendaResumo.query)
+    produtos = sorted((linha.dia, linha.quantidade) for linha in ProdutoVendaResumo.query)
+    return vendas, produtos
+
+
+def test_dia_e_hora_no_fuso_da_loja(app):
+    with app.app_context():
+        # 01:30 UTC do dia 10 = 22:30 do dia 9 em São Paulo (UTC-3)
+        criar_pedidos(datetime(2026, 3, 10, 1, 30), datetime(2026, 3, 9, 15, 0))
+        dados = relatorios.resumo(date(2026, 3, 9), date(2026, 3, 10))
+        assert [(dia['dia'], dia['pedidos']) for dia in dados['por_dia']] == [('2026-03-09', 2), ('2026-03-10', 0)]
+        horas = {hora['hora']: hora['pedidos'] for hora in dados['por_hora'] if hora['pedidos']}
+        assert horas == {12: 1, 22: 1}
+
+        incremental = rollups()
+        with db.engine.begin() as conexao:
+            relatorios.recalcular(conexao)
+        assert rollups() == incremental
+        assert relatorios.limites_pedidos() == (date(2026, 3, 9), date(2026, 3, 9))
+
+
+def test_recalculo_de_um_dia_usa_os_limites_locais(app):
+    with app.app_context():
+        criar_pedidos(datetime(2026, 3, 10, 2, 59), datetime(2026, 3, 10, 3, 0))
+        with db.engine.begin() as conexao:
+            relatorios.recalcular(conexao, date(2026, 3, 10), date(2026, 3, 10))
+        assert rollups()[0] == [(date(2026, 3, 9), 23, 1), (date(2026, 3, 10), 0, 1)]
+
+
+def test_migrar_refaz_rollups_de_outro_fuso(app):
+    with app.app_context():
+        criar_pedidos(datetime(2026, 3, 10, 1, 30))
+        # Banco de antes do LOJA_FUSO: rollups em UTC e nenhum fuso gravado
+        app.config['LOJA_FUSO'] = 'UTC'
+        with db.engine.begin() as conexao:
+            relatorios.recalcular(conexao)
+        Parametro.query.delete()
+        db.session.commit()
+        assert rollups()[0] == [(date(2026, 3, 10), 1, 1)]
+
+        app.config['LOJA_FUSO'] = 'America/Sao_Paulo'
+        assert migracoes.migrar() == ['rollups de relatórios refeitos no fuso America/Sao_Paulo']
+        assert rollups() == ([(date(2026, 3, 9), 22, 1)], [(date(2026, 3, 9), 2)])
+        assert migracoes.migrar() == []
+
+        app.config['LOJA_FUSO'] = 'Asia/Kolkata'  # UTC+5:30
+        assert migracoes.migrar() == ['rollups de relatórios refeitos no fuso Asia/Kolkata']
+        assert rollups()[0] == [(date(2026, 3, 10), 7, 1)]
+        assert db.session.get(Parametro, relatorios.PARAMETRO_FUSO).valor == 'Asia/Kolkata'
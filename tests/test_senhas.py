@@ -0,0 +1,21 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+import senhas
+
+
+@pytest.mark.parametrize('metodo', ['scrypt', 'scrypt:16384:8:1', 'pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000'])
+def test_parametros_sem_calcular_hash(metodo, monkeypatch):
+    esperado = generate_password_hash('x', method=metodo).split('$', 1)[0]
+    monkeypatch.setattr(senhas, 'generate_password_hash', None)  # não pode ser chamado
+    assert senhas._parametros(metodo) == esperado
+
+
+def test_hash_e_verificacao_pelo_pool_de_processos():
+    pool = senhas.PoolSenhas(processos=1, fila_maxima=2, timeout=60)
+    hash_senha = pool.executar(senhas._gerar, 'segredo', 'pbkdf2:sha256:1000')
+    assert hash_senha.startswith('pbkdf2:sha256:1000$')
+    assert pool.executar(senhas._verificar, hash_senha, 'segredo') is True
+    assert pool.executar(senhas._verificar, hash_senha, 'errada') is False
+    assert pool._pool()._mp_context.get_start_method() != 'fork'
+    pool._pool().shutdown()
@@ -0,0 +1,19 @@
+from app import create_app
+
+# Ponto de entrada WSGI. A app roda em um único processo com threads:
+#   gunicorn -w 1 -k gthread --threads 64 -b 0.0.0.0:8000 wsgi:app
+# Os streams de tempo real (SSE: painel do admin, cozinha, pedidos e perfil)
+# ficam abertos, cada um ocupando uma thread, e o broker que os alimenta
+# (eventos.py) vive na memória do processo. Com workers síncronos cada aba
+# aberta prenderia um worker inteiro; com vários processos um pedido gravado
+# em um deles não chegaria aos streams dos outros. Por isso não use -w > 1 nem
+# o worker sync. SSE_MAX_ASSINANTES (50) precisa ficar abaixo de --threads
+# para sobrar thread para as páginas, e SSE_DURACAO_MAXIMA faz cada stream
+# ser reaberto de tempos em tempos.
+#
+# Nada é criado nem apagado aqui: o banco é preparado uma vez no deploy com
+# `flask --app app init-db` (idempotente). Threads de fundo (gravador de
+# pedidos, reconciliação dos contadores, pool de senhas) são iniciadas no
+# primeiro uso, então --preload também funciona.
+
+app = create_app()